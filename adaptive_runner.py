@@ -0,0 +1,115 @@
+"""
+按精度自动停止的蒙特卡洛模拟
+
+固定次数的模拟在简单的配置上浪费算力，在噪声大的配置上又不够准。
+这里按轮推进：每轮给三种福利模式各追加若干块模拟（流式统计，常数内存），
+然后计算福利效率 = (基准平均花费 - 福利平均花费) / 策划投入 的置信区间，
+两种方案的区间半宽都不超过目标精度时停止。
+
+第 i 次模拟使用的随机数流与 parallel_runner 相同（相同种子、相同块大小），
+因此停止在 n 次时的结果与 run_all_strategies(iterations=n) 完全一致。
+"""
+import contextlib
+import math
+import os
+import time
+from statistics import NormalDist
+from typing import Dict, Optional, Tuple
+
+from config import GachaConfig
+from parallel_runner import DEFAULT_CHUNK_SIZE, _run_chunk
+from strategy_schedule import BUILTIN_STRATEGIES, WELFARE_MODES, WELFARE_MODE_KEYS, StrategySchedule
+from streaming_stats import StreamingStrategyStats
+
+
+DEFAULT_PRECISION = 0.01  # 效率（倍）置信区间的默认半宽
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_MIN_ITERATIONS = 2000  # 至少模拟的次数（太少时方差估计本身不可靠）
+DEFAULT_MAX_ITERATIONS = 1000000  # 达不到精度时的上限
+
+
+def efficiency_interval(baseline: StreamingStrategyStats, welfare: StreamingStrategyStats,
+                        confidence: float = DEFAULT_CONFIDENCE) -> Tuple[float, float]:
+    """
+    福利效率的估计值与置信区间半宽（正态近似）
+    两组模拟相互独立：Var(差) = Var(基准)/n基准 + Var(福利)/n福利
+    返回: (效率, 半宽)
+    """
+    invested = welfare.welfare_invested
+    saved = baseline.mean('user_spent') - welfare.mean('user_spent')
+    se = math.sqrt(baseline.histograms['user_spent'].var() / len(baseline) +
+                   welfare.histograms['user_spent'].var() / len(welfare))
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    return saved / invested, z * se / invested
+
+
+def run_adaptive(config: GachaConfig, schedule: StrategySchedule, num_pools: int,
+                 precision: float = DEFAULT_PRECISION, confidence: float = DEFAULT_CONFIDENCE,
+                 seed: int = 0, workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 min_iterations: int = DEFAULT_MIN_ITERATIONS,
+                 max_iterations: int = DEFAULT_MAX_ITERATIONS) -> Dict:
+    """
+    模拟一个策略的三种福利模式，直到两种方案的效率置信区间半宽都不超过 precision
+    precision: 效率（倍）的目标半宽，如 0.01 表示 ±0.01 倍
+    confidence: 置信水平
+    workers: 进程数（None 为 CPU 核数，1 为在当前进程中执行）；每轮每种模式追加 workers 块
+
+    返回: {
+        'results': {'baseline': 流式统计, 'limited': 流式统计, 'permanent': 流式统计},
+        'iterations': 实际模拟次数,
+        'efficiency': {'limited': (效率, 半宽), 'permanent': (效率, 半宽)},
+        'converged': 是否达到精度
+    }
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    s_idx = BUILTIN_STRATEGIES.index(schedule) if schedule in BUILTIN_STRATEGIES else len(BUILTIN_STRATEGIES)
+    mode_keys = [WELFARE_MODE_KEYS[mode] for mode in WELFARE_MODES]
+
+    print(f"\n【{schedule.title}】自适应模拟：目标精度 ±{precision}（{confidence:.0%} 置信度），"
+          f"每轮每种模式 {workers * chunk_size} 次...")
+    begin = time.time()
+
+    stats: Dict[str, StreamingStrategyStats] = {}
+    n = 0
+    efficiency = {}
+    converged = False
+    executor = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers)
+    with executor or contextlib.nullcontext():
+        while n < max_iterations:
+            starts = range(n, min(n + workers * chunk_size, max_iterations), chunk_size)
+            tasks = [(WELFARE_MODE_KEYS[mode],
+                      (config, schedule, num_pools, mode, [seed, s_idx, m_idx],
+                       start, min(chunk_size, max_iterations - start), True))
+                     for m_idx, mode in enumerate(WELFARE_MODES) for start in starts]
+            if executor is None:
+                chunks = [(mode_key, _run_chunk(*args)) for mode_key, args in tasks]
+            else:
+                futures = [(mode_key, executor.submit(_run_chunk, *args)) for mode_key, args in tasks]
+                chunks = [(mode_key, future.result()) for mode_key, future in futures]
+            for mode_key, chunk in chunks:
+                if mode_key in stats:
+                    stats[mode_key].merge(chunk)
+                else:
+                    stats[mode_key] = chunk
+            n = len(stats['baseline'])
+
+            efficiency = {key: efficiency_interval(stats['baseline'], stats[key], confidence)
+                          for key in mode_keys[1:]}
+            print(f"  {n} 次: " + " | ".join(f"{key} 效率 {value:.3f} ± {half:.3f}"
+                                            for key, (value, half) in efficiency.items()))
+            if n >= min_iterations and all(half <= precision for _, half in efficiency.values()):
+                converged = True
+                break
+
+    status = "达到目标精度" if converged else f"达到上限 {max_iterations} 次仍未达到目标精度"
+    print(f"{status}，共模拟 {n} 次，用时 {time.time() - begin:.1f} 秒")
+    return {
+        'results': stats,
+        'iterations': n,
+        'efficiency': efficiency,
+        'converged': converged,
+    }
@@ -0,0 +1,153 @@
+"""
+汇总立方体（策略 × 福利模式 的预汇总统计）
+
+模拟结束时把每个策略/福利模式的结果汇总为 StreamingStrategyStats：
+- 各列（实际投入、UP数等）的计数直方图 → 精确的均值、标准差、任意分位数
+- 每个卡池结束时小保底水位的计数 [池子, 水位]
+
+可视化与报告只读立方体，大小只与取值范围和池子数有关，与模拟次数无关。
+立方体保存在结果目录中（流式模式不保存逐次结果，也会保存立方体）：
+    simulation_results/
+    ├── cube.json   # 格式版本、GachaConfig、池子数、策略名、各列的均值、标准差与分位数摘要
+    └── cube.npz    # s{策略序号}_{福利模式}_{列名} 直方图、s{策略序号}_{福利模式}_pity_counts
+"""
+import dataclasses
+import json
+import os
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+from config import GachaConfig
+from strategy_results import COLUMNS, StrategyResults, as_results
+from strategy_schedule import BUILTIN_STRATEGIES
+from streaming_stats import StreamingHistogram, StreamingStrategyStats
+
+
+CUBE_FORMAT_NAME = 'gacha-aggregate-cube'
+CUBE_FORMAT_VERSION = 1
+CUBE_HEADER_FILE = 'cube.json'
+CUBE_DATA_FILE = 'cube.npz'
+
+# 头文件摘要中的分位数
+SUMMARY_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+Cube = Dict[str, Dict[str, StreamingStrategyStats]]
+
+
+def build_cube(all_strategies_data: Dict[str, Dict[str, Union[StrategyResults, StreamingStrategyStats]]],
+               max_pity: int = 80) -> Cube:
+    """由 all_strategies_data 建立立方体（流式统计原样使用，逐次结果汇总为直方图）"""
+    cube = {}
+    for name, modes in all_strategies_data.items():
+        cube[name] = {}
+        for mode_key, results in modes.items():
+            if not isinstance(results, StreamingStrategyStats):
+                results = StreamingStrategyStats.from_results(as_results(results), max_pity)
+            cube[name][mode_key] = results
+    return cube
+
+
+def summarize(stats: StreamingStrategyStats) -> Dict[str, Dict]:
+    """各列的均值、标准差与分位数（SUMMARY_QUANTILES）摘要"""
+    return {column: {'mean': stats.mean(column),
+                     'std': stats.std(column),
+                     'quantiles': [stats.quantile(column, q) for q in SUMMARY_QUANTILES]}
+            for column in COLUMNS}
+
+
+def _array_name(strategy_idx: int, mode_key: str, column: str) -> str:
+    return f"s{strategy_idx}_{mode_key}_{column}"
+
+
+def save_cube(path: str, cube: Cube, num_pools: int, config: GachaConfig,
+              seed: Optional[int] = None, iterations: Optional[int] = None):
+    """
+    保存立方体到结果目录 path（不存在则创建，已有的立方体会被覆盖）
+    """
+    os.makedirs(path, exist_ok=True)
+    titles = {schedule.name: schedule.title for schedule in BUILTIN_STRATEGIES}
+
+    arrays = {}
+    strategies = []
+    for s_idx, (name, modes) in enumerate(cube.items()):
+        entry = {'name': name, 'title': titles.get(name, name), 'modes': {}}
+        for mode_key, stats in modes.items():
+            for column, hist in stats.histograms.items():
+                arrays[_array_name(s_idx, mode_key, column)] = hist.counts
+            arrays[_array_name(s_idx, mode_key, 'pity_counts')] = stats.pity_counts
+            entry['modes'][mode_key] = {
+                'iterations': len(stats),
+                'welfare_invested': stats.welfare_invested,
+                'num_pools': stats.num_pools,
+                'max_pity': stats.max_pity,
+                'summary': summarize(stats),
+            }
+        strategies.append(entry)
+
+    tmp = os.path.join(path, f"{CUBE_DATA_FILE}.{os.getpid()}.tmp.npz")
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, os.path.join(path, CUBE_DATA_FILE))
+
+    header = {
+        'format': CUBE_FORMAT_NAME,
+        'version': CUBE_FORMAT_VERSION,
+        'config': dataclasses.asdict(config),
+        'num_pools': num_pools,
+        'seed': seed,
+        'iterations': iterations,
+        'summary_quantiles': list(SUMMARY_QUANTILES),
+        'strategies': strategies,
+    }
+    # 数据写完后再写头文件，中途失败不会留下看起来完整的立方体
+    with open(os.path.join(path, CUBE_HEADER_FILE), 'w', encoding='utf-8') as f:
+        json.dump(header, f, ensure_ascii=False, indent=2)
+
+
+def load_cube(path: str) -> Dict:
+    """
+    读取立方体
+
+    返回: {
+        'cube': {策略名: {福利模式: StreamingStrategyStats}},
+        'num_pools': int,
+        'config': Dict（GachaConfig 的字段）,
+        'seed': 随机种子,
+        'iterations': 模拟次数,
+        'header': 完整的头文件内容
+    }
+    """
+    with open(os.path.join(path, CUBE_HEADER_FILE), encoding='utf-8') as f:
+        header = json.load(f)
+    if header.get('format') != CUBE_FORMAT_NAME:
+        raise ValueError(f"'{path}' 中没有汇总立方体")
+    if header.get('version') != CUBE_FORMAT_VERSION:
+        raise ValueError(f"不支持的立方体格式版本: {header.get('version')}（当前版本 {CUBE_FORMAT_VERSION}）")
+
+    cube = {}
+    with np.load(os.path.join(path, CUBE_DATA_FILE)) as data:
+        for s_idx, entry in enumerate(header['strategies']):
+            modes = {}
+            for mode_key, info in entry['modes'].items():
+                stats = StreamingStrategyStats(info['num_pools'], info['max_pity'])
+                for column in COLUMNS:
+                    stats.histograms[column] = StreamingHistogram()
+                    stats.histograms[column].counts = data[_array_name(s_idx, mode_key, column)]
+                stats.pity_counts = data[_array_name(s_idx, mode_key, 'pity_counts')]
+                stats.welfare_invested = info['welfare_invested']
+                modes[mode_key] = stats
+            cube[entry['name']] = modes
+
+    return {
+        'cube': cube,
+        'num_pools': header['num_pools'],
+        'config': header['config'],
+        'seed': header['seed'],
+        'iterations': header['iterations'],
+        'header': header,
+    }
+
+
+def is_cube_dir(path: str) -> bool:
+    """path 中是否有汇总立方体"""
+    return os.path.isfile(os.path.join(path, CUBE_HEADER_FILE))
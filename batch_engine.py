@@ -0,0 +1,393 @@
+"""
+批量抽卡模拟器（NumPy向量化）
+
+把 N 个相互独立的模拟同时推进，每一步对所有仍在抽卡的模拟做一次向量化的抽卡。
+规则与 simulator_core.GachaSimulator 完全一致：
+- 小保底（跨池继承）、大保底（仅当期，同时清空小保底）
+- 65抽后递增概率
+- 本期满30抽送特殊10抽（不计入保底）
+- 上期满60抽本期送正常10抽（计入保底）
+- 60送 + 限时福利一起抽完，永久福利逐个使用
+"""
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from config import GachaConfig
+from pool_state import PoolStateArray
+from rng import CommonRandomStreams
+
+
+# 六星类型概率（与 GachaSimulator.determine_ssr_type 一致）
+CURRENT_UP_THRESHOLD = 0.5  # 50%：当期UP
+OLD_UP_THRESHOLD = 0.5 + 0.5 * 2 / 7  # 14.2857%：往期UP，其余为常驻
+
+# pull_until_target 返回的列名（与单次模拟的结果字典字段一致）
+RESULT_FIELDS = (
+    'pulls', 'total_pulls', 'bonus_used', 'bonus_normal_used', 'bonus_special_used',
+    'welfare_used', 'welfare_limited_used', 'welfare_permanent_used', 'pool_pulls', 'old_up_count'
+)
+
+# pull_bonus_and_free_limited_welfare 额外返回的列名
+SKIP_RESULT_FIELDS = RESULT_FIELDS + ('got_target', 'current_up_count')
+
+# 批量推进时局部状态矩阵的行
+_ROWS = ('small', 'large', 'total', 'got30', 'special', 'perm', 'block', 'actual',
+         'special_used', 'perm_used', 'current_up', 'old_up', 'gap', 'gap_large')
+(_SMALL, _LARGE, _TOTAL, _GOT30, _SPECIAL, _PERM, _BLOCK, _ACTUAL,
+ _SPECIAL_USED, _PERM_USED, _CURRENT_UP, _OLD_UP, _GAP, _GAP_LARGE) = range(len(_ROWS))
+
+# 公共随机数模式下各用途的流：6星间隔、6星类型、特殊10抽
+CRN_STREAMS = ('gap', 'type', 'special')
+_CRN_GAP, _CRN_TYPE, _CRN_SPECIAL = range(len(CRN_STREAMS))
+
+
+class BatchGachaSimulator(PoolStateArray):
+    """
+    批量抽卡模拟器
+
+    状态即 PoolStateArray：每个状态字段都是长度为 n 的数组，第 i 个元素对应第 i 个独立模拟
+    （reset_for_new_pool 也继承自 PoolStateArray）。
+    接口与 GachaSimulator 对应，返回值为列式数组字典（每列长度为 n）。
+    """
+
+    def __init__(self, config: GachaConfig, n: int, rng: Optional[np.random.Generator] = None,
+                 seed: Optional[int] = None, crn: Optional[CommonRandomStreams] = None):
+        """
+        crn: 公共随机数（按模拟编号对齐，需要 len(CRN_STREAMS) 个流）；
+             给定时所有抽卡随机数都从 crn 取，第 i 次模拟的结果只取决于 crn 和它自己的状态
+        """
+        super().__init__(n)
+        self.config = config
+        self.rng = rng if rng is not None else np.random.default_rng(seed)
+        self.crn = crn
+
+    def pull_until_target(self, use_welfare: bool = False,
+                          mask: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        所有被选中的模拟各自抽到目标UP为止
+        use_welfare: 是否使用永久福利抽
+        mask: 布尔数组，只推进被选中的模拟（None 表示全部）
+
+        返回: 与 GachaSimulator.pull_until_target 字段相同的列式数组字典，
+              未被选中的模拟对应位置为 0
+        """
+        acc = BatchPullAccumulator(self.n, dtype=np.int32)
+        self.pull_until_target_into(acc, use_welfare, mask)
+        return acc.as_dict(skip_pool=False)
+
+    def pull_bonus_and_free_limited_welfare(self, use_limited_welfare: bool = False,
+                                            mask: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        只抽赠送的抽数和限时福利（跳过的池子）
+        返回字段与 GachaSimulator.pull_bonus_and_free_limited_welfare 相同
+        """
+        acc = BatchPullAccumulator(self.n, dtype=np.int32)
+        self.pull_bonus_and_free_limited_welfare_into(acc, use_limited_welfare, mask)
+        return acc.as_dict(skip_pool=True)
+
+    def pull_until_target_into(self, acc: 'BatchPullAccumulator', use_welfare: bool = False,
+                               mask: Optional[np.ndarray] = None) -> 'BatchPullAccumulator':
+        """pull_until_target 的累加形式：被选中模拟的结果直接累加到 acc 的数组中（不创建结果字典）"""
+        self._run(acc, mask, use_welfare=use_welfare, skip_pool=False)
+        return acc
+
+    def pull_bonus_and_free_limited_welfare_into(self, acc: 'BatchPullAccumulator', use_limited_welfare: bool = False,
+                                                 mask: Optional[np.ndarray] = None) -> 'BatchPullAccumulator':
+        """pull_bonus_and_free_limited_welfare 的累加形式"""
+        self._run(acc, mask, use_welfare=use_limited_welfare, skip_pool=True)
+        return acc
+
+    def _run(self, acc: 'BatchPullAccumulator', mask: Optional[np.ndarray], use_welfare: bool, skip_pool: bool):
+        """
+        批量推进被选中的模拟直到各自结束本池
+
+        按事件推进而不是逐抽推进：每个模拟一次性抽取"距离下一个6星还需几抽"，
+        然后直接跳到下一个需要处理的事件（出6星、满30抽送特殊10抽、60送/限时福利抽完），
+        中间的抽卡只做计数。特殊10抽一次性按二项分布/多项分布结算。
+        """
+        config = self.config
+        rng = self.rng
+        crn = self.crn
+        flat_cdf, row_len = self._gap_table()
+
+        gidx = np.arange(self.n) if mask is None else np.flatnonzero(mask)
+        size = len(gidx)
+
+        # 优先级1的抽数：60送正常10抽 + 限时福利（跳过池子仅在方案1时使用限时福利）
+        bonus_normal = self.bonus_10_normal[gidx]
+        if skip_pool and not use_welfare:
+            welfare_limited = np.zeros_like(bonus_normal)
+        else:
+            welfare_limited = self.welfare_limited[gidx]
+            self.welfare_limited[gidx] = 0
+        self.bonus_10_normal[gidx] = 0
+
+        # 活跃模拟的局部状态：每一行是一个状态量，每一列是一个模拟（每轮把结束本池的模拟移出）
+        cols = np.zeros((len(_ROWS), size), dtype=np.int16)
+        cols[_SMALL] = self.small_pity_counter[gidx]
+        cols[_LARGE] = self.large_pity_counter[gidx]
+        cols[_TOTAL] = self.total_pulls[gidx]
+        cols[_GOT30] = self.got_30_bonus[gidx]
+        cols[_SPECIAL] = self.bonus_10_special[gidx]
+        cols[_PERM] = self.welfare_permanent[gidx]
+        cols[_BLOCK] = bonus_normal + welfare_limited
+        cols[_GAP] = -1  # 距离下一个6星的剩余抽数（-1表示需要重新抽取）
+        pos = np.arange(size)  # 在 gidx 中的位置
+        done_pos = []
+        done_cols = []
+
+        base_rate = config.base_ssr_rate
+        use_permanent = use_welfare and not skip_pool
+        type_pvals = [CURRENT_UP_THRESHOLD, OLD_UP_THRESHOLD - CURRENT_UP_THRESHOLD, 1 - OLD_UP_THRESHOLD]
+
+        if skip_pool:
+            # 跳过的池子只抽优先级1，没有需要抽的模拟直接结束
+            finished = cols[_BLOCK] == 0
+        else:
+            finished = np.zeros(size, dtype=bool)
+
+        while True:
+            if finished.any():
+                keep = ~finished
+                done_pos.append(pos[finished])
+                done_cols.append(cols[:, finished])
+                pos = pos[keep]
+                cols = cols[:, keep]
+
+            m = len(pos)
+            if m == 0:
+                break
+            finished = np.zeros(m, dtype=bool)
+            trials = gidx[pos] if crn is not None else None  # 公共随机数按模拟编号取值
+
+            special = cols[_SPECIAL]
+            block = cols[_BLOCK]
+            current_up = cols[_CURRENT_UP]
+
+            # 优先级2：30送的特殊10抽（60送/限时福利抽完后一次性结算，不计入保底）
+            do_special = (special > 0) & (block == 0)
+            sp = np.flatnonzero(do_special)
+            if len(sp):
+                count = special[sp]
+                if crn is None:
+                    ssr_count = rng.binomial(count, base_rate)
+                    types = rng.multinomial(ssr_count, type_pvals)
+                else:
+                    ssr_count, types = self._crn_special(count, trials[sp])
+                current_up[sp] += types[:, 0].astype(np.int16)
+                cols[_OLD_UP, sp] += types[:, 1].astype(np.int16)
+                cols[_SPECIAL_USED, sp] += count
+                special[sp] = 0
+                finished[sp] = current_up[sp] > 0
+                if len(sp) == m:
+                    continue
+                # 其余模拟取出来单独推进，推进完再写回
+                nm = np.flatnonzero(~do_special)
+                sub = cols[:, nm]
+                sub_trials = trials[nm] if crn is not None else None
+            else:
+                # 没有特殊抽时直接在整块状态上原地计算
+                nm = None
+                sub = cols
+                sub_trials = trials
+
+            small = sub[_SMALL]
+            large = sub[_LARGE]
+            total = sub[_TOTAL]
+            got30 = sub[_GOT30]
+            block = sub[_BLOCK]
+            gap = sub[_GAP]
+            gap_large = sub[_GAP_LARGE]
+
+            # 抽取距离下一个6星的抽数（小保底/递增概率的逆CDF），并受大保底截断
+            need = np.flatnonzero(gap < 0)
+            if len(need):
+                s = small[need]
+                u = rng.random(len(need)) if crn is None else crn.uniform(_CRN_GAP, sub_trials[need])
+                k = np.searchsorted(flat_cdf, u + 2.0 * s, side='right') - s * row_len + 1
+                k_large = config.large_pity - large[need]
+                gap_large[need] = k_large <= k
+                gap[need] = np.minimum(k, k_large)
+
+            # 本次推进的抽数：不越过下一个6星、满30抽奖励和60送/限时福利的结束点
+            d = gap.copy()
+            to_30 = 30 - total
+            np.minimum(d, to_30, out=d, where=(got30 == 0) & (to_30 > 0))
+            np.minimum(d, block, out=d, where=block > 0)
+
+            # 按优先级分配抽数：60送/限时福利 → 永久福利 → 实际投入
+            from_block = np.minimum(d, block)
+            rest = d - from_block
+            if use_permanent:
+                from_perm = np.minimum(rest, sub[_PERM])
+                sub[_PERM] -= from_perm
+                sub[_PERM_USED] += from_perm
+                rest -= from_perm
+            sub[_ACTUAL] += rest
+            block -= from_block
+            last_in_block = (from_block > 0) & (from_block == d)
+
+            small += d
+            large += d
+            total += d
+            gap -= d
+
+            # 检查30抽奖励
+            trigger_30 = (got30 == 0) & (total >= 30)
+            got30[trigger_30] = 1
+            sub[_SPECIAL, trigger_30] = 10
+
+            # 本抽出6星：大保底必定当期UP，否则判断六星类型
+            hit = np.flatnonzero(gap == 0)
+            is_current = np.zeros(len(gap), dtype=bool)
+            if len(hit):
+                u = rng.random(len(hit)) if crn is None else crn.uniform(_CRN_TYPE, sub_trials[hit])
+                hit_large = gap_large[hit] != 0
+                cur = hit_large | (u < CURRENT_UP_THRESHOLD)
+                old = ~hit_large & (u >= CURRENT_UP_THRESHOLD) & (u < OLD_UP_THRESHOLD)
+                is_current[hit] = cur
+                small[hit] = 0
+                large[hit[cur]] = 0
+                gap[hit] = -1
+                sub[_CURRENT_UP, hit] += cur
+                sub[_OLD_UP, hit] += old
+
+            # 结束条件：一次性抽完的部分抽完后检查是否已出UP，逐抽部分出UP立即结束
+            if skip_pool:
+                sub_finished = block == 0
+            else:
+                block_done = last_in_block & (block == 0) & (sub[_CURRENT_UP] > 0)
+                sub_finished = block_done | (is_current & ~last_in_block)
+
+            if nm is None:
+                finished = sub_finished
+            else:
+                cols[:, nm] = sub
+                finished[nm] = sub_finished
+
+        self._collect(acc, mask, gidx, done_pos, done_cols, bonus_normal, welfare_limited, skip_pool)
+
+    def _crn_special(self, count: np.ndarray, trials: np.ndarray):
+        """
+        公共随机数模式下结算特殊10抽：6星个数用一个均匀数按二项分布逆CDF抽取，
+        每个6星的类型再各用一个均匀数（与普通抽卡的类型判断相同）
+        返回: (6星个数, 各类型个数 [当期UP, 往期UP, 常驻])
+        """
+        p = self.config.base_ssr_rate
+        u = self.crn.uniform(_CRN_SPECIAL, trials)
+        ssr_count = np.zeros(len(trials), dtype=np.int64)
+        for c in np.unique(count):
+            cdf = np.cumsum([math.comb(int(c), k) * p ** k * (1 - p) ** (c - k) for k in range(c + 1)])
+            sel = count == c
+            ssr_count[sel] = np.minimum(np.searchsorted(cdf, u[sel], side='right'), c)
+
+        types = np.zeros((len(trials), 3), dtype=np.int64)
+        for j in range(int(ssr_count.max(initial=0))):
+            sel = np.flatnonzero(ssr_count > j)
+            u = self.crn.uniform(_CRN_SPECIAL, trials[sel])
+            types[sel, 0] += u < CURRENT_UP_THRESHOLD
+            types[sel, 1] += (u >= CURRENT_UP_THRESHOLD) & (u < OLD_UP_THRESHOLD)
+        types[:, 2] = ssr_count - types[:, 0] - types[:, 1]
+        return ssr_count, types
+
+    def _collect(self, acc: 'BatchPullAccumulator', mask, gidx, done_pos, done_cols, bonus_normal,
+                 welfare_limited, skip_pool):
+        """把结束本池的模拟写回状态，结果累加到 acc"""
+        # 按结束顺序收集的状态还原为 gidx 的顺序
+        final = np.zeros((len(_ROWS), len(gidx)), dtype=np.int16)
+        if done_pos:
+            final[:, np.concatenate(done_pos)] = np.concatenate(done_cols, axis=1)
+        sel = slice(None) if mask is None else gidx
+
+        self.small_pity_counter[sel] = final[_SMALL]
+        self.large_pity_counter[sel] = final[_LARGE]
+        self.total_pulls[sel] = final[_TOTAL]
+        self.got_30_bonus[sel] = final[_GOT30]
+        self.bonus_10_special[sel] = final[_SPECIAL]
+        self.welfare_permanent[sel] = final[_PERM]
+
+        if skip_pool:
+            # 跳过的池子不应该够到30抽赠送10抽
+            assert not final[_SPECIAL].any(), "跳过的池子不应该够到30抽赠送10抽"
+
+        # 未选中的模拟保持不变（gidx 无重复，可以直接按下标累加）
+        acc.pulls[sel] += final[_ACTUAL]
+        acc.bonus_normal_used[sel] += bonus_normal
+        acc.bonus_special_used[sel] += final[_SPECIAL_USED]
+        acc.welfare_limited_used[sel] += welfare_limited
+        acc.welfare_permanent_used[sel] += final[_PERM_USED]
+        acc.current_up_count[sel] += final[_CURRENT_UP]
+        acc.old_up_count[sel] += final[_OLD_UP]
+        acc.pool_pulls[sel] = final[_TOTAL]
+
+    def _gap_table(self):
+        """
+        距离下一个6星所需抽数的累积分布表（按当前小保底水位分行）
+
+        第 s 行第 j 列为：从水位 s 开始，j+1 抽内出6星的概率。
+        每行加上 2*s 的偏移后展平成单调数组，可以用一次 searchsorted 对所有模拟做逆CDF抽样。
+        """
+        config = self.config
+        cached = getattr(self, '_gap_table_cache', None)
+        if cached is not None:
+            return cached
+
+        row_len = config.small_pity
+        table = np.ones((config.small_pity, row_len))
+        for s in range(config.small_pity):
+            survive = 1.0
+            for j in range(row_len):
+                counter = s + j + 1
+                if counter >= config.small_pity:
+                    rate = 1.0
+                else:
+                    rate = config.base_ssr_rate
+                    if counter > config.increase_threshold:
+                        rate += (counter - config.increase_threshold) * config.increase_rate
+                    rate = min(rate, 1.0)
+                survive *= 1.0 - rate
+                table[s, j] = 1.0 - survive
+        flat = (table + 2.0 * np.arange(config.small_pity)[:, None]).ravel()
+        self._gap_table_cache = (flat, row_len)
+        return self._gap_table_cache
+
+
+class BatchPullAccumulator:
+    """
+    批量结果的累加记录（pull_until_target_into 等方法的输出）
+    每个字段是长度为 n 的数组；各计数在多次调用之间累加，pool_pulls 为各模拟最近一个卡池的总抽数
+    """
+
+    FIELDS = ('pulls', 'bonus_normal_used', 'bonus_special_used', 'welfare_limited_used',
+              'welfare_permanent_used', 'current_up_count', 'old_up_count', 'pool_pulls')
+
+    def __init__(self, n: int, dtype=np.int64):
+        self.n = n
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(n, dtype=dtype))
+
+    def clear(self):
+        """清零所有计数"""
+        for name in self.FIELDS:
+            getattr(self, name)[:] = 0
+
+    @property
+    def welfare_used(self) -> np.ndarray:
+        return self.welfare_limited_used + self.welfare_permanent_used
+
+    def pull_counts(self) -> Tuple[int, int, int]:
+        """(正常抽, 特殊抽, 福利抽) 的累计数量（所有模拟之和）"""
+        return (int(self.pulls.sum() + self.bonus_normal_used.sum()), int(self.bonus_special_used.sum()),
+                int(self.welfare_used.sum()))
+
+    def as_dict(self, skip_pool: bool = False) -> Dict[str, np.ndarray]:
+        """列式结果字典（字段为 RESULT_FIELDS，跳过的池子为 SKIP_RESULT_FIELDS）"""
+        out = {name: getattr(self, name) for name in self.FIELDS}
+        out['bonus_used'] = self.bonus_normal_used + self.bonus_special_used
+        out['welfare_used'] = self.welfare_used
+        out['total_pulls'] = self.pulls + out['bonus_used'] + out['welfare_used']
+        if skip_pool:
+            out['got_target'] = self.current_up_count > 0  # 是否意外获得了当期UP
+        return {name: out[name] for name in (SKIP_RESULT_FIELDS if skip_pool else RESULT_FIELDS)}
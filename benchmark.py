@@ -0,0 +1,397 @@
+"""
+性能基准与统计一致性检查
+
+性能基准（结果保存为 JSON 基准，之后的运行与基准比较，变慢超过容差的项标记为退化）：
+- single_pull_normal 每秒抽数（python / compiled 后端；skip_ahead 逐抽部分与 python 相同，不单独测）
+- 从不同小保底水位进入时 pull_until_target 每秒模拟次数
+- 6种策略 × 36池 每秒模拟次数（各引擎，三种福利模式合计）
+- 模拟结果的保存 / 加载用时（results_store / visualizer.load_simulation_results）
+
+统计一致性检查（更快的引擎必须与参考实现给出同一分布）：
+- compiled 后端与 GachaSimulator 在同一随机数流下结果逐位相同
+- GachaSimulator、skip_ahead 后端、批量引擎的单池抽数分布与 ExactSolver 的精确分布做卡方拟合优度检验
+- 各引擎的策略花费分布与批量引擎做两样本 KS 检验
+
+用法:
+    python benchmark.py                   # 运行并与 benchmark_baseline.json 比较
+    python benchmark.py --save-baseline   # 把本次结果保存为基准
+    python benchmark.py --quick           # 缩小规模，快速检查
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from statistics import NormalDist
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batch_engine import BatchGachaSimulator
+from config import GachaConfig
+from exact_solver import ExactSolver, entry_state
+from pull_kernel import BACKENDS, HAS_NUMBA, create_simulator
+from results_store import save_results
+from rng import GachaRNG
+from strategy_schedule import BUILTIN_STRATEGIES, WELFARE_MODES, WELFARE_MODE_KEYS, StrategySchedule
+from strategy_simulator import ENGINES, StrategySimulator
+
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_TOLERANCE = 0.2  # 比基准慢 20% 以上记为退化
+DEFAULT_ALPHA = 1e-3  # 统计检验的显著性水平（检验较多，取得较严）
+ENTRY_PITIES = (0, 30, 60, 75)  # pull_until_target 基准的进入水位
+
+Metrics = Dict[str, Dict]
+
+
+def _best_time(func: Callable[[], object], repeat: int = 3) -> float:
+    """多次运行取最短用时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - begin)
+    return best
+
+
+def _quiet(func: Callable, *args, **kwargs):
+    """不输出进度信息地调用"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def _metric(value: float, unit: str, higher_is_better: bool = True) -> Dict:
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+# ==================== 性能基准 ====================
+
+def bench_single_pull(config: GachaConfig, n: int, backend: str) -> float:
+    """single_pull_normal 每秒抽数（每抽完一个池子的量就换新状态，避免大保底计数溢出）"""
+    simulator = create_simulator(config, GachaRNG(0), backend)
+    simulator.single_pull_normal()  # 预热（编译）
+
+    def run():
+        for i in range(n):
+            if i % 100 == 0:
+                simulator.state.reset()
+            simulator.single_pull_normal()
+
+    return n / _best_time(run)
+
+
+def bench_pull_until_target(config: GachaConfig, small_pity_counter: int, n: int, backend: str) -> float:
+    """从给定小保底水位进入新卡池时 pull_until_target 每秒模拟次数"""
+    simulator = create_simulator(config, GachaRNG(0), backend)
+    simulator.pull_until_target()  # 预热（编译）
+
+    def run():
+        for _ in range(n):
+            simulator.state.reset()
+            simulator.state.small_pity_counter = small_pity_counter
+            simulator.pull_until_target()
+
+    return n / _best_time(run)
+
+
+def bench_strategy(config: GachaConfig, schedule: StrategySchedule, num_pools: int, iterations: int,
+                   engine: str, pool_cache=None) -> Tuple[float, Dict]:
+    """
+    一个策略三种福利模式的每秒模拟次数
+    返回: (每秒模拟次数, {福利模式键: StrategyResults})
+    """
+    data = {}
+
+    def run():
+        for m_idx, welfare_mode in enumerate(WELFARE_MODES):
+            simulator = StrategySimulator(config, iterations=iterations, rng=GachaRNG([0, m_idx]),
+                                          engine=engine, pool_cache=pool_cache)
+            data[WELFARE_MODE_KEYS[welfare_mode]] = _quiet(simulator.simulate_schedule, schedule, num_pools,
+                                                           welfare_mode)
+
+    elapsed = _best_time(run, repeat=1)
+    return len(WELFARE_MODES) * iterations / elapsed, data
+
+
+def bench_save_load(config: GachaConfig, all_strategies_data: Dict, num_pools: int) -> Dict[str, float]:
+    """保存、加载（内存映射打开）与读入全部列的用时（秒）"""
+    from visualizer import load_simulation_results
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'simulation_results')
+        save = _best_time(lambda: save_results(path, all_strategies_data, num_pools, config))
+        load = _best_time(lambda: _quiet(load_simulation_results, path))
+
+        def read_all():
+            loaded = _quiet(load_simulation_results, path)
+            for modes in loaded['all_strategies_data'].values():
+                for results in modes.values():
+                    for value in vars(results).values():
+                        if isinstance(value, np.ndarray):
+                            np.asarray(value).sum()
+
+        read = _best_time(read_all)
+    return {'save': save, 'load': load, 'load_and_read': read}
+
+
+def run_benchmarks(config: GachaConfig, num_pools: int = 36, quick: bool = False,
+                   engines: Sequence[str] = ENGINES) -> Metrics:
+    """运行全部性能基准，返回 {指标名: {'value', 'unit', 'higher_is_better'}}"""
+    pulls = 20000 if quick else 200000
+    trials = 2000 if quick else 20000
+    iterations = 1000 if quick else 5000
+    metrics: Metrics = {}
+
+    for backend in BACKENDS:
+        if backend != 'skip_ahead':
+            print(f"single_pull_normal（{backend}）...")
+            metrics[f'single_pull_normal/{backend}'] = _metric(bench_single_pull(config, pulls, backend), 'pulls/s')
+        for small in ENTRY_PITIES:
+            print(f"pull_until_target 水位{small}（{backend}）...")
+            metrics[f'pull_until_target/pity{small}/{backend}'] = _metric(
+                bench_pull_until_target(config, small, trials, backend), 'trials/s')
+
+    all_strategies_data = None
+    for engine in engines:
+        pool_cache = _warm_pool_cache(config) if engine == 'alias' else None
+        data = {}
+        for schedule in BUILTIN_STRATEGIES:
+            print(f"{schedule.name} × {num_pools}池（{engine} 引擎）...")
+            rate, data[schedule.name] = bench_strategy(config, schedule, num_pools, iterations, engine, pool_cache)
+            metrics[f'strategy/{schedule.name}/{engine}'] = _metric(rate, 'trials/s')
+        if all_strategies_data is None:
+            all_strategies_data = data
+
+    if all_strategies_data is not None:
+        print("保存 / 加载模拟结果...")
+        for name, seconds in bench_save_load(config, all_strategies_data, num_pools).items():
+            metrics[f'results/{name}'] = _metric(seconds, 's', higher_is_better=False)
+    return metrics
+
+
+def _warm_pool_cache(config: GachaConfig):
+    """alias 引擎的单池分布缓存（求解与读盘不计入基准用时）"""
+    from pool_cache import DEFAULT_POOL_CACHE_DIR, PoolDistributionCache, warm_pool_cache
+
+    warm_pool_cache(config, DEFAULT_POOL_CACHE_DIR)
+    pool_cache = PoolDistributionCache(config, cache_dir=DEFAULT_POOL_CACHE_DIR)
+    for key in pool_cache.all_keys():
+        pool_cache.get(key)
+    return pool_cache
+
+
+# ==================== 基准比较 ====================
+
+def save_baseline(path: str, metrics: Metrics, quick: bool):
+    baseline = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numba': HAS_NUMBA,
+        'quick': quick,
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'metrics': metrics,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    if not os.path.isfile(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_with_baseline(metrics: Metrics, baseline: Optional[Dict], tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """打印本次结果（及与基准的比值），返回退化的指标名"""
+    old = baseline['metrics'] if baseline else {}
+    regressions = []
+    print(f"\n{'指标':<40} | {'本次':>14} | {'基准':>14} | {'比值':>6}")
+    for name, metric in metrics.items():
+        value, unit = metric['value'], metric['unit']
+        line = f"{name:<40} | {value:>10.4g} {unit:<3}"
+        if name in old:
+            base = old[name]['value']
+            # 比值 > 1 表示变快
+            speedup = value / base if metric['higher_is_better'] else base / value
+            flag = ''
+            if speedup < 1 - tolerance:
+                regressions.append(name)
+                flag = '  ⚠ 退化'
+            line += f" | {base:>10.4g} {unit:<3} | {speedup:>6.2f}{flag}"
+        print(line)
+    return regressions
+
+
+# ==================== 统计一致性检查 ====================
+
+def ks_2samp(a: np.ndarray, b: np.ndarray) -> Tuple[float, float]:
+    """
+    两样本 Kolmogorov-Smirnov 检验
+    返回: (D 统计量, 近似 p 值)。离散分布下 p 值偏保守（不容易误报）
+    """
+    a = np.sort(np.asarray(a, dtype=np.float64))
+    b = np.sort(np.asarray(b, dtype=np.float64))
+    values = np.concatenate([a, b])
+    cdf_a = np.searchsorted(a, values, side='right') / len(a)
+    cdf_b = np.searchsorted(b, values, side='right') / len(b)
+    d = float(np.abs(cdf_a - cdf_b).max())
+    en = math.sqrt(len(a) * len(b) / (len(a) + len(b)))
+    lam = (en + 0.12 + 0.11 / en) * d
+    # Kolmogorov 分布的尾概率级数
+    p = 2 * sum((-1) ** (k - 1) * math.exp(-2 * k * k * lam * lam) for k in range(1, 101))
+    return d, min(max(p, 0.0), 1.0)
+
+
+def chi2_sf(x: float, dof: int) -> float:
+    """卡方分布的尾概率（Wilson-Hilferty 正态近似）"""
+    if dof <= 0:
+        return 1.0
+    z = ((x / dof) ** (1 / 3) - (1 - 2 / (9 * dof))) / math.sqrt(2 / (9 * dof))
+    return 1 - NormalDist().cdf(z)
+
+
+def chi2_goodness_of_fit(samples: np.ndarray, pmf: Dict[int, float],
+                         min_expected: float = 5.0) -> Tuple[float, int, float]:
+    """
+    卡方拟合优度检验：样本是否来自精确分布 pmf
+    期望频数不足 min_expected 的相邻取值合并成一格
+    返回: (卡方统计量, 自由度, p 值)
+    """
+    n = len(samples)
+    values, counts = np.unique(samples, return_counts=True)
+    observed = dict(zip(values.tolist(), counts.tolist()))
+    unexpected = set(observed) - set(pmf)
+    if unexpected:
+        # 出现了精确分布中不可能的取值
+        return float('inf'), 0, 0.0
+
+    stat, cells = 0.0, 0
+    obs_acc = exp_acc = 0.0
+    for value, p in sorted(pmf.items()):
+        obs_acc += observed.get(value, 0)
+        exp_acc += n * p
+        if exp_acc >= min_expected:
+            stat += (obs_acc - exp_acc) ** 2 / exp_acc
+            cells += 1
+            obs_acc = exp_acc = 0.0
+    if exp_acc > 0:
+        stat += (obs_acc - exp_acc) ** 2 / exp_acc
+        cells += 1
+    return stat, cells - 1, chi2_sf(stat, cells - 1)
+
+
+def _scalar_pulls(config: GachaConfig, small_pity_counter: int, n: int, seed: int, backend: str) -> List[Dict]:
+    simulator = create_simulator(config, GachaRNG(seed), backend)
+    results = []
+    for _ in range(n):
+        simulator.state.reset()
+        simulator.state.small_pity_counter = small_pity_counter
+        results.append(simulator.pull_until_target())
+    return results
+
+
+def check_equivalence(config: GachaConfig, num_pools: int = 36, quick: bool = False, seed: int = 1,
+                      engines: Sequence[str] = ENGINES, alpha: float = DEFAULT_ALPHA) -> List[Tuple[str, str, bool]]:
+    """
+    统计一致性检查
+    返回: [(检查名, 结果描述, 是否通过)]
+    """
+    trials = 5000 if quick else 50000
+    iterations = 2000 if quick else 10000
+    solver = ExactSolver(config)
+    checks = []
+
+    def record(name: str, detail: str, passed: bool):
+        checks.append((name, detail, passed))
+        print(f"  {'✓' if passed else '✗'} {name}: {detail}")
+
+    print(f"\n统计一致性检查（显著性水平 {alpha:g}）")
+    for small in ENTRY_PITIES:
+        python_results = _scalar_pulls(config, small, trials // 5, seed, 'python')
+        compiled_results = _scalar_pulls(config, small, trials // 5, seed, 'compiled')
+        record(f"compiled 后端逐位一致 水位{small}", f"{len(python_results)} 次",
+               python_results == compiled_results)
+
+        pmf = solver.solve_pull_until_target(entry_state(small), fields=('pulls',)).marginal('pulls')
+        scalar = np.array([r['pulls'] for r in _scalar_pulls(config, small, trials, seed, 'python')])
+        stat, dof, p = chi2_goodness_of_fit(scalar, pmf)
+        record(f"GachaSimulator vs 精确分布 水位{small}", f"χ²={stat:.1f} 自由度={dof} p={p:.3g}", p >= alpha)
+
+        skip_ahead = np.array([r['pulls'] for r in _scalar_pulls(config, small, trials, seed, 'skip_ahead')])
+        stat, dof, p = chi2_goodness_of_fit(skip_ahead, pmf)
+        record(f"skip_ahead 后端 vs 精确分布 水位{small}", f"χ²={stat:.1f} 自由度={dof} p={p:.3g}", p >= alpha)
+
+        batch = BatchGachaSimulator(config, trials, seed=seed)
+        batch.small_pity_counter[:] = small
+        stat, dof, p = chi2_goodness_of_fit(batch.pull_until_target()['pulls'], pmf)
+        record(f"批量引擎 vs 精确分布 水位{small}", f"χ²={stat:.1f} 自由度={dof} p={p:.3g}", p >= alpha)
+
+    reference = {}
+    for engine in engines:
+        pool_cache = _warm_pool_cache(config) if engine == 'alias' else None
+        for s_idx, schedule in enumerate(BUILTIN_STRATEGIES):
+            for m_idx, welfare_mode in enumerate(WELFARE_MODES):
+                # 各引擎使用不同的种子（相同种子会让两组样本相关，检验失去意义）
+                rng = GachaRNG([seed, ENGINES.index(engine), s_idx, m_idx])
+                simulator = StrategySimulator(config, iterations=iterations, rng=rng, engine=engine,
+                                              pool_cache=pool_cache)
+                spent = _quiet(simulator.simulate_schedule, schedule, num_pools, welfare_mode).user_spent
+                key = (schedule.name, WELFARE_MODE_KEYS[welfare_mode])
+                if engine == 'batch':
+                    reference[key] = spent
+                elif key in reference:
+                    d, p = ks_2samp(spent, reference[key])
+                    record(f"{engine} vs batch {key[0]}/{key[1]}", f"D={d:.4f} p={p:.3g}", p >= alpha)
+    return checks
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="性能基准与统计一致性检查")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基准 JSON 文件")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基准")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="判定退化的相对容差")
+    parser.add_argument('--quick', action='store_true', help="缩小规模，快速检查")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="要测试的策略引擎（逗号分隔）")
+    parser.add_argument('--skip-perf', action='store_true', help="只做统计一致性检查")
+    parser.add_argument('--skip-stats', action='store_true', help="只做性能基准")
+    args = parser.parse_args(argv)
+
+    engines = [e for e in args.engines.split(',') if e]
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"未知引擎: {', '.join(sorted(unknown))}（可选 {', '.join(ENGINES)}）")
+    config = GachaConfig()
+    print(f"numba: {'已安装' if HAS_NUMBA else '未安装（compiled 后端以纯 Python 运行）'}")
+
+    failed = []
+    if not args.skip_perf:
+        metrics = run_benchmarks(config, quick=args.quick, engines=engines)
+        baseline = load_baseline(args.baseline)
+        if baseline is not None and baseline.get('quick') != args.quick:
+            print(f"\n基准 {args.baseline} 的规模与本次不同（--quick），不做比较")
+            baseline = None
+        regressions = compare_with_baseline(metrics, baseline, args.tolerance)
+        if regressions:
+            print(f"\n⚠ {len(regressions)} 项比基准慢 {args.tolerance:.0%} 以上: {', '.join(regressions)}")
+            failed += regressions
+        if args.save_baseline:
+            save_baseline(args.baseline, metrics, args.quick)
+            print(f"\n✓ 基准已保存至: {args.baseline}")
+
+    if not args.skip_stats:
+        checks = check_equivalence(config, quick=args.quick, engines=engines)
+        failed += [name for name, _, passed in checks if not passed]
+        print(f"\n统计一致性: {sum(passed for _, _, passed in checks)}/{len(checks)} 项通过")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+模拟的检查点（中断后续跑）
+
+run_all_strategies 把模拟切成块，从第 i 次模拟开始的块使用随机数流
+GachaRNG([种子, 策略, 福利模式]).stream(i)：块的随机数状态完全由种子和块的位置决定。
+因此只要把完成的块逐个保存下来，续跑时跳过已完成的块、其余块照常从各自的随机数流开始，
+最终结果与不中断的运行逐位相同。
+
+检查点是一个目录：
+    checkpoint/
+    ├── manifest.json                  # 运行参数（GachaConfig、池子数、次数、种子、块大小、模式、引擎）
+    └── {策略序号}_{福利模式}_{起始编号}.pkl  # 每个完成的块一个文件（写完后原子改名）
+参数不同的运行不会读取别人的检查点（报错，而不是把不同的结果拼在一起）。
+"""
+import dataclasses
+import json
+import os
+import pickle
+import shutil
+from typing import Dict, Set, Tuple
+
+from config import GachaConfig
+
+
+DEFAULT_CHECKPOINT_DIR = 'checkpoint'
+MANIFEST_FILE = 'manifest.json'
+CHECKPOINT_VERSION = 1
+
+ChunkKey = Tuple[int, str, int]  # (策略序号, 福利模式, 起始编号)
+
+
+class Checkpoint:
+    """按块保存 / 读取模拟结果"""
+
+    def __init__(self, path: str, config: GachaConfig, **params):
+        """
+        path: 检查点目录（不存在则创建）
+        params: 决定结果的运行参数（num_pools、iterations、seed、chunk_size、streaming 等）
+        """
+        self.path = path
+        self.manifest = {
+            'version': CHECKPOINT_VERSION,
+            'config': dataclasses.asdict(config),
+            'params': params,
+        }
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                existing = json.load(f)
+            if existing != json.loads(json.dumps(self.manifest)):
+                raise ValueError(f"检查点 '{path}' 的运行参数与本次不同，请换一个目录或删除它")
+        else:
+            os.makedirs(path, exist_ok=True)
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+
+    def _chunk_file(self, key: ChunkKey) -> str:
+        s_idx, mode_key, start = key
+        return os.path.join(self.path, f"{s_idx}_{mode_key}_{start}.pkl")
+
+    def completed(self) -> Set[ChunkKey]:
+        """已完成的块"""
+        keys = set()
+        for name in os.listdir(self.path):
+            if name.endswith('.pkl'):
+                s_idx, mode_key, start = name[:-len('.pkl')].split('_')
+                keys.add((int(s_idx), mode_key, int(start)))
+        return keys
+
+    def save(self, key: ChunkKey, result):
+        """保存一个完成的块（先写临时文件再改名，中途中断不会留下残缺的块）"""
+        path = self._chunk_file(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def load(self, key: ChunkKey):
+        with open(self._chunk_file(key), 'rb') as f:
+            return pickle.load(f)
+
+    def load_all(self) -> Dict[ChunkKey, object]:
+        return {key: self.load(key) for key in self.completed()}
+
+    def clear(self):
+        """运行完成后删除检查点"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
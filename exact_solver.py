@@ -0,0 +1,315 @@
+"""
+单卡池精确求解器（马尔可夫链 / 动态规划）
+
+单个卡池从进入到结束的过程只依赖很小的状态（小保底、大保底、当期抽数、
+30抽奖励、60送/限时福利、永久福利），因此可以把 GachaSimulator.pull_until_target
+的全部随机过程按抽逐层展开，直接得到结果的精确概率分布，没有任何采样误差。
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import GachaConfig
+from pool_state import PoolState
+
+
+# 六星类型概率（与 GachaSimulator.determine_ssr_type 一致）
+P_CURRENT_UP = 0.5  # 当期UP
+P_OLD_UP = 0.5 * 2 / 7  # 往期UP
+P_STANDARD = 1 - P_CURRENT_UP - P_OLD_UP  # 常驻六星
+
+# 可以求分布的字段
+# 与 pull_until_target / pull_bonus_and_free_limited_welfare 的返回字段一致，
+# 另外 small_pity_counter / large_pity_counter / welfare_permanent 为离开卡池时的状态
+POOL_FIELDS = (
+    'pulls', 'total_pulls', 'bonus_used', 'bonus_normal_used', 'bonus_special_used',
+    'welfare_used', 'welfare_limited_used', 'welfare_permanent_used', 'pool_pulls',
+    'old_up_count', 'current_up_count', 'got_target',
+    'small_pity_counter', 'large_pity_counter', 'welfare_permanent'
+)
+
+
+def entry_state(small_pity_counter: int = 0, prev_pool_pulls: int = 0,
+                welfare_limited: int = 0, welfare_permanent: int = 0) -> PoolState:
+    """
+    构造进入新卡池时的状态（与 GachaSimulator.reset_for_new_pool 之后再发放福利一致）
+    """
+    state = PoolState()
+    state.small_pity_counter = small_pity_counter
+    state.welfare_limited = welfare_limited
+    state.welfare_permanent = welfare_permanent
+    if prev_pool_pulls >= 60:
+        state.bonus_10_normal = 10
+    return state
+
+
+class PoolDistribution:
+    """单卡池结果的精确联合分布"""
+
+    def __init__(self, fields: Tuple[str, ...], pmf: Dict[Tuple[int, ...], float]):
+        self.fields = fields
+        self.pmf = pmf  # {(字段值, ...): 概率}
+
+    def marginal(self, field: str) -> Dict[int, float]:
+        """单个字段的边缘分布 {取值: 概率}，按取值升序"""
+        i = self.fields.index(field)
+        result: Dict[int, float] = {}
+        for key, p in self.pmf.items():
+            result[key[i]] = result.get(key[i], 0.0) + p
+        return dict(sorted(result.items()))
+
+    def mean(self, field: str) -> float:
+        """期望"""
+        return sum(v * p for v, p in self.marginal(field).items())
+
+    def var(self, field: str) -> float:
+        """方差"""
+        marginal = self.marginal(field)
+        mean = sum(v * p for v, p in marginal.items())
+        return sum((v - mean) ** 2 * p for v, p in marginal.items())
+
+    def quantile(self, field: str, q: float) -> int:
+        """
+        分位数：累计概率首次超过 q 的取值
+        （与蒙特卡洛中 sorted(values)[int(n * q)] 的取法一致）
+        """
+        cumulative = 0.0
+        last = None
+        for v, p in self.marginal(field).items():
+            cumulative += p
+            last = v
+            if cumulative > q:
+                return v
+        return last
+
+    def support(self, field: str) -> Tuple[int, int]:
+        """取值范围 (最小值, 最大值)"""
+        values = list(self.marginal(field))
+        return values[0], values[-1]
+
+
+class ExactSolver:
+    """单卡池精确求解器"""
+
+    def __init__(self, config: GachaConfig, tol: float = 1e-15):
+        """
+        tol: 概率低于此值的中间状态直接丢弃（0 表示完全不丢弃）。
+             默认值下丢弃的总概率在 1e-12 量级，远低于任何统计量的显示精度。
+        """
+        self.config = config
+        self.tol = tol
+        # 每个小保底水位下的6星概率（与 GachaSimulator.calculate_current_ssr_rate 一致）
+        self.ssr_rates = [self._ssr_rate(c) for c in range(config.small_pity + 1)]
+
+    def _ssr_rate(self, small_pity_counter: int) -> float:
+        config = self.config
+        if small_pity_counter >= config.small_pity:
+            return 1.0
+        rate = config.base_ssr_rate
+        if small_pity_counter > config.increase_threshold:
+            rate += (small_pity_counter - config.increase_threshold) * config.increase_rate
+        assert rate <= 1.0, "概率不能超过100%"
+        return rate
+
+    def solve_pull_until_target(self, state: PoolState, use_welfare: bool = False,
+                                fields: Iterable[str] = ('pulls', 'total_pulls')) -> PoolDistribution:
+        """
+        从给定状态开始 pull_until_target 的精确结果分布
+        state: 进入卡池时的状态（不会被修改）
+        use_welfare: 是否使用永久福利抽
+        fields: 需要的字段（联合分布），见 POOL_FIELDS
+        """
+        return self._solve(state, use_welfare, tuple(fields), skip_pool=False)
+
+    def solve_skip_pool(self, state: PoolState, use_limited_welfare: bool = False,
+                        fields: Iterable[str] = ('current_up_count', 'small_pity_counter')) -> PoolDistribution:
+        """
+        从给定状态开始 pull_bonus_and_free_limited_welfare 的精确结果分布
+        """
+        return self._solve(state, use_limited_welfare, tuple(fields), skip_pool=True)
+
+    def _solve(self, state: PoolState, use_welfare: bool, fields: Tuple[str, ...],
+               skip_pool: bool) -> PoolDistribution:
+        """
+        按抽逐层展开所有可能的状态
+
+        层内状态: (小保底, 大保底, 当期抽数, 是否已得30抽奖励, 60送/限时福利剩余,
+                   特殊10抽剩余, 永久福利剩余, 当期UP数, 往期UP数)
+        其余统计量（实际投入抽数等）都可以由状态和初始状态推出，不必放进状态里，
+        往期UP数只在需要时才跟踪，以免状态数成倍增加。
+        """
+        for field in fields:
+            if field not in POOL_FIELDS:
+                raise ValueError(f"未知字段: {field}")
+
+        config = self.config
+        rates = self.ssr_rates
+        tol = self.tol
+        base_rate = config.base_ssr_rate
+        track_old_up = 'old_up_count' in fields
+        # 跳过的池子需要当期UP的具体数量，抽到UP为止的池子只需要知道是否已出UP
+        track_up_count = skip_pool and ('current_up_count' in fields or 'got_target' in fields)
+
+        block_bonus = state.bonus_10_normal
+        if skip_pool:
+            block_limited = state.welfare_limited if use_welfare else 0
+        else:
+            block_limited = state.welfare_limited
+        use_permanent = use_welfare and not skip_pool
+
+        start = (state.small_pity_counter, state.large_pity_counter, state.total_pulls,
+                 state.got_30_bonus, block_bonus + block_limited, state.bonus_10_special,
+                 state.welfare_permanent, 0, 0)
+        entry = (state, block_bonus, block_limited)
+
+        # 先按结束时的原始状态累加概率，最后再统一换算成字段取值
+        absorbed: Dict[tuple, float] = {}
+
+        def absorb(s, p):
+            absorbed[s] = absorbed.get(s, 0.0) + p
+
+        layer: Dict[tuple, float] = {}
+        if skip_pool and start[4] == 0:
+            absorb(start, 1.0)
+        else:
+            layer[start] = 1.0
+
+        while layer:
+            next_layer: Dict[tuple, float] = {}
+            get = next_layer.get
+
+            for s, p in layer.items():
+                small, large, total, got30, block, special, perm, cur, old = s
+
+                if block > 0 or special == 0:
+                    # 正常抽（60送/限时福利、永久福利或实际投入）
+                    in_block = block > 0
+                    if in_block:
+                        block -= 1
+                    elif use_permanent and perm > 0:
+                        perm -= 1
+                    small += 1
+                    large += 1
+                    total += 1
+                    if total >= 30 and not got30:
+                        got30 = True
+                        special = 10
+
+                    if large >= config.large_pity:
+                        # 大保底：必定当期UP，同时重置大小保底
+                        branches = ((1.0, 0, 0, 1, 0),)
+                    else:
+                        rate = rates[small] if small < config.small_pity else 1.0
+                        branches = (
+                            (rate * P_CURRENT_UP, 0, 0, 1, 0),
+                            (rate * P_OLD_UP, 0, large, 0, 1),
+                            (rate * P_STANDARD, 0, large, 0, 0),
+                            (1.0 - rate, small, large, 0, 0),
+                        )
+
+                    for q, new_small, new_large, up, old_up in branches:
+                        if q <= 0.0:
+                            continue
+                        new_cur = cur + up if track_up_count else (cur or up)
+                        new_old = old + old_up if track_old_up else 0
+                        ns = (new_small, new_large, total, got30, block, special, perm, new_cur, new_old)
+                        if skip_pool:
+                            done = block == 0
+                        elif in_block:
+                            done = block == 0 and new_cur > 0
+                        else:
+                            done = up > 0
+                        if done:
+                            absorb(ns, p * q)
+                        else:
+                            next_layer[ns] = get(ns, 0.0) + p * q
+                else:
+                    # 特殊抽：只用基础概率，不影响任何保底
+                    special -= 1
+                    for q, up, old_up in ((base_rate * P_CURRENT_UP, 1, 0),
+                                          (base_rate * P_OLD_UP, 0, 1),
+                                          (base_rate * P_STANDARD + 1.0 - base_rate, 0, 0)):
+                        new_cur = cur + up if track_up_count else (cur or up)
+                        new_old = old + old_up if track_old_up else 0
+                        ns = (small, large, total, got30, block, special, perm, new_cur, new_old)
+                        if special == 0 and new_cur > 0:
+                            absorb(ns, p * q)
+                        else:
+                            next_layer[ns] = get(ns, 0.0) + p * q
+
+            if tol > 0.0:
+                # 丢弃概率极小的状态（尾部的多次歪出往期UP等），损失的总概率不超过 tol × 状态数
+                layer = {s: p for s, p in next_layer.items() if p >= tol}
+            else:
+                layer = next_layer
+
+        terminal: Dict[Tuple[int, ...], float] = {}
+        for s, p in absorbed.items():
+            key = self._outcome(s, entry, fields)
+            terminal[key] = terminal.get(key, 0.0) + p
+        return PoolDistribution(fields, terminal)
+
+    @staticmethod
+    def _outcome(s, entry, fields: Tuple[str, ...]) -> Tuple[int, ...]:
+        """由结束时的状态推出各字段的取值"""
+        small, large, total, got30, block, special, perm, cur, old = s
+        state, block_bonus, block_limited = entry
+
+        bonus_normal_used = block_bonus
+        welfare_limited_used = block_limited
+        welfare_permanent_used = state.welfare_permanent - perm
+        bonus_special_used = state.bonus_10_special - special
+        if got30 and not state.got_30_bonus:
+            bonus_special_used += 10
+        normal_pulls = total - state.total_pulls
+        pulls = normal_pulls - bonus_normal_used - welfare_limited_used - welfare_permanent_used
+        bonus_used = bonus_normal_used + bonus_special_used
+
+        values = {
+            'pulls': pulls,
+            'total_pulls': pulls + bonus_used + welfare_limited_used + welfare_permanent_used,
+            'bonus_used': bonus_used,
+            'bonus_normal_used': bonus_normal_used,
+            'bonus_special_used': bonus_special_used,
+            'welfare_used': welfare_limited_used + welfare_permanent_used,
+            'welfare_limited_used': welfare_limited_used,
+            'welfare_permanent_used': welfare_permanent_used,
+            'pool_pulls': total,
+            'old_up_count': old,
+            'current_up_count': cur,
+            'got_target': int(cur > 0),
+            'small_pity_counter': small,
+            'large_pity_counter': large,
+            'welfare_permanent': perm,
+        }
+        return tuple(values[f] for f in fields)
+
+    def print_results(self, dist: PoolDistribution, field: str = 'pulls'):
+        """打印精确分布的统计量（格式与 MonteCarloAnalyzer.print_results 对应）"""
+        low, high = dist.support(field)
+
+        print("\n" + "=" * 60)
+        print("【精确求解结果】")
+        print("=" * 60)
+        print(f"\n{field} 的精确分布:")
+        print(f"  平均值: {dist.mean(field):.2f} 抽")
+        print(f"  标准差: {dist.var(field) ** 0.5:.2f} 抽")
+        print(f"  中位数: {dist.quantile(field, 0.5)} 抽")
+        print(f"  最小值: {low} 抽")
+        print(f"  最大值: {high} 抽")
+        print(f"  25%分位数: {dist.quantile(field, 0.25)} 抽")
+        print(f"  75%分位数: {dist.quantile(field, 0.75)} 抽")
+        print(f"  90%分位数: {dist.quantile(field, 0.9)} 抽")
+        for other in dist.fields:
+            if other != field:
+                print(f"  {other} 平均值: {dist.mean(other):.2f}")
+
+        print("\n" + "=" * 60 + "\n")
+
+
+def pull_distribution(config: GachaConfig, small_pity_counter: int = 0, prev_pool_pulls: int = 0,
+                      welfare_limited: int = 0, welfare_permanent: int = 0, use_welfare: bool = False,
+                      fields: Optional[List[str]] = None) -> PoolDistribution:
+    """
+    便捷函数：新卡池抽到目标UP为止的精确结果分布
+    """
+    state = entry_state(small_pity_counter, prev_pool_pulls, welfare_limited, welfare_permanent)
+    return ExactSolver(config).solve_pull_until_target(
+        state, use_welfare=use_welfare, fields=fields or ('pulls', 'total_pulls'))
@@ -0,0 +1,140 @@
+"""
+模拟热路径的计数与计时
+
+Instrumentation 按阶段（策略 / 福利模式）统计：
+- 各类型的抽数：正常抽（实际投入 + 60送）、特殊抽（30送）、福利抽（限时 + 永久）
+- 每个阶段的用时与每秒抽数
+
+关闭时没有任何开销：模拟器只在 instrumentation 不为 None 时才把计数钩子挂到
+引擎实例的 pull_until_target_into / pull_bonus_and_free_limited_welfare_into 上，
+每个池子（批量引擎为每批模拟的每个池子）统计一次，不进入逐抽的循环。
+
+另外 run_profiled 用 cProfile 运行任意函数并保存分析结果（main.py --profile）。
+"""
+import contextlib
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+import numpy as np
+
+
+PULL_TYPES = ('normal', 'special', 'welfare')
+PULL_TYPE_NAMES = {'normal': '正常抽', 'special': '特殊抽', 'welfare': '福利抽'}
+
+
+class PhaseStats:
+    """一个阶段的累计用时与各类型抽数"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self.pulls = dict.fromkeys(PULL_TYPES, 0)
+
+    @property
+    def total_pulls(self) -> int:
+        return sum(self.pulls.values())
+
+    def merge(self, other: 'PhaseStats'):
+        self.seconds += other.seconds
+        self.calls += other.calls
+        for kind in PULL_TYPES:
+            self.pulls[kind] += other.pulls[kind]
+
+
+class Instrumentation:
+    """按阶段统计抽数与用时（可跨进程合并）"""
+
+    def __init__(self):
+        self.phases: Dict[str, PhaseStats] = {}
+        self._current: Optional[str] = None
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[PhaseStats]:
+        """计时一个阶段，期间记录的抽数计入该阶段（嵌套时计入最内层）"""
+        stats = self.phases.setdefault(name, PhaseStats())
+        outer, self._current = self._current, name
+        begin = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - begin
+            stats.calls += 1
+            self._current = outer
+
+    def record(self, normal=0, special=0, welfare=0):
+        """记录抽数（标量或数组，数组按和计入）"""
+        stats = self.phases.setdefault(self._current or '其他', PhaseStats())
+        stats.pulls['normal'] += int(np.sum(normal))
+        stats.pulls['special'] += int(np.sum(special))
+        stats.pulls['welfare'] += int(np.sum(welfare))
+
+    def attach(self, simulator):
+        """
+        在模拟器实例上挂计数钩子（GachaSimulator / CompiledGachaSimulator / BatchGachaSimulator）
+        只替换该实例的 pull_until_target_into 与 pull_bonus_and_free_limited_welfare_into
+        （结果字典形式的方法也经由它们），类本身不受影响
+        """
+        for name in ('pull_until_target_into', 'pull_bonus_and_free_limited_welfare_into'):
+            method = getattr(simulator, name)
+            setattr(simulator, name, self._counting(method))
+        return simulator
+
+    def _counting(self, method: Callable) -> Callable:
+        def wrapper(acc, *args, **kwargs):
+            before = acc.pull_counts()
+            result = method(acc, *args, **kwargs)
+            normal, special, welfare = (after - b for after, b in zip(acc.pull_counts(), before))
+            self.record(normal, special, welfare)
+            return result
+        return wrapper
+
+    def merge(self, other: 'Instrumentation'):
+        for name, stats in other.phases.items():
+            self.phases.setdefault(name, PhaseStats()).merge(stats)
+
+    def __getstate__(self):
+        # 跨进程传递时只带统计结果
+        return {'phases': self.phases, '_current': None}
+
+    def print_report(self):
+        """打印各阶段的抽数与每秒抽数"""
+        print(f"\n{'=' * 70}")
+        print("【热路径统计】")
+        print(f"{'=' * 70}")
+        header = " | ".join(f"{PULL_TYPE_NAMES[kind]:>10}" for kind in PULL_TYPES)
+        print(f"{'阶段':<28} | {'用时(秒)':>8} | {header} | {'抽/秒':>10}")
+        total = PhaseStats()
+        for name, stats in self.phases.items():
+            self._print_row(name, stats)
+            total.merge(stats)
+        if len(self.phases) > 1:
+            self._print_row('合计', total)
+
+    @staticmethod
+    def _print_row(name: str, stats: PhaseStats):
+        counts = " | ".join(f"{stats.pulls[kind]:>13,}" for kind in PULL_TYPES)
+        rate = stats.total_pulls / stats.seconds if stats.seconds > 0 else float('nan')
+        print(f"{name:<28} | {stats.seconds:>10.2f} | {counts} | {rate:>12,.0f}")
+
+
+def phase_name(schedule_name: str, welfare_mode: Optional[str]) -> str:
+    """阶段名: 策略名/福利模式"""
+    return f"{schedule_name}/{welfare_mode or 'baseline'}"
+
+
+def run_profiled(path: str, func: Callable, *args, top: int = 25, **kwargs):
+    """
+    用 cProfile 运行 func，分析结果保存到 path（可用 snakeviz / pstats 查看），
+    并打印按累计用时排序的前 top 个函数
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(path)
+        print(f"\n{'=' * 70}")
+        print(f"性能分析结果已保存至: {path}")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
@@ -45,13 +45,39 @@
 """
 
 
-import pickle
+import argparse
+from typing import Optional
+from adaptive_runner import run_adaptive
+from aggregate_cube import build_cube, save_cube
+from checkpoint import DEFAULT_CHECKPOINT_DIR, Checkpoint
 from config import GachaConfig
-from strategy_simulator import StrategySimulator
+from instrumentation import Instrumentation, run_profiled
+from parallel_runner import DEFAULT_CHUNK_SIZE, run_all_strategies
+from results_store import DEFAULT_RESULTS_DIR, save_results
+from strategy_schedule import BUILTIN_STRATEGIES
+from strategy_simulator import ENGINES, StrategySimulator
+from variance_reduction import exact_baseline_spent, print_efficiency_intervals
 
 
-def main():
-    """主函数"""
+def main(workers: Optional[int] = None, seed: int = 0, iterations: int = 5000, streaming: bool = False,
+         precision: Optional[float] = None, paired: bool = False, antithetic: bool = False,
+         control_variate: bool = False, engine: str = 'batch', instrument: bool = False,
+         checkpoint: Optional[str] = None):
+    """
+    主函数
+    workers: 并行进程数（None 为CPU核数，1 为单进程）
+    seed: 随机种子（相同种子的结果与进程数无关）
+    iterations: 每个策略/福利模式的模拟次数
+    streaming: 流式统计（内存与模拟次数无关，只输出统计，不保存逐次结果）
+    precision: 按精度自动停止（福利效率置信区间半宽，如 0.01），此时 iterations 为上限，按流式统计
+    paired: 三种福利模式使用公共随机数，按模拟编号配对估计效率并输出置信区间
+    antithetic: 配对模式下使用对偶变量
+    control_variate: 配对模式下用基准花费的精确期望作控制变量
+    engine: 模拟引擎（'batch' 批量引擎，'alias' 从单池精确分布一步抽样）
+    instrument: 统计各策略/福利模式的抽数（正常/特殊/福利）、用时与每秒抽数（按精度停止时不统计）
+    checkpoint: 检查点目录，每完成一块模拟保存一次；中断后用同样的参数再次运行即从断点续跑，
+                结果与不中断时相同，全部完成并保存结果后删除（按精度停止时不可用）
+    """
     config = GachaConfig()
     
     print("=" * 60)
@@ -68,8 +94,8 @@ def main():
     print()
     
     
-    # 运行策略模拟(执行5000次策略模拟)
-    strategy_sim = StrategySimulator(config, iterations=5000)
+    # 运行策略模拟（默认执行5000次策略模拟）
+    strategy_sim = StrategySimulator(config, iterations=iterations)
     
     num_pools = 36  # 模拟36个池子（约2年）
     
@@ -81,130 +107,65 @@ def main():
     print("  方案2：不限时10抽（可跨期积攒）")
     print()
     
-    # 策略1的福利方案对比
-    print("\n" + "▶" * 30)
-    print("策略1：每期都抽")
-    print("▶" * 30)
-    
-    baseline_1 = strategy_sim.simulate_strategy_1_every_pool(num_pools, welfare_mode=None)
-    limited_1 = strategy_sim.simulate_strategy_1_every_pool(num_pools, welfare_mode='limited')
-    permanent_1 = strategy_sim.simulate_strategy_1_every_pool(num_pools, welfare_mode='permanent')
-    
-    strategy_sim.print_welfare_comparison("策略1：每期都抽", baseline_1, limited_1, permanent_1, num_pools)
-    
-    # 策略2的福利方案对比
-    print("\n" + "▶" * 30)
-    print("策略2：抽1跳1循环")
-    print("▶" * 30)
-    
-    baseline_2 = strategy_sim.simulate_strategy_2_skip_one(num_pools, welfare_mode=None)
-    limited_2 = strategy_sim.simulate_strategy_2_skip_one(num_pools, welfare_mode='limited')
-    permanent_2 = strategy_sim.simulate_strategy_2_skip_one(num_pools, welfare_mode='permanent')
-    
-    strategy_sim.print_welfare_comparison("策略2：抽1跳1循环", baseline_2, limited_2, permanent_2, num_pools)
-    
-    # 策略3的福利方案对比
-    print("\n" + "▶" * 30)
-    print("策略3：两池周期随机选一")
-    print("▶" * 30)
-    
-    baseline_3 = strategy_sim.simulate_strategy_3_random_two(num_pools, welfare_mode=None)
-    limited_3 = strategy_sim.simulate_strategy_3_random_two(num_pools, welfare_mode='limited')
-    permanent_3 = strategy_sim.simulate_strategy_3_random_two(num_pools, welfare_mode='permanent')
-    
-    strategy_sim.print_welfare_comparison("策略3：两池周期随机选一", baseline_3, limited_3, permanent_3, num_pools)
-    
-    # 策略4的福利方案对比
-    print("\n" + "▶" * 30)
-    print("策略4：抽1跳2循环")
-    print("▶" * 30)
-    
-    baseline_4 = strategy_sim.simulate_strategy_4_skip_two(num_pools, welfare_mode=None)
-    limited_4 = strategy_sim.simulate_strategy_4_skip_two(num_pools, welfare_mode='limited')
-    permanent_4 = strategy_sim.simulate_strategy_4_skip_two(num_pools, welfare_mode='permanent')
-    
-    strategy_sim.print_welfare_comparison("策略4：抽1跳2循环", baseline_4, limited_4, permanent_4, num_pools)
-    
-    # 策略5的福利方案对比
-    print("\n" + "▶" * 30)
-    print("策略5：三池周期随机选一")
-    print("▶" * 30)
-    
-    baseline_5 = strategy_sim.simulate_strategy_5_random_three_pick_one(num_pools, welfare_mode=None)
-    limited_5 = strategy_sim.simulate_strategy_5_random_three_pick_one(num_pools, welfare_mode='limited')
-    permanent_5 = strategy_sim.simulate_strategy_5_random_three_pick_one(num_pools, welfare_mode='permanent')
-    
-    strategy_sim.print_welfare_comparison("策略5：三池周期随机选一", baseline_5, limited_5, permanent_5, num_pools)
-    
-    # 策略6的福利方案对比
-    print("\n" + "▶" * 30)
-    print("策略6：三池周期随机选二")
-    print("▶" * 30)
-    
-    baseline_6 = strategy_sim.simulate_strategy_6_random_three_pick_two(num_pools, welfare_mode=None)
-    limited_6 = strategy_sim.simulate_strategy_6_random_three_pick_two(num_pools, welfare_mode='limited')
-    permanent_6 = strategy_sim.simulate_strategy_6_random_three_pick_two(num_pools, welfare_mode='permanent')
-    
-    strategy_sim.print_welfare_comparison("策略6：三池周期随机选二", baseline_6, limited_6, permanent_6, num_pools)
+    instrumentation = Instrumentation() if instrument else None
+    
+    # 6种策略 × 3种福利模式并行模拟，结果整合为 all_strategies_data
+    run_checkpoint = None
+    if precision is not None:
+        # 每个策略模拟到效率估计达到目标精度为止
+        streaming = True
+        all_strategies_data = {
+            schedule.name: run_adaptive(config, schedule, num_pools, precision=precision, seed=seed,
+                                        workers=workers, max_iterations=iterations)['results']
+            for schedule in BUILTIN_STRATEGIES
+        }
+    else:
+        if checkpoint is not None:
+            run_checkpoint = Checkpoint(checkpoint, config, num_pools=num_pools, iterations=iterations, seed=seed,
+                                        chunk_size=DEFAULT_CHUNK_SIZE, streaming=streaming, paired=paired,
+                                        antithetic=antithetic, engine=engine)
+        all_strategies_data = run_all_strategies(config, num_pools, iterations, workers=workers, seed=seed,
+                                                 streaming=streaming, paired=paired, antithetic=antithetic,
+                                                 engine=engine, instrumentation=instrumentation,
+                                                 checkpoint=run_checkpoint)
+    
+    # 汇总立方体（报告与可视化只读它，与模拟次数无关）
+    cube = build_cube(all_strategies_data, config.small_pity)
+    
+    # 各策略的福利方案对比
+    for schedule in BUILTIN_STRATEGIES:
+        print("\n" + "▶" * 30)
+        print(schedule.title)
+        print("▶" * 30)
+        
+        summary = cube[schedule.name]
+        strategy_sim.print_welfare_comparison(schedule.title, summary['baseline'], summary['limited'],
+                                              summary['permanent'], num_pools)
+        if (paired or antithetic) and not streaming:
+            # 配对置信区间需要逐次结果
+            data = all_strategies_data[schedule.name]
+            control_mean = exact_baseline_spent(config, schedule, num_pools) if control_variate else None
+            print_efficiency_intervals(schedule.title, data, antithetic=antithetic, control_mean=control_mean)
+    
+    if instrumentation is not None:
+        instrumentation.print_report()
     
     # ========== 保存模拟结果 ==========
     print("\n" + "=" * 60)
     print("保存模拟结果")
     print("=" * 60)
     
-    # 整合所有策略数据
-    all_strategies_data = {
-        '策略1：每期都抽': {
-            'baseline': baseline_1,
-            'limited': limited_1,
-            'permanent': permanent_1
-        },
-        '策略2：抽1跳1': {
-            'baseline': baseline_2,
-            'limited': limited_2,
-            'permanent': permanent_2
-        },
-        '策略3：随机2选1': {
-            'baseline': baseline_3,
-            'limited': limited_3,
-            'permanent': permanent_3
-        },
-        '策略4：抽1跳2': {
-            'baseline': baseline_4,
-            'limited': limited_4,
-            'permanent': permanent_4
-        },
-        '策略5：随机3选1': {
-            'baseline': baseline_5,
-            'limited': limited_5,
-            'permanent': permanent_5
-        },
-        '策略6：随机3选2': {
-            'baseline': baseline_6,
-            'limited': limited_6,
-            'permanent': permanent_6
-        }
-    }
-    
-    # 保存为pickle文件
-    simulation_results = {
-        'all_strategies_data': all_strategies_data,
-        'num_pools': num_pools,
-        'config': {
-            'base_ssr_rate': config.base_ssr_rate,
-            'small_pity': config.small_pity,
-            'large_pity': config.large_pity,
-            'up_rate': config.up_rate,
-            'increase_threshold': config.increase_threshold,
-            'increase_rate': config.increase_rate
-        }
-    }
-    
-    output_file = 'simulation_results.pkl'
-    with open(output_file, 'wb') as f:
-        pickle.dump(simulation_results, f)
+    output_file = DEFAULT_RESULTS_DIR
+    save_cube(output_file, cube, num_pools, config, seed=seed, iterations=iterations)
+    if streaming:
+        print("\n流式模式不保留逐次结果，只保存汇总立方体")
+    else:
+        # 保存为列式结果目录（JSON头文件 + 每列一个 .npy）
+        save_results(output_file, all_strategies_data, num_pools, config, seed=seed, iterations=iterations)
     
     print(f"\n✓ 模拟结果已保存至: {output_file}")
+    if run_checkpoint is not None:
+        run_checkpoint.clear()
     print(f"  包含数据: {len(all_strategies_data)} 个策略，每个策略 3 种福利模式")
     print(f"  模拟池数: {num_pools}")
     print(f"\n提示: 运行 'python visualizer.py' 生成可视化图表")
@@ -212,4 +173,31 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="明日方舟终末地抽卡策略模拟器")
+    parser.add_argument('--workers', type=int, default=None, help="并行进程数（默认CPU核数，1为单进程）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--iterations', type=int, default=5000, help="每个策略/福利模式的模拟次数")
+    parser.add_argument('--streaming', action='store_true', help="流式统计（内存与模拟次数无关，不保存逐次结果）")
+    parser.add_argument('--precision', type=float, default=None,
+                        help="按精度自动停止：福利效率置信区间半宽（如0.01），此时 --iterations 为上限")
+    parser.add_argument('--paired', action='store_true', help="三种福利模式使用公共随机数，输出配对的效率置信区间")
+    parser.add_argument('--antithetic', action='store_true', help="配对模式下使用对偶变量（隐含 --paired）")
+    parser.add_argument('--control-variate', action='store_true', help="配对模式下用基准花费的精确期望作控制变量")
+    parser.add_argument('--engine', choices=ENGINES, default='batch',
+                        help="模拟引擎：batch 批量引擎，alias 从单池精确分布一步抽样")
+    parser.add_argument('--instrument', action='store_true', help="统计各策略/福利模式的抽数、用时与每秒抽数")
+    parser.add_argument('--checkpoint', metavar='目录', nargs='?', const=DEFAULT_CHECKPOINT_DIR, default=None,
+                        help=f"每完成一块模拟保存检查点（默认目录 {DEFAULT_CHECKPOINT_DIR}），中断后同样的命令从断点续跑")
+    parser.add_argument('--profile', metavar='文件', default=None,
+                        help="用 cProfile 运行并把分析结果保存到文件（配合 --workers 1 可分析模拟本身）")
+    args = parser.parse_args()
+    if args.checkpoint is not None and args.precision is not None:
+        parser.error("--checkpoint 不能与 --precision 同时使用")
+    kwargs = dict(workers=args.workers, seed=args.seed, iterations=args.iterations, streaming=args.streaming,
+                  precision=args.precision, paired=args.paired, antithetic=args.antithetic,
+                  control_variate=args.control_variate, engine=args.engine, instrument=args.instrument,
+                  checkpoint=args.checkpoint)
+    if args.profile:
+        run_profiled(args.profile, main, **kwargs)
+    else:
+        main(**kwargs)
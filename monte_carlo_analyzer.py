@@ -1,9 +1,18 @@
 """
 蒙特卡洛分析器
 """
-from typing import List, Dict
+from statistics import NormalDist
+from typing import List, Dict, Optional, Union
+import numpy as np
 from config import GachaConfig
-from simulator_core import GachaSimulator
+from pull_kernel import create_simulator
+from rng import GachaRNG
+from batch_engine import BatchGachaSimulator
+from streaming_stats import StreamingHistogram
+
+
+# print_results 统计的字段
+_RESULT_FIELDS = ('pulls', 'total_pulls', 'bonus_used', 'bonus_normal_used', 'bonus_special_used')
 
 
 class MonteCarloAnalyzer:
@@ -13,57 +22,123 @@ class MonteCarloAnalyzer:
         self.config = config
         self.iterations = iterations
     
-    def simulate_pool(self, prev_pool_pulls: int = 0) -> List[Dict]:
+    def simulate_pool(self, prev_pool_pulls: int = 0, seed: Optional[int] = None,
+                      backend: str = 'python') -> List[Dict]:
         """
         模拟单个卡池多次
         prev_pool_pulls: 上一个卡池的抽数
+        seed: 随机种子（None 表示使用 random 模块）
+        backend: 'python'、'compiled'（编译内核，同一种子结果逐位相同）
+                 或 'skip_ahead'（几何分布跳跃，同分布）
         返回: 模拟结果列表
         """
         results = []
         
         print(f"正在模拟卡池，共 {self.iterations} 次...")
         
+        simulator = create_simulator(self.config, GachaRNG(seed) if seed is not None else None, backend)
         for i in range(self.iterations):
             if (i + 1) % 1000 == 0:
                 print(f"进度: {i + 1}/{self.iterations}")
             
-            simulator = GachaSimulator(self.config)
+            simulator.state.reset()
             simulator.reset_for_new_pool(prev_pool_pulls)
             result = simulator.pull_until_target()
             results.append(result)
         
         return results
     
-    def print_results(self, results: List[Dict]):
-        """打印模拟结果"""
-        actual_pulls = [r['pulls'] for r in results]
-        total_pulls = [r['total_pulls'] for r in results]
-        bonus_used = [r['bonus_used'] for r in results]
-        bonus_normal_used = [r['bonus_normal_used'] for r in results]
-        bonus_special_used = [r['bonus_special_used'] for r in results]
+    def simulate_pool_batch(self, prev_pool_pulls: int = 0, seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        用批量引擎模拟单个卡池多次（所有模拟一起向量化推进）
+        prev_pool_pulls: 上一个卡池的抽数
+        seed: 随机种子（None 表示不固定）
+        返回: 列式结果 {字段名: 长度为 iterations 的数组}，字段与 simulate_pool 的结果字典相同
+        """
+        print(f"正在批量模拟卡池，共 {self.iterations} 次...")
+        
+        simulator = BatchGachaSimulator(self.config, self.iterations, seed=seed)
+        simulator.reset_for_new_pool(prev_pool_pulls)
+        return simulator.pull_until_target()
+    
+    def simulate_pool_streaming(self, prev_pool_pulls: int = 0, seed: Optional[int] = None,
+                                batch_size: int = 1000000) -> Dict[str, StreamingHistogram]:
+        """
+        流式模拟单个卡池多次：每批 batch_size 次，汇总进计数直方图后丢弃
+        内存与模拟次数无关，可用于上亿次的模拟
+        返回: {字段名: StreamingHistogram}，可直接交给 print_results
+        """
+        print(f"正在流式模拟卡池，共 {self.iterations} 次（每批 {batch_size} 次）...")
+        
+        seed_seq = np.random.SeedSequence(seed)
+        histograms = {name: StreamingHistogram() for name in _RESULT_FIELDS}
+        for start in range(0, self.iterations, batch_size):
+            n = min(batch_size, self.iterations - start)
+            simulator = BatchGachaSimulator(self.config, n, rng=np.random.default_rng(seed_seq.spawn(1)[0]))
+            simulator.reset_for_new_pool(prev_pool_pulls)
+            result = simulator.pull_until_target()
+            for name, hist in histograms.items():
+                hist.update(result[name])
+        return histograms
+    
+    def simulate_pool_adaptive(self, precision: float = 0.5, confidence: float = 0.95,
+                               prev_pool_pulls: int = 0, seed: Optional[int] = None,
+                               batch_size: int = 10000) -> Dict[str, StreamingHistogram]:
+        """
+        按精度自动停止的单卡池模拟：每批 batch_size 次，
+        平均实际抽数的置信区间半宽不超过 precision（抽）时停止，最多模拟 self.iterations 次
+        返回: {字段名: StreamingHistogram}，可直接交给 print_results
+        """
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        print(f"正在自适应模拟卡池：目标精度 ±{precision} 抽（{confidence:.0%} 置信度），最多 {self.iterations} 次...")
+        
+        seed_seq = np.random.SeedSequence(seed)
+        histograms = {name: StreamingHistogram() for name in _RESULT_FIELDS}
+        pulls = histograms['pulls']
+        while pulls.count < self.iterations:
+            n = min(batch_size, self.iterations - pulls.count)
+            simulator = BatchGachaSimulator(self.config, n, rng=np.random.default_rng(seed_seq.spawn(1)[0]))
+            simulator.reset_for_new_pool(prev_pool_pulls)
+            result = simulator.pull_until_target()
+            for name, hist in histograms.items():
+                hist.update(result[name])
+            
+            half_width = z * pulls.std() / pulls.count ** 0.5
+            if half_width <= precision:
+                break
+        
+        print(f"共模拟 {pulls.count} 次，平均实际抽数 {pulls.mean():.2f} ± {half_width:.2f} 抽")
+        return histograms
+    
+    def print_results(self, results: Union[List[Dict], Dict[str, np.ndarray], Dict[str, StreamingHistogram]]):
+        """打印模拟结果（支持结果字典列表、批量引擎的列式结果或流式直方图）"""
+        if isinstance(results, dict):
+            histograms = {name: results[name] if isinstance(results[name], StreamingHistogram)
+                          else StreamingHistogram.from_values(results[name]) for name in _RESULT_FIELDS}
+        else:
+            histograms = {name: StreamingHistogram.from_values([r[name] for r in results]) for name in _RESULT_FIELDS}
         
-        actual_sorted = sorted(actual_pulls)
-        n = len(actual_pulls)
+        actual = histograms['pulls']
         
         print("\n" + "=" * 60)
         print("【模拟结果】")
         print("=" * 60)
-        print(f"\n模拟次数: {n}")
+        print(f"\n模拟次数: {actual.count}")
         print(f"\n实际消耗抽数:")
-        print(f"  平均值: {sum(actual_pulls) / n:.2f} 抽")
-        print(f"  中位数: {actual_sorted[n // 2]} 抽")
-        print(f"  最小值: {min(actual_pulls)} 抽")
-        print(f"  最大值: {max(actual_pulls)} 抽")
-        print(f"  25%分位数: {actual_sorted[n // 4]} 抽")
-        print(f"  75%分位数: {actual_sorted[n * 3 // 4]} 抽")
-        print(f"  90%分位数: {actual_sorted[int(n * 0.9)]} 抽")
+        print(f"  平均值: {actual.mean():.2f} 抽")
+        print(f"  中位数: {actual.quantile(0.5)} 抽")
+        print(f"  最小值: {actual.min()} 抽")
+        print(f"  最大值: {actual.max()} 抽")
+        print(f"  25%分位数: {actual.quantile(0.25)} 抽")
+        print(f"  75%分位数: {actual.quantile(0.75)} 抽")
+        print(f"  90%分位数: {actual.quantile(0.9)} 抽")
         
         print(f"\n总抽数 (含赠送):")
-        print(f"  平均值: {sum(total_pulls) / n:.2f} 抽")
+        print(f"  平均值: {histograms['total_pulls'].mean():.2f} 抽")
         
         print(f"\n赠送抽数统计:")
-        print(f"  总赠送平均值: {sum(bonus_used) / n:.2f} 抽")
-        print(f"  60送的正常10抽平均值: {sum(bonus_normal_used) / n:.2f} 抽")
-        print(f"  30送的特殊10抽平均值: {sum(bonus_special_used) / n:.2f} 抽")
+        print(f"  总赠送平均值: {histograms['bonus_used'].mean():.2f} 抽")
+        print(f"  60送的正常10抽平均值: {histograms['bonus_normal_used'].mean():.2f} 抽")
+        print(f"  30送的特殊10抽平均值: {histograms['bonus_special_used'].mean():.2f} 抽")
         
         print("\n" + "=" * 60 + "\n")
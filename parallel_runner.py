@@ -0,0 +1,173 @@
+"""
+并行策略模拟
+
+把 6 种策略 × 3 种福利模式的模拟切块，分发到多个进程执行，
+再按顺序合并回 all_strategies_data 结构。
+从第 i 次模拟开始的块使用随机数流 GachaRNG([种子, 策略, 福利模式]).stream(i)，
+因此只要种子和块大小相同，无论使用多少个进程，结果完全一致。
+配对模式下三种福利模式共用 GachaRNG([种子, 策略, 3]) 的流。
+给定检查点时每完成一块就保存一块，续跑时跳过已完成的块（结果与不中断时相同，见 checkpoint）。
+"""
+import contextlib
+import io
+import os
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from checkpoint import Checkpoint
+from config import GachaConfig
+from instrumentation import Instrumentation
+from pool_cache import DEFAULT_POOL_CACHE_DIR, PoolDistributionCache, config_hash, warm_pool_cache
+from rng import GachaRNG
+from strategy_results import StrategyResults
+from strategy_schedule import BUILTIN_STRATEGIES, WELFARE_MODES, WELFARE_MODE_KEYS, StrategySchedule
+from strategy_simulator import StrategySimulator
+from streaming_stats import StreamingStrategyStats
+
+
+DEFAULT_CHUNK_SIZE = 1000  # 每个任务的模拟次数（批量引擎一次推进一整块）
+
+
+def _run_chunk(config: GachaConfig, schedule: StrategySchedule, num_pools: int, welfare_mode: Optional[str],
+               seed: List[int], start: int, iterations: int, streaming: bool = False,
+               paired: bool = False, antithetic: bool = False,
+               engine: str = 'batch', instrument: bool = False):
+    """
+    工作进程：模拟编号为 [start, start + iterations) 的一块（不输出进度）
+    返回: StrategyResults（流式模式为 StreamingStrategyStats）；instrument 时返回 (结果, Instrumentation)
+    """
+    instrumentation = Instrumentation() if instrument else None
+    simulator = StrategySimulator(config, iterations=iterations, rng=GachaRNG(seed), trial_offset=start,
+                                  paired=paired, antithetic=antithetic, engine=engine,
+                                  pool_cache=_worker_pool_cache(config) if engine == 'alias' else None,
+                                  instrumentation=instrumentation)
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = simulator.simulate_schedule(schedule, num_pools, welfare_mode)
+    if streaming:
+        results = StreamingStrategyStats.from_results(results, config.small_pity)
+    if instrument:
+        return results, instrumentation
+    return results
+
+
+_pool_caches: Dict[str, PoolDistributionCache] = {}
+
+
+def _worker_pool_cache(config: GachaConfig) -> PoolDistributionCache:
+    """每个进程为每个 GachaConfig 保留一个单池分布缓存，跨任务复用"""
+    key = config_hash(config)
+    if key not in _pool_caches:
+        _pool_caches[key] = PoolDistributionCache(config, cache_dir=DEFAULT_POOL_CACHE_DIR)
+    return _pool_caches[key]
+
+
+def run_all_strategies(config: GachaConfig, num_pools: int, iterations: int, workers: Optional[int] = None,
+                       seed: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       streaming: bool = False, paired: bool = False,
+                       antithetic: bool = False,
+                       engine: str = 'batch', instrumentation: Optional[Instrumentation] = None,
+                       checkpoint: Optional[Checkpoint] = None
+                       ) -> Dict[str, Dict[str, Union[StrategyResults, StreamingStrategyStats]]]:
+    """
+    并行模拟全部 6 种策略 × 3 种福利模式
+    workers: 进程数（None 为 CPU 核数，1 为在当前进程中顺序执行）
+    seed: 随机种子（相同种子、相同 chunk_size 的结果与进程数无关）
+    streaming: 流式模式，每块结果在工作进程里汇总为计数直方图，主进程边完成边合并，
+               内存与模拟次数无关（不保留逐次结果，不能保存为结果目录）
+    paired: 公共随机数模式，同一策略三种福利模式的第 i 次模拟使用相同的随机数（见 variance_reduction）
+    antithetic: 配对模式下相邻两次模拟使用对偶随机数
+    engine: 'batch' 批量引擎，'alias' 从单池精确分布一步抽样（先多进程求解缺少的分布）
+    instrumentation: 给定时各工作进程统计抽数与用时，合并到其中（阶段用时为各进程用时之和）
+    checkpoint: 给定时每完成一块保存一块，已保存的块不再模拟（中断后用同一检查点续跑）
+
+    返回: all_strategies_data = {策略名: {'baseline': 列式结果, 'limited': 列式结果, 'permanent': 列式结果}}
+          流式模式下各结果为 StreamingStrategyStats
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    tasks: List[Tuple[Tuple[str, str, int], tuple]] = []
+    checkpoint_keys: Dict[Tuple[str, str, int], Tuple[int, str, int]] = {}
+    for s_idx, schedule in enumerate(BUILTIN_STRATEGIES):
+        for m_idx, welfare_mode in enumerate(WELFARE_MODES):
+            for start in range(0, iterations, chunk_size):
+                key = (schedule.name, WELFARE_MODE_KEYS[welfare_mode], start)
+                checkpoint_keys[key] = (s_idx, WELFARE_MODE_KEYS[welfare_mode], start)
+                # 配对模式下三种福利模式共用同一个随机数流
+                stream_idx = len(WELFARE_MODES) if paired or antithetic else m_idx
+                args = (config, schedule, num_pools, welfare_mode, [seed, s_idx, stream_idx],
+                        start, min(chunk_size, iterations - start), streaming, paired, antithetic, engine,
+                        instrumentation is not None)
+                tasks.append((key, args))
+
+    all_tasks = tasks
+    restored = {}
+    if checkpoint is not None:
+        saved = checkpoint.load_all()
+        restored = {key: saved[ckey] for key, ckey in checkpoint_keys.items() if ckey in saved}
+        tasks = [(key, args) for key, args in tasks if key not in restored]
+
+    if engine == 'alias' and tasks:
+        warm_pool_cache(config, DEFAULT_POOL_CACHE_DIR, workers)
+
+    print(f"\n并行模拟: {len(BUILTIN_STRATEGIES)} 个策略 × {len(WELFARE_MODES)} 种福利模式，"
+          f"每种 {iterations} 次，共 {len(all_tasks)} 个任务，{workers} 个进程...")
+    if restored:
+        print(f"从检查点恢复 {len(restored)} 个已完成的任务，剩余 {len(tasks)} 个")
+    begin = time.time()
+
+    chunk_results: Dict[Tuple[str, str, int], StrategyResults] = {}
+    stats: Dict[str, Dict[str, StreamingStrategyStats]] = {}
+
+    def collect(key: Tuple[str, str, int], result):
+        if instrumentation is not None:
+            result, chunk_instrumentation = result
+            instrumentation.merge(chunk_instrumentation)
+        if checkpoint is not None:
+            checkpoint.save(checkpoint_keys[key], result)
+        merge(key, result)
+
+    def merge(key: Tuple[str, str, int], result):
+        if streaming:
+            # 直方图合并与顺序无关，完成一块合并一块
+            name, mode_key, _ = key
+            modes = stats.setdefault(name, {})
+            if mode_key in modes:
+                modes[mode_key].merge(result)
+            else:
+                modes[mode_key] = result
+        else:
+            chunk_results[key] = result
+
+    for key, result in restored.items():
+        merge(key, result)
+
+    if workers == 1:
+        for done, (key, args) in enumerate(tasks, 1):
+            collect(key, _run_chunk(*args))
+            _print_progress(done, len(tasks))
+    else:
+        # 多进程时才导入（单进程运行省去 multiprocessing 的导入时间）
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_run_chunk, *args): key for key, args in tasks}
+            for done, future in enumerate(as_completed(futures), 1):
+                collect(futures.pop(future), future.result())
+                _print_progress(done, len(tasks))
+
+    print(f"模拟完成，用时 {time.time() - begin:.1f} 秒")
+    if streaming:
+        return stats
+
+    # 按模拟编号顺序合并
+    parts: Dict[str, Dict[str, List[StrategyResults]]] = {}
+    for key, _ in all_tasks:
+        name, mode_key, _ = key
+        parts.setdefault(name, {}).setdefault(mode_key, []).append(chunk_results[key])
+    return {name: {mode_key: StrategyResults.concatenate(chunks) for mode_key, chunks in modes.items()}
+            for name, modes in parts.items()}
+
+
+def _print_progress(done: int, total: int):
+    if done % max(total // 10, 1) == 0 or done == total:
+        print(f"进度: {done}/{total}")
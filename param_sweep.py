@@ -0,0 +1,216 @@
+"""
+GachaConfig 参数扫描
+
+对 GachaConfig 的若干字段取网格（各字段取值的笛卡尔积），每个网格点 × 每个策略作为一个任务
+分发到多个进程，汇总出三种福利模式的平均花费和福利效率。
+
+每个任务的汇总结果按内容寻址缓存在 sweep_cache/ 下：
+文件名是 (GachaConfig, 策略, 池子数, 模拟次数, 种子, 是否配对) 的 SHA-256，
+重复或部分重叠的扫描会直接读取已有结果，只计算新的点。
+
+用法:
+    python param_sweep.py --set base_ssr_rate=0.006,0.008,0.01 --set small_pity=70:90:10
+"""
+import argparse
+import contextlib
+import dataclasses
+import hashlib
+import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence
+
+from config import GachaConfig
+from rng import GachaRNG
+from strategy_schedule import BUILTIN_STRATEGIES, WELFARE_MODES, WELFARE_MODE_KEYS, StrategySchedule
+from strategy_simulator import StrategySimulator
+
+
+DEFAULT_SWEEP_CACHE = 'sweep_cache'
+CACHE_VERSION = 1  # 汇总内容或模拟方法变化时递增，旧缓存自动失效
+
+# 每种福利模式汇总的统计量
+SUMMARY_COLUMNS = ('user_spent', 'expected_up_count', 'unexpected_current_up_count',
+                   'total_current_up_count', 'old_up_count', 'welfare_used')
+
+
+def config_grid(grid: Dict[str, Sequence]) -> List[GachaConfig]:
+    """
+    网格 {字段名: 取值列表} → 所有组合的 GachaConfig（未列出的字段取默认值）
+    """
+    fields = {f.name for f in dataclasses.fields(GachaConfig)}
+    unknown = set(grid) - fields
+    if unknown:
+        raise ValueError(f"GachaConfig 没有字段: {', '.join(sorted(unknown))}")
+    names = list(grid)
+    return [GachaConfig(**dict(zip(names, values))) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def point_key(config: GachaConfig, schedule: StrategySchedule, num_pools: int, iterations: int, seed: int,
+              paired: bool = False) -> str:
+    """一个扫描点的内容哈希（缓存文件名）"""
+    content = {
+        'version': CACHE_VERSION,
+        'config': dataclasses.asdict(config),
+        'schedule': dataclasses.asdict(schedule),
+        'num_pools': num_pools,
+        'iterations': iterations,
+        'seed': seed,
+        'paired': paired,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _run_point(config: GachaConfig, schedule: StrategySchedule, num_pools: int, iterations: int,
+               seed: int, paired: bool = False) -> Dict:
+    """工作进程：模拟一个网格点的一个策略（三种福利模式），返回汇总结果"""
+    summary = {}
+    for m_idx, welfare_mode in enumerate(WELFARE_MODES):
+        # 配对模式下三种福利模式（以及所有网格点）共用同一个随机数流
+        stream_idx = len(WELFARE_MODES) if paired else m_idx
+        simulator = StrategySimulator(config, iterations=iterations, rng=GachaRNG([seed, stream_idx]),
+                                      paired=paired)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = simulator.simulate_schedule(schedule, num_pools, welfare_mode)
+        summary[WELFARE_MODE_KEYS[welfare_mode]] = {
+            'mean': {column: results.mean(column) for column in SUMMARY_COLUMNS},
+            'std': {column: float(results.column(column).std()) for column in SUMMARY_COLUMNS},
+            'welfare_invested': results.welfare_invested,
+        }
+    baseline_spent = summary['baseline']['mean']['user_spent']
+    summary['efficiency'] = {
+        key: (baseline_spent - summary[key]['mean']['user_spent']) / summary[key]['welfare_invested']
+        for key in ('limited', 'permanent')
+    }
+    return summary
+
+
+def _read_cache(cache_dir: str, key: str) -> Optional[Dict]:
+    path = os.path.join(cache_dir, f"{key}.json")
+    if not os.path.isfile(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_cache(cache_dir: str, key: str, summary: Dict):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{key}.json")
+    # 先写临时文件再改名，中途失败不会留下残缺的缓存
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+def run_sweep(grid: Dict[str, Sequence], schedules: Sequence[StrategySchedule] = BUILTIN_STRATEGIES,
+              num_pools: int = 36, iterations: int = 5000, seed: int = 0, workers: Optional[int] = None,
+              cache_dir: Optional[str] = DEFAULT_SWEEP_CACHE, paired: bool = False) -> List[Dict]:
+    """
+    参数扫描
+    grid: {GachaConfig 字段名: 取值列表}
+    schedules: 要模拟的策略
+    paired: 公共随机数模式（福利模式之间、网格点之间的差异噪声更小）
+    workers: 进程数（None 为 CPU 核数，1 为在当前进程中执行）
+    cache_dir: 缓存目录（None 表示不使用缓存）
+
+    返回: 每个 (网格点, 策略) 一行 {'config': 字段字典, 'strategy': 策略名, 'summary': 汇总结果}，
+          顺序与网格、策略的顺序一致
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    configs = config_grid(grid)
+    points = [(config, schedule) for config in configs for schedule in schedules]
+    keys = [point_key(config, schedule, num_pools, iterations, seed, paired) for config, schedule in points]
+
+    summaries: Dict[str, Dict] = {}
+    if cache_dir is not None:
+        for key in keys:
+            cached = _read_cache(cache_dir, key)
+            if cached is not None:
+                summaries[key] = cached
+    todo = [(key, point) for key, point in zip(keys, points) if key not in summaries]
+    todo = list(dict(todo).items())  # 网格中重复的点只算一次
+
+    print(f"\n参数扫描: {len(configs)} 个网格点 × {len(schedules)} 个策略，"
+          f"缓存命中 {len(points) - len(todo)} 个，需要计算 {len(todo)} 个（{workers} 个进程）...")
+    begin = time.time()
+
+    def collect(key: str, summary: Dict):
+        summaries[key] = summary
+        if cache_dir is not None:
+            _write_cache(cache_dir, key, summary)
+
+    if workers == 1:
+        for done, (key, (config, schedule)) in enumerate(todo, 1):
+            collect(key, _run_point(config, schedule, num_pools, iterations, seed, paired))
+            _print_progress(done, len(todo))
+    elif todo:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_run_point, config, schedule, num_pools, iterations, seed, paired): key
+                       for key, (config, schedule) in todo}
+            for done, future in enumerate(as_completed(futures), 1):
+                collect(futures[future], future.result())
+                _print_progress(done, len(todo))
+
+    print(f"扫描完成，用时 {time.time() - begin:.1f} 秒")
+    return [{'config': dataclasses.asdict(config), 'strategy': schedule.name, 'summary': summaries[key]}
+            for key, (config, schedule) in zip(keys, points)]
+
+
+def _print_progress(done: int, total: int):
+    if done % max(total // 10, 1) == 0 or done == total:
+        print(f"进度: {done}/{total}")
+
+
+def print_sweep(rows: List[Dict], grid: Dict[str, Sequence]):
+    """打印扫描结果（只列出被扫描的字段）"""
+    names = list(grid)
+    header = " | ".join(f"{n:>18}" for n in names)
+    print(f"\n{header} | {'策略':<12} | {'基准花费':>8} | {'限时效率':>8} | {'不限时效率':>8}")
+    for row in rows:
+        values = " | ".join(f"{row['config'][n]:>18}" for n in names)
+        summary = row['summary']
+        print(f"{values} | {row['strategy']:<12} | {summary['baseline']['mean']['user_spent']:>10.1f} | "
+              f"{summary['efficiency']['limited']:>10.3f} | {summary['efficiency']['permanent']:>12.3f}")
+
+
+def parse_values(text: str, default) -> List:
+    """
+    解析取值：逗号分隔的列表（0.006,0.008）或 起点:终点:步长（70:90:10，含终点）
+    类型与字段的默认值相同
+    """
+    kind = type(default)
+    if ':' in text:
+        start, stop, step = (kind(x) for x in text.split(':'))
+        count = int(round((stop - start) / step)) + 1
+        return [kind(round(start + i * step, 10)) for i in range(count)]
+    return [kind(x) for x in text.split(',')]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GachaConfig 参数扫描")
+    parser.add_argument('--set', action='append', default=[], metavar='字段=取值',
+                        help="扫描的字段与取值，如 base_ssr_rate=0.006,0.008 或 small_pity=70:90:10（可重复）")
+    parser.add_argument('--pools', type=int, default=36, help="卡池数")
+    parser.add_argument('--iterations', type=int, default=5000, help="每个点每种福利模式的模拟次数")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--workers', type=int, default=None, help="并行进程数（默认CPU核数）")
+    parser.add_argument('--cache', default=DEFAULT_SWEEP_CACHE, help="缓存目录")
+    parser.add_argument('--no-cache', action='store_true', help="不读写缓存")
+    parser.add_argument('--paired', action='store_true', help="使用公共随机数（差异噪声更小）")
+    args = parser.parse_args()
+
+    defaults = GachaConfig()
+    grid = {}
+    for item in args.set:
+        name, _, text = item.partition('=')
+        if not hasattr(defaults, name):
+            parser.error(f"GachaConfig 没有字段: {name}")
+        grid[name] = parse_values(text, getattr(defaults, name))
+
+    rows = run_sweep(grid, num_pools=args.pools, iterations=args.iterations, seed=args.seed,
+                     workers=args.workers, cache_dir=None if args.no_cache else args.cache, paired=args.paired)
+    print_sweep(rows, grid)
@@ -0,0 +1,183 @@
+"""
+单卡池精确结果分布的缓存
+
+多池模拟中每个池子都从很少的几种进入状态开始：
+(抽到UP为止/跳过, 小保底水位 0~79, 开局一次性抽完的抽数 0/10/20)。
+60送和限时福利在开局一起抽完，对抽卡过程来说没有区别；永久福利只决定
+"由谁来付"这些抽，也不改变抽卡过程，因此它们都不必放进进入状态，
+用 OUTCOME_FIELDS 加上进入时的福利就能算出实际花费和福利使用数（见 StrategySimulator 的 alias 引擎）。
+
+同一个 GachaConfig 下，同一进入状态的单池结果分布是固定的，
+用 ExactSolver 算一次后缓存起来，之后直接查表抽样即可，不必逐抽重放。
+
+- 内存中按 LRU 保留最近使用的 maxsize 个分布
+- 指定 cache_dir 时同时保存到磁盘（按 GachaConfig 的哈希分目录），下次运行直接读取
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from alias_sampler import AliasTable
+from config import GachaConfig
+from exact_solver import ExactSolver, entry_state
+
+
+DEFAULT_POOL_CACHE_DIR = 'pool_cache'
+DEFAULT_MAXSIZE = 512
+
+# 分布中保存的字段（本池正常抽总数、往期UP数、当期UP数、离开时的小保底水位）
+OUTCOME_FIELDS = ('pool_pulls', 'old_up_count', 'current_up_count', 'small_pity_counter')
+
+# 进入状态: (是否抽到UP为止, 小保底水位, 开局一次性抽完的抽数)
+EntryKey = Tuple[bool, int, int]
+
+
+def config_hash(config: GachaConfig) -> str:
+    """GachaConfig 的内容哈希（前16位）"""
+    content = json.dumps(dataclasses.asdict(config), sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+
+class PoolOutcomeTable:
+    """一种进入状态下单池结果的精确分布（每行一种结果）"""
+
+    def __init__(self, outcomes: np.ndarray, probs: np.ndarray):
+        self.outcomes = outcomes  # (结果数, len(OUTCOME_FIELDS)) int32
+        self.probs = probs  # (结果数,) 概率
+        self.alias = AliasTable(probs)
+
+    def column(self, field: str) -> np.ndarray:
+        return self.outcomes[:, OUTCOME_FIELDS.index(field)]
+
+    def mean(self, field: str) -> float:
+        return float(self.probs @ self.column(field)) / float(self.probs.sum())
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """抽取 size 个结果的行号（别名表，每个结果一次 O(1) 抽样）"""
+        return self.alias.sample(rng, size)
+
+
+class PoolDistributionCache:
+    """按 (GachaConfig, 进入状态, 模式) 缓存单池结果分布，LRU 淘汰，可持久化到磁盘"""
+
+    def __init__(self, config: GachaConfig, maxsize: int = DEFAULT_MAXSIZE, cache_dir: Optional[str] = None):
+        """
+        maxsize: 内存中最多保留的分布个数
+        cache_dir: 磁盘缓存目录（None 表示只在内存中缓存）
+        """
+        self.config = config
+        self.maxsize = maxsize
+        self.solver = ExactSolver(config)
+        self.disk_dir = os.path.join(cache_dir, config_hash(config)) if cache_dir else None
+        self._tables: 'OrderedDict[EntryKey, PoolOutcomeTable]' = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def entry_key(pull: bool, small_pity_counter: int, block: int = 0) -> EntryKey:
+        """
+        进入状态
+        block: 开局一次性抽完的抽数（60送 + 本池使用的限时福利）
+        """
+        return bool(pull), int(small_pity_counter), int(block)
+
+    def get(self, key: EntryKey) -> PoolOutcomeTable:
+        """取一种进入状态的分布（内存 → 磁盘 → 精确求解）"""
+        table = self._tables.get(key)
+        if table is not None:
+            self.hits += 1
+            self._tables.move_to_end(key)
+            return table
+
+        table = self._load(key)
+        if table is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            table = self._solve(key)
+            self._save(key, table)
+
+        self._tables[key] = table
+        if len(self._tables) > self.maxsize:
+            self._tables.popitem(last=False)
+        return table
+
+    def _solve(self, key: EntryKey) -> PoolOutcomeTable:
+        pull, small, block = key
+        # 一次性抽完的部分统一按限时福利求解（与60送对抽卡过程的作用相同）
+        state = entry_state(small, welfare_limited=block)
+        if pull:
+            dist = self.solver.solve_pull_until_target(state, False, OUTCOME_FIELDS)
+        else:
+            dist = self.solver.solve_skip_pool(state, True, OUTCOME_FIELDS)
+        outcomes = np.array(list(dist.pmf.keys()), dtype=np.int32).reshape(-1, len(OUTCOME_FIELDS))
+        probs = np.array(list(dist.pmf.values()), dtype=np.float64)
+        return PoolOutcomeTable(outcomes, probs)
+
+    def _path(self, key: EntryKey) -> str:
+        pull, small, block = key
+        name = f"{'pull' if pull else 'skip'}_s{small}_b{block}.npz"
+        return os.path.join(self.disk_dir, name)
+
+    def _load(self, key: EntryKey) -> Optional[PoolOutcomeTable]:
+        if self.disk_dir is None or not os.path.isfile(self._path(key)):
+            return None
+        with np.load(self._path(key)) as data:
+            return PoolOutcomeTable(data['outcomes'], data['probs'])
+
+    def _save(self, key: EntryKey, table: PoolOutcomeTable):
+        if self.disk_dir is None:
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        path = self._path(key)
+        # 先写临时文件再改名，多个进程同时写同一个分布也不会读到残缺文件
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, outcomes=table.outcomes, probs=table.probs)
+        os.replace(tmp, path)
+
+    def all_keys(self) -> List[EntryKey]:
+        """多池策略模拟中可能出现的全部进入状态（一次性抽完的部分为 0/10/20 抽）"""
+        return [self.entry_key(pull, small, block) for pull in (True, False)
+                for small in range(self.config.small_pity) for block in (0, 10, 20)]
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def print_stats(self):
+        total = self.hits + self.disk_hits + self.misses
+        print(f"单池分布缓存: {len(self)} 个在内存中，请求 {total} 次，"
+              f"内存命中 {self.hits}，磁盘命中 {self.disk_hits}，求解 {self.misses}")
+
+
+def _solve_to_disk(config: GachaConfig, cache_dir: str, key: EntryKey):
+    """工作进程：求解一种进入状态并写入磁盘缓存"""
+    cache = PoolDistributionCache(config, maxsize=1, cache_dir=cache_dir)
+    cache._save(key, cache._solve(key))
+
+
+def warm_pool_cache(config: GachaConfig, cache_dir: str = DEFAULT_POOL_CACHE_DIR, workers: Optional[int] = None):
+    """
+    多进程预先求解磁盘缓存中还没有的全部进入状态
+    （多个工作进程各自懒加载时会重复求解同一个分布，先统一求解一遍再分发任务）
+    """
+    cache = PoolDistributionCache(config, cache_dir=cache_dir)
+    missing = [key for key in cache.all_keys() if not os.path.isfile(cache._path(key))]
+    if not missing:
+        return
+    print(f"求解单池精确分布: {len(missing)} 种进入状态...")
+    begin = time.time()
+    if workers == 1:
+        for key in missing:
+            _solve_to_disk(config, cache_dir, key)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_solve_to_disk, *zip(*((config, cache_dir, key) for key in missing))))
+    print(f"求解完成，用时 {time.time() - begin:.1f} 秒")
@@ -1,10 +1,26 @@
 """
 卡池状态类
+
+- PoolState: 单次模拟的状态（__slots__，没有实例字典，属性访问更快、更省内存）
+- PoolStateArray: 多次模拟的状态（结构数组，每个字段一个长度为 n 的数组），供批量推进使用
+
+两者都提供原地的 reset_for_new_pool：切换卡池时只改写需要清零的字段，
+保留跨池继承的小保底与不限时福利，不再为每个卡池新建状态对象。
 """
+from typing import Optional, Union
+
+import numpy as np
+
+
+# 状态字段（顺序与 pull_kernel 的状态数组一致）
+STATE_FIELDS = ('small_pity_counter', 'large_pity_counter', 'total_pulls', 'got_30_bonus',
+                'bonus_10_special', 'bonus_10_normal', 'welfare_limited', 'welfare_permanent')
 
 
 class PoolState:
     """单个卡池的状态"""
+    __slots__ = STATE_FIELDS
+
     def __init__(self):
         self.small_pity_counter = 0  # 小保底计数（跨池继承）
         self.large_pity_counter = 0  # 大保底计数（仅当期）
@@ -14,3 +30,85 @@ class PoolState:
         self.bonus_10_normal = 0  # 正常10抽剩余（来自上期）
         self.welfare_limited = 0  # 策划限时福利抽（仅当期，过期作废）
         self.welfare_permanent = 0  # 策划不限时福利抽（可跨期积攒）
+
+    def reset_for_new_pool(self, prev_pool_pulls: int = 0):
+        """
+        原地切换到新卡池：小保底与不限时福利保留，其余清零
+        prev_pool_pulls: 上一个卡池的抽数（满60抽本期送10正常抽）
+        """
+        self.large_pity_counter = 0
+        self.total_pulls = 0
+        self.got_30_bonus = False
+        self.bonus_10_special = 0
+        self.bonus_10_normal = 10 if prev_pool_pulls >= 60 else 0
+        self.welfare_limited = 0
+
+    def reset(self):
+        """原地恢复为初始状态（开始一次新的模拟）"""
+        self.__init__()
+
+    def copy(self) -> 'PoolState':
+        state = PoolState.__new__(PoolState)
+        for name in STATE_FIELDS:
+            setattr(state, name, getattr(self, name))
+        return state
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PoolState):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in STATE_FIELDS)
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)}" for name in STATE_FIELDS)
+        return f"PoolState({fields})"
+
+
+class PoolStateArray:
+    """
+    n 次模拟的卡池状态（结构数组）
+    每个字段是长度为 n 的数组，第 i 个元素对应第 i 次模拟
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.small_pity_counter = np.zeros(n, dtype=np.int32)  # 小保底计数（跨池继承）
+        self.large_pity_counter = np.zeros(n, dtype=np.int32)  # 大保底计数（仅当期）
+        self.total_pulls = np.zeros(n, dtype=np.int32)  # 当期总抽数
+        self.got_30_bonus = np.zeros(n, dtype=bool)  # 是否已获得30抽奖励
+        self.bonus_10_special = np.zeros(n, dtype=np.int32)  # 特殊10抽剩余
+        self.bonus_10_normal = np.zeros(n, dtype=np.int32)  # 正常10抽剩余（来自上期）
+        self.welfare_limited = np.zeros(n, dtype=np.int32)  # 限时福利抽（仅当期）
+        self.welfare_permanent = np.zeros(n, dtype=np.int32)  # 不限时福利抽（可跨期积攒）
+
+    def __len__(self) -> int:
+        return self.n
+
+    def reset_for_new_pool(self, prev_pool_pulls: Union[int, np.ndarray] = 0,
+                           mask: Optional[np.ndarray] = None):
+        """
+        切换到新卡池（小保底和永久福利继承，其余清零）
+        prev_pool_pulls: 上一个卡池的抽数（标量或长度为 n 的数组）
+        mask: 只重置被选中的模拟（None 表示全部）
+        """
+        sel = slice(None) if mask is None else mask
+        prev = np.broadcast_to(np.asarray(prev_pool_pulls), (self.n,))[sel]
+
+        # 上期满60抽，本期送10正常抽（先于清零计算，prev_pool_pulls 可能就是 total_pulls）
+        self.bonus_10_normal[sel] = np.where(prev >= 60, 10, 0)
+        self.large_pity_counter[sel] = 0
+        self.total_pulls[sel] = 0
+        self.got_30_bonus[sel] = False
+        self.bonus_10_special[sel] = 0
+        self.welfare_limited[sel] = 0
+
+    def get(self, i: int) -> PoolState:
+        """第 i 次模拟的状态（副本）"""
+        state = PoolState()
+        for name in STATE_FIELDS:
+            setattr(state, name, getattr(self, name)[i].item())
+        return state
+
+    def set(self, i: int, state: PoolState):
+        """把第 i 次模拟的状态设为 state"""
+        for name in STATE_FIELDS:
+            getattr(self, name)[i] = getattr(state, name)
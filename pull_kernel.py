@@ -0,0 +1,290 @@
+"""
+单卡池抽卡循环的编译内核
+
+GachaSimulator 的 single_pull_normal / calculate_current_ssr_rate / determine_ssr_type
+每抽都要调用，开销主要在 self.state / self.config 的属性查找上。这里把整个
+pull_until_target / 跳池循环写成只操作整数数组与浮点数的函数：
+- 安装了 numba 时用 numba.njit 编译
+- 否则直接作为纯 Python 函数运行（结果相同，只是没有加速）
+
+随机数按 GachaSimulator 的顺序逐个取用（每次正常/特殊抽先判定是否出6星，出了再判定类型），
+比较运算与概率计算也完全一致，因此给定同一个随机数流时，结果与 GachaSimulator 逐位相同。
+"""
+from typing import Tuple
+
+import numpy as np
+
+from config import GachaConfig
+from pool_state import STATE_FIELDS
+from simulator_core import GachaSimulator, PullAccumulator
+from skip_ahead import SkipAheadGachaSimulator
+
+try:
+    import numba
+    HAS_NUMBA = True
+    _jit = numba.njit(cache=True)
+except ImportError:
+    HAS_NUMBA = False
+
+    def _jit(func):
+        return func
+
+
+# 状态数组各下标对应 PoolState 的 STATE_FIELDS
+_SMALL, _LARGE, _TOTAL, _GOT_30, _SPECIAL, _NORMAL, _LIMITED, _PERMANENT = range(len(STATE_FIELDS))
+
+# 计数数组各下标的含义
+COUNTER_FIELDS = ('pulls', 'bonus_normal_used', 'bonus_special_used', 'welfare_limited_used',
+                  'welfare_permanent_used', 'current_up_count', 'old_up_count')
+_PULLS, _BONUS_NORMAL, _BONUS_SPECIAL, _W_LIMITED, _W_PERMANENT, _CURRENT_UP, _OLD_UP = range(len(COUNTER_FIELDS))
+
+# 单抽结果
+MISS, CURRENT_UP, OLD_UP, STANDARD = 0, 1, 2, 3
+
+# 六星类型判定的分界（与 GachaSimulator.determine_ssr_type 的表达式相同）
+_CURRENT_UP_BOUND = 0.5
+_OLD_UP_BOUND = 0.5 + 0.5 * 2 / 7
+
+DEFAULT_BUFFER_SIZE = 4096  # 每次补充的均匀随机数个数
+
+
+@_jit
+def _ssr_type(u: np.ndarray, pos: int) -> Tuple[int, int]:
+    """六星类型，返回 (结果, 新的随机数位置)"""
+    rand = u[pos]
+    if rand < _CURRENT_UP_BOUND:
+        return CURRENT_UP, pos + 1
+    if rand < _OLD_UP_BOUND:
+        return OLD_UP, pos + 1
+    return STANDARD, pos + 1
+
+
+@_jit
+def single_pull_normal(state: np.ndarray, u: np.ndarray, pos: int, base_rate: float, increase_threshold: int,
+                       increase_rate: float, small_pity: int, large_pity: int) -> Tuple[int, int]:
+    """正常单抽（计入保底），返回 (结果, 新的随机数位置)"""
+    state[_SMALL] += 1
+    state[_LARGE] += 1
+    state[_TOTAL] += 1
+
+    if state[_TOTAL] >= 30 and state[_GOT_30] == 0:
+        state[_GOT_30] = 1
+        state[_SPECIAL] = 10
+
+    if state[_LARGE] >= large_pity:
+        state[_SMALL] = 0
+        state[_LARGE] = 0
+        return CURRENT_UP, pos
+
+    if state[_SMALL] < small_pity:
+        rate = base_rate
+        if state[_SMALL] > increase_threshold:
+            rate += (state[_SMALL] - increase_threshold) * increase_rate
+        hit = u[pos] < rate
+        pos += 1
+        if not hit:
+            return MISS, pos
+
+    state[_SMALL] = 0
+    kind, pos = _ssr_type(u, pos)
+    if kind == CURRENT_UP:
+        state[_LARGE] = 0
+    return kind, pos
+
+
+@_jit
+def single_pull_special(u: np.ndarray, pos: int, base_rate: float) -> Tuple[int, int]:
+    """特殊单抽（不计入保底），返回 (结果, 新的随机数位置)"""
+    hit = u[pos] < base_rate
+    pos += 1
+    if not hit:
+        return MISS, pos
+    return _ssr_type(u, pos)
+
+
+@_jit
+def _count(counters: np.ndarray, kind: int):
+    if kind == OLD_UP:
+        counters[_OLD_UP] += 1
+    elif kind == CURRENT_UP:
+        counters[_CURRENT_UP] += 1
+
+
+@_jit
+def _pull_block(state: np.ndarray, counters: np.ndarray, u: np.ndarray, pos: int, use_limited: bool,
+                base_rate: float, increase_threshold: int, increase_rate: float,
+                small_pity: int, large_pity: int) -> int:
+    """一次性抽完60送正常10抽（以及限时福利），返回新的随机数位置"""
+    bonus = state[_NORMAL]
+    limited = state[_LIMITED] if use_limited else 0
+    state[_NORMAL] = 0
+    if use_limited:
+        state[_LIMITED] = 0
+    counters[_BONUS_NORMAL] += bonus
+    counters[_W_LIMITED] += limited
+    for _ in range(bonus + limited):
+        kind, pos = single_pull_normal(state, u, pos, base_rate, increase_threshold, increase_rate,
+                                       small_pity, large_pity)
+        _count(counters, kind)
+    return pos
+
+
+@_jit
+def pull_until_target(state: np.ndarray, counters: np.ndarray, u: np.ndarray, pos: int, use_welfare: bool,
+                      base_rate: float, increase_threshold: int, increase_rate: float,
+                      small_pity: int, large_pity: int) -> int:
+    """
+    抽到当期UP为止（规则与 GachaSimulator.pull_until_target 相同）
+    state / counters 原地更新，返回新的随机数位置
+    """
+    while True:
+        if state[_NORMAL] > 0 or state[_LIMITED] > 0:
+            pos = _pull_block(state, counters, u, pos, True, base_rate, increase_threshold, increase_rate,
+                              small_pity, large_pity)
+            if counters[_CURRENT_UP] > 0:
+                return pos
+            continue
+
+        if state[_SPECIAL] > 0:
+            pulls = state[_SPECIAL]
+            state[_SPECIAL] = 0
+            counters[_BONUS_SPECIAL] += pulls
+            for _ in range(pulls):
+                kind, pos = single_pull_special(u, pos, base_rate)
+                _count(counters, kind)
+            if counters[_CURRENT_UP] > 0:
+                return pos
+            continue
+
+        if use_welfare and state[_PERMANENT] > 0:
+            state[_PERMANENT] -= 1
+            counters[_W_PERMANENT] += 1
+        else:
+            counters[_PULLS] += 1
+        kind, pos = single_pull_normal(state, u, pos, base_rate, increase_threshold, increase_rate,
+                                       small_pity, large_pity)
+        _count(counters, kind)
+        if kind == CURRENT_UP:
+            return pos
+
+
+@_jit
+def pull_bonus_and_free_limited_welfare(state: np.ndarray, counters: np.ndarray, u: np.ndarray, pos: int,
+                                        use_limited_welfare: bool, base_rate: float, increase_threshold: int,
+                                        increase_rate: float, small_pity: int, large_pity: int) -> int:
+    """跳过的池子只抽赠送与限时福利（规则与 GachaSimulator 的同名方法相同），返回新的随机数位置"""
+    if state[_NORMAL] > 0 or (use_limited_welfare and state[_LIMITED] > 0):
+        pos = _pull_block(state, counters, u, pos, use_limited_welfare, base_rate, increase_threshold,
+                          increase_rate, small_pity, large_pity)
+    return pos
+
+
+class CompiledGachaSimulator(GachaSimulator):
+    """
+    使用编译内核的 GachaSimulator（接口、状态与返回值相同，结果字典形式的方法继承自 GachaSimulator）
+
+    均匀随机数按块从 rng 预先取出，之后按 GachaSimulator 的顺序逐个使用：
+    同一个随机数流只交给一个模拟器使用时，结果与 GachaSimulator 逐位相同。
+    """
+
+    def __init__(self, config: GachaConfig, rng=None, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        super().__init__(config, rng)
+        max_rate = config.base_ssr_rate + max(config.small_pity - 1 - config.increase_threshold, 0) * config.increase_rate
+        assert max_rate <= 1.0, "概率不能超过100%"
+        self.buffer_size = buffer_size
+        self._params = (config.base_ssr_rate, config.increase_threshold, config.increase_rate,
+                        config.small_pity, config.large_pity)
+        self._uniforms = np.empty(0)
+        self._pos = 0
+        self._state = np.zeros(len(STATE_FIELDS), dtype=np.int64)
+        self._counters = np.zeros(len(COUNTER_FIELDS), dtype=np.int64)
+
+    def _reserve(self, count: int) -> np.ndarray:
+        """保证缓冲区中至少还有 count 个未使用的随机数"""
+        if len(self._uniforms) - self._pos < count:
+            size = max(count, self.buffer_size)
+            if hasattr(self.rng, 'uniforms'):
+                fresh = self.rng.uniforms(size)
+            else:
+                fresh = np.array([self.rng.random() for _ in range(size)])
+            self._uniforms = np.concatenate([self._uniforms[self._pos:], fresh])
+            self._pos = 0
+        return self._uniforms
+
+    def _max_draws(self) -> int:
+        """一次调用最多消耗的随机数个数（每抽至多两个）"""
+        state = self.state
+        return 2 * (state.bonus_10_normal + state.welfare_limited + state.bonus_10_special + 10
+                    + self.config.large_pity)
+
+    def _load_state(self) -> np.ndarray:
+        for i, name in enumerate(STATE_FIELDS):
+            self._state[i] = getattr(self.state, name)
+        return self._state
+
+    def _store_state(self):
+        for name, value in zip(STATE_FIELDS, self._state.tolist()):
+            setattr(self.state, name, value)
+        self.state.got_30_bonus = bool(self.state.got_30_bonus)
+
+    def single_pull_normal(self) -> Tuple[bool, bool, bool]:
+        u = self._reserve(2)
+        kind, self._pos = single_pull_normal(self._load_state(), u, self._pos, *self._params)
+        self._store_state()
+        return kind != MISS, kind == CURRENT_UP, kind == OLD_UP
+
+    def single_pull_special(self) -> Tuple[bool, bool, bool]:
+        u = self._reserve(2)
+        kind, self._pos = single_pull_special(u, self._pos, self.config.base_ssr_rate)
+        return kind != MISS, kind == CURRENT_UP, kind == OLD_UP
+
+    def pull_until_target_into(self, acc: PullAccumulator, use_welfare: bool = False) -> PullAccumulator:
+        u = self._reserve(self._max_draws())
+        counters = self._counters
+        counters[:] = 0
+        self._pos = pull_until_target(self._load_state(), counters, u, self._pos, use_welfare, *self._params)
+        self._store_state()
+        return self._accumulate(acc, counters)
+
+    def pull_bonus_and_free_limited_welfare_into(self, acc: PullAccumulator,
+                                                 use_limited_welfare: bool = False) -> PullAccumulator:
+        u = self._reserve(self._max_draws())
+        counters = self._counters
+        counters[:] = 0
+        self._pos = pull_bonus_and_free_limited_welfare(self._load_state(), counters, u, self._pos,
+                                                        use_limited_welfare, *self._params)
+        self._store_state()
+        assert self.state.bonus_10_special == 0, "跳过的池子不应该够到30抽赠送10抽"
+        return self._accumulate(acc, counters)
+
+    def _accumulate(self, acc: PullAccumulator, counters: np.ndarray) -> PullAccumulator:
+        """计数数组累加到 acc"""
+        (pulls, bonus_normal_used, bonus_special_used, welfare_limited_used, welfare_permanent_used,
+         current_up_count, old_up_count) = counters.tolist()
+        acc.pulls += pulls
+        acc.bonus_normal_used += bonus_normal_used
+        acc.bonus_special_used += bonus_special_used
+        acc.welfare_limited_used += welfare_limited_used
+        acc.welfare_permanent_used += welfare_permanent_used
+        acc.current_up_count += current_up_count
+        acc.old_up_count += old_up_count
+        acc.pool_pulls = self.state.total_pulls
+        return acc
+
+
+BACKENDS = ('python', 'compiled', 'skip_ahead')
+
+
+def create_simulator(config: GachaConfig, rng=None, backend: str = 'python') -> GachaSimulator:
+    """
+    按后端名创建单卡池模拟器
+    'compiled' 在未安装 numba 时以纯 Python 运行同一内核；
+    'skip_ahead' 在固定概率区间按几何分布跳跃（同分布，随机数用法不同）
+    """
+    if backend == 'python':
+        return GachaSimulator(config, rng)
+    if backend == 'compiled':
+        return CompiledGachaSimulator(config, rng)
+    if backend == 'skip_ahead':
+        return SkipAheadGachaSimulator(config, rng)
+    raise ValueError(f"未知的后端: {backend}（可选 {', '.join(BACKENDS)}）")
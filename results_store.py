@@ -0,0 +1,120 @@
+"""
+模拟结果的磁盘格式
+
+结果保存为一个目录：
+    simulation_results/
+    ├── header.json                    # 格式版本、GachaConfig、池子数、种子、策略名、各列类型
+    └── s{策略序号}_{福利模式}_{列名}.npy  # 每一列一个 .npy 文件
+
+读取时各列以内存映射方式打开，打开文件几乎不花时间，
+只有真正被访问的列（以及被访问的部分）才会从磁盘读入。
+"""
+import dataclasses
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+from config import GachaConfig
+from strategy_results import COLUMNS, StrategyResults
+from strategy_schedule import BUILTIN_STRATEGIES
+
+
+FORMAT_NAME = 'gacha-simulation-results'
+FORMAT_VERSION = 1
+HEADER_FILE = 'header.json'
+DEFAULT_RESULTS_DIR = 'simulation_results'
+
+# 每个策略/福利模式保存的列（StrategyResults 的数组列 + 小保底历史）
+STORED_COLUMNS = dict(COLUMNS, pity_history=np.uint8)
+
+
+def _column_file(strategy_idx: int, mode_key: str, column: str) -> str:
+    return f"s{strategy_idx}_{mode_key}_{column}.npy"
+
+
+def save_results(path: str, all_strategies_data: Dict[str, Dict[str, StrategyResults]], num_pools: int,
+                 config: GachaConfig, seed: Optional[int] = None, iterations: Optional[int] = None):
+    """
+    保存全部策略结果
+    path: 结果目录（不存在则创建，已有的同名文件会被覆盖）
+    """
+    os.makedirs(path, exist_ok=True)
+    titles = {schedule.name: schedule.title for schedule in BUILTIN_STRATEGIES}
+
+    strategies = []
+    for s_idx, (name, modes) in enumerate(all_strategies_data.items()):
+        entry = {'name': name, 'title': titles.get(name, name), 'modes': {}}
+        for mode_key, results in modes.items():
+            for column in STORED_COLUMNS:
+                np.save(os.path.join(path, _column_file(s_idx, mode_key, column)), getattr(results, column))
+            entry['modes'][mode_key] = {'iterations': len(results), 'welfare_invested': results.welfare_invested}
+        strategies.append(entry)
+
+    header = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'config': dataclasses.asdict(config),
+        'num_pools': num_pools,
+        'seed': seed,
+        'iterations': iterations,
+        'columns': {column: np.dtype(dtype).name for column, dtype in STORED_COLUMNS.items()},
+        'strategies': strategies,
+    }
+    # 列文件全部写完后再写头文件，中途失败不会留下看起来完整的结果
+    with open(os.path.join(path, HEADER_FILE), 'w', encoding='utf-8') as f:
+        json.dump(header, f, ensure_ascii=False, indent=2)
+
+
+def read_header(path: str) -> Dict:
+    """读取并检查头文件"""
+    with open(os.path.join(path, HEADER_FILE), encoding='utf-8') as f:
+        header = json.load(f)
+    if header.get('format') != FORMAT_NAME:
+        raise ValueError(f"'{path}' 不是模拟结果目录")
+    if header.get('version') != FORMAT_VERSION:
+        raise ValueError(f"不支持的结果格式版本: {header.get('version')}（当前版本 {FORMAT_VERSION}）")
+    return header
+
+
+def load_results(path: str = DEFAULT_RESULTS_DIR, mmap: bool = True) -> Dict:
+    """
+    读取全部策略结果
+    mmap: 是否以内存映射方式打开各列（False 时全部读入内存）
+
+    返回: {
+        'all_strategies_data': {策略名: {福利模式: StrategyResults}},
+        'num_pools': int,
+        'config': Dict（GachaConfig 的字段）,
+        'seed': 随机种子,
+        'iterations': 模拟次数,
+        'header': 完整的头文件内容
+    }
+    """
+    header = read_header(path)
+    mmap_mode = 'r' if mmap else None
+
+    all_strategies_data = {}
+    for s_idx, entry in enumerate(header['strategies']):
+        modes = {}
+        for mode_key, info in entry['modes'].items():
+            columns = {column: np.load(os.path.join(path, _column_file(s_idx, mode_key, column)),
+                                       mmap_mode=mmap_mode)
+                       for column in STORED_COLUMNS}
+            modes[mode_key] = StrategyResults(**columns, welfare_invested=info['welfare_invested'])
+        all_strategies_data[entry['name']] = modes
+
+    return {
+        'all_strategies_data': all_strategies_data,
+        'num_pools': header['num_pools'],
+        'config': header['config'],
+        'seed': header['seed'],
+        'iterations': header['iterations'],
+        'header': header,
+    }
+
+
+def is_results_dir(path: str) -> bool:
+    """path 是否为结果目录"""
+    return os.path.isfile(os.path.join(path, HEADER_FILE))
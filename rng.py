@@ -0,0 +1,113 @@
+"""
+可复现、可拆分的随机数流
+
+GachaRNG 基于 NumPy 的 Generator / SeedSequence：
+- 同一种子得到完全相同的随机序列
+- stream(i) 按编号派生互相独立的子流（每次模拟 / 每个进程一个），与派生顺序无关
+- 均匀随机数按块预先生成，random() 直接从块中取值，避免逐次调用的开销
+- CommonRandomStreams 按模拟编号对齐随机数，用于福利模式之间的配对比较（公共随机数）
+
+接口与 random 模块的 random() / randint() 一致，模拟器中可以直接替换。
+"""
+import itertools
+from typing import Iterator, List, Union
+
+import numpy as np
+
+
+DEFAULT_BLOCK_SIZE = 1024  # 每次预先生成的均匀随机数个数
+_MAX_UNIFORM = 1.0 - 2.0 ** -53  # 小于 1 的最大浮点数（对偶变量 1-u 仍在 [0, 1) 内）
+
+
+class GachaRNG:
+    """可复现、可拆分的随机数流"""
+
+    def __init__(self, seed: Union[None, int, List[int], np.random.SeedSequence] = None,
+                 block_size: int = DEFAULT_BLOCK_SIZE):
+        """
+        seed: 整数、整数列表或 SeedSequence（None 为随机种子）
+        block_size: 每次预先生成的均匀随机数个数
+        """
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_seq = seed
+        else:
+            self.seed_seq = np.random.SeedSequence(seed)
+        self.block_size = block_size
+        self.generator = np.random.Generator(np.random.PCG64(self.seed_seq))
+
+        # random() 直接绑定到块迭代器的 __next__（C 实现，无 Python 层调用开销）
+        self._stream = itertools.chain.from_iterable(self._blocks())
+        self.random = self._stream.__next__
+
+    def _blocks(self) -> Iterator[List[float]]:
+        while True:
+            yield self.generator.random(self.block_size).tolist()
+
+    def uniforms(self, n: int) -> np.ndarray:
+        """接下来的 n 个均匀随机数（与连续调用 n 次 random() 得到的值相同）"""
+        return np.fromiter(itertools.islice(self._stream, n), dtype=np.float64, count=n)
+
+    def randint(self, a: int, b: int) -> int:
+        """[a, b] 内的随机整数"""
+        return a + int(self.random() * (b - a + 1))
+
+    def stream(self, index: int) -> 'GachaRNG':
+        """第 index 个子流（同一父流、同一编号总是得到相同的子流）"""
+        child = np.random.SeedSequence(self.seed_seq.entropy,
+                                       spawn_key=self.seed_seq.spawn_key + (index,),
+                                       pool_size=self.seed_seq.pool_size)
+        return GachaRNG(child, self.block_size)
+
+    def spawn(self, n: int) -> List['GachaRNG']:
+        """依次派生 n 个新的独立子流（注意不要与 stream() 混用，两者的编号会重叠）"""
+        return [GachaRNG(child, self.block_size) for child in self.seed_seq.spawn(n)]
+
+
+
+class CommonRandomStreams:
+    """
+    按模拟编号对齐的均匀随机数流（公共随机数 / 对偶变量）
+
+    批量引擎一次为很多模拟抽随机数，各模拟消耗的个数不同，直接共用一个 Generator 时
+    第 i 次模拟拿到的随机数取决于其他模拟的进度。这里每次模拟、每种用途各有一个计数器，
+    第 i 次模拟第 k 次取用途 s 的随机数总是同一个值：
+    用同一个种子模拟不同的福利模式时，同一次模拟的每个 6 星间隔、6 星类型都由相同的随机数决定，
+    福利方案之间的差异不再被独立抽样的噪声淹没。
+
+    antithetic=True 时第 2j+1 次模拟使用第 2j 次模拟的 1-u（对偶变量）。
+    """
+
+    def __init__(self, seed: Union[int, List[int], np.random.SeedSequence], n: int, num_streams: int,
+                 antithetic: bool = False, block_size: int = 64):
+        """
+        seed: 种子（相同种子得到相同的随机数表）
+        n: 模拟次数
+        num_streams: 用途数（每种用途一个独立的流）
+        block_size: 随机数表每次扩展的列数
+        """
+        seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        children = seed_seq.spawn(num_streams + 1)
+        self.n = n
+        self.antithetic = antithetic
+        self.block_size = block_size
+        self.generator = np.random.Generator(np.random.PCG64(children[-1]))  # 其他用途（如随机抽卡计划）
+        self._generators = [np.random.Generator(np.random.PCG64(child)) for child in children[:-1]]
+        self._rows = (n + 1) // 2 if antithetic else n
+        self._tables = [np.empty((self._rows, 0)) for _ in range(num_streams)]
+        self._counters = [np.zeros(n, dtype=np.int64) for _ in range(num_streams)]
+
+    def uniform(self, stream: int, trials: np.ndarray) -> np.ndarray:
+        """编号为 trials 的模拟各取一个用途 stream 的均匀随机数"""
+        counter = self._counters[stream]
+        col = counter[trials]
+        counter[trials] += 1
+        if len(col) and col.max() >= self._tables[stream].shape[1]:
+            # 按列扩展随机数表：第 k 次扩展的内容与何时扩展无关
+            width = self._tables[stream].shape[1]
+            blocks = -(-(int(col.max()) + 1 - width) // self.block_size)
+            extra = self._generators[stream].random((blocks, self._rows, self.block_size))
+            self._tables[stream] = np.concatenate([self._tables[stream], *extra], axis=1)
+        if not self.antithetic:
+            return self._tables[stream][trials, col]
+        u = self._tables[stream][trials // 2, col]
+        return np.where(trials & 1, np.minimum(1.0 - u, _MAX_UNIFORM), u)
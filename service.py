@@ -0,0 +1,370 @@
+"""
+本地模拟服务（HTTP/JSON）
+
+常驻进程，对外提供策略模拟与精确求解，供看板等工具反复调用，不必每次启动 main.py：
+- 启动时创建并预热工作进程（导入模块、跑一次小模拟），之后的请求不再付启动开销
+- 模拟按块进行（与 run_all_strategies 的块相同：从第 i 次开始的块使用 GachaRNG([种子, 策略, 福利模式]).stream(i)），
+  块结果放进 LRU 缓存；同时到达的请求需要同一块时只模拟一次（合并）
+- 模拟次数不是块大小整数倍时，余数部分取下一整块的前 r 次：
+  同一 (GachaConfig, 策略, 福利模式, 种子) 的小请求都落在同一块上，合并为一次批量模拟，
+  结果与是否命中缓存、是否与其他请求合并无关；次数为块大小整数倍时与 main.py --seed 相同
+- 完整请求 (GachaConfig, 策略, 福利模式, 次数, 种子, 池子数, 引擎) 的响应也按 LRU 缓存
+
+接口（请求体与响应均为 JSON；config 为 GachaConfig 中要修改的字段，省略时用默认值）：
+    POST /simulate        {"strategy": 1-6 或策略名, "welfare_mode": null/"limited"/"permanent",
+                           "iterations": 5000, "seed": 0, "num_pools": 36, "engine": "batch", "config": {}}
+    POST /exact/pool      {"small_pity_counter": 0, "prev_pool_pulls": 0, "welfare_limited": 0,
+                           "welfare_permanent": 0, "use_welfare": false, "skip": false, "field": "pulls", "config": {}}
+    POST /exact/strategy  {"strategy": 1, "welfare_mode": null, "num_pools": 36, "config": {}}
+    GET  /stats           缓存命中 / 合并 / 模拟块数
+    GET  /health
+
+用法:
+    python service.py --port 8765 --workers 4
+    curl -s localhost:8765/simulate -d '{"strategy": 2, "welfare_mode": "limited", "iterations": 2000}'
+"""
+import argparse
+import dataclasses
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from aggregate_cube import summarize
+from config import GachaConfig
+from exact_solver import POOL_FIELDS, ExactSolver, entry_state
+from parallel_runner import DEFAULT_CHUNK_SIZE, _run_chunk
+from strategy_results import StrategyResults
+from strategy_schedule import BUILTIN_STRATEGIES, WELFARE_MODES, WELFARE_MODE_KEYS, StrategySchedule
+from strategy_simulator import ENGINES
+from streaming_stats import StreamingStrategyStats
+from transition_engine import QUANTITIES, TransitionEngine
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 256  # 每种缓存最多保留的条目数
+BLOCK_SIZE = DEFAULT_CHUNK_SIZE  # 模拟块大小（与 main.py 的块相同）
+MAX_ITERATIONS = 10_000_000
+
+
+class CoalescingCache:
+    """
+    线程安全的 LRU 缓存
+    get() 返回 Future：已缓存的立即完成；正在计算的返回同一个 Future（合并并发的相同请求）；
+    否则调用 submit() 开始计算，成功后放入缓存（失败不缓存，下次重新计算）
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items: 'OrderedDict[Hashable, object]' = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable, submit: Callable[[], Future]) -> Tuple[Future, str]:
+        """返回: (结果的 Future, 'hit' / 'coalesced' / 'miss')"""
+        with self._lock:
+            if key in self._items:
+                self.hits += 1
+                self._items.move_to_end(key)
+                future = Future()
+                future.set_result(self._items[key])
+                return future, 'hit'
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, 'coalesced'
+            self.misses += 1
+            future = submit()
+            self._inflight[key] = future
+        # 回调在锁外注册：若 Future 已完成，回调会立即在当前线程执行
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future, 'miss'
+
+    def _finish(self, key: Hashable, future: Future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._items[key] = future.result()
+            self._items.move_to_end(key)
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': len(self._items), 'inflight': len(self._inflight),
+                    'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced}
+
+
+# ========== 请求解析 ==========
+
+def parse_config(overrides: Optional[Dict]) -> GachaConfig:
+    """GachaConfig 的字段覆盖 → GachaConfig"""
+    overrides = overrides or {}
+    fields = {f.name for f in dataclasses.fields(GachaConfig)}
+    unknown = set(overrides) - fields
+    if unknown:
+        raise ValueError(f"GachaConfig 没有字段: {', '.join(sorted(unknown))}")
+    return GachaConfig(**overrides)
+
+
+def parse_strategy(value) -> Tuple[int, StrategySchedule]:
+    """策略序号（1-6）或策略名 → (下标, 策略)"""
+    for s_idx, schedule in enumerate(BUILTIN_STRATEGIES):
+        if value == s_idx + 1 or value == schedule.name:
+            return s_idx, schedule
+    names = ', '.join(schedule.name for schedule in BUILTIN_STRATEGIES)
+    raise ValueError(f"未知的策略: {value}（可选 1-{len(BUILTIN_STRATEGIES)} 或 {names}）")
+
+
+def parse_welfare_mode(value) -> Tuple[int, Optional[str]]:
+    """福利模式（null / "baseline" / "limited" / "permanent"）→ (下标, 福利模式)"""
+    for m_idx, welfare_mode in enumerate(WELFARE_MODES):
+        if value == welfare_mode or value == WELFARE_MODE_KEYS[welfare_mode]:
+            return m_idx, welfare_mode
+    raise ValueError(f"未知的福利模式: {value}（可选 null, {', '.join(WELFARE_MODE_KEYS.values())}）")
+
+
+def _int_param(params: Dict, name: str, default: int, low: int = 0, high: Optional[int] = None) -> int:
+    value = params.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{name} 必须是整数")
+    if value < low or (high is not None and value > high):
+        raise ValueError(f"{name} 超出范围: {value}")
+    return value
+
+
+def _config_key(config: GachaConfig) -> str:
+    return json.dumps(dataclasses.asdict(config), sort_keys=True)
+
+
+# ========== 工作进程中执行的任务 ==========
+
+def _warm_worker() -> int:
+    """预热：导入模块并跑一次小模拟"""
+    _run_chunk(GachaConfig(), BUILTIN_STRATEGIES[0], 3, None, [0, 0, 0], 0, 10)
+    return os.getpid()
+
+
+def _solve_pool(config: GachaConfig, small_pity_counter: int, prev_pool_pulls: int, welfare_limited: int,
+                welfare_permanent: int, use_welfare: bool, skip: bool, field: str) -> Dict:
+    solver = ExactSolver(config)
+    state = entry_state(small_pity_counter, prev_pool_pulls, welfare_limited, welfare_permanent)
+    if skip:
+        dist = solver.solve_skip_pool(state, use_welfare, (field,))
+    else:
+        dist = solver.solve_pull_until_target(state, use_welfare, (field,))
+    return {'field': field, 'mean': dist.mean(field),
+            'pmf': {str(value): p for value, p in dist.marginal(field).items()}}
+
+
+def _solve_strategy(config: GachaConfig, schedule: StrategySchedule, welfare_mode: Optional[str],
+                    num_pools: int) -> Dict:
+    if schedule.min_pity is not None:
+        raise ValueError(f"{schedule.name} 按小保底水位决定是否抽，不能精确计算")
+    dist = TransitionEngine(config).run(schedule, num_pools, welfare_mode)
+    quantities = ('expected_up_count', 'total_current_up_count') + QUANTITIES
+    return {
+        'num_pools': dist.num_pools,
+        'welfare_invested': dist.welfare_invested,
+        'mean': {quantity: dist.mean(quantity) for quantity in quantities},
+        'std': {quantity: dist.std(quantity) for quantity in quantities},
+        'mean_pity_history': dist.mean_pity_history().tolist(),
+    }
+
+
+# ========== 服务 ==========
+
+class SimulationService:
+    """常驻的模拟服务（HTTP 处理线程调用，线程安全）"""
+
+    def __init__(self, workers: Optional[int] = None, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        # 组装响应的线程（只等待各块并汇总，计算都在工作进程中）
+        self.assembler = ThreadPoolExecutor(max_workers=4 * self.workers)
+        self.blocks = CoalescingCache(cache_size)  # 模拟块
+        self.responses = CoalescingCache(cache_size)  # 完整的模拟请求
+        self.exact = CoalescingCache(cache_size)  # 精确求解
+        self.blocks_simulated = 0
+        self.started = time.time()
+
+    def warm_up(self):
+        """启动全部工作进程并预热"""
+        wait([self.executor.submit(_warm_worker) for _ in range(self.workers)])
+
+    def shutdown(self):
+        self.assembler.shutdown(wait=False)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def simulate(self, params: Dict) -> Dict:
+        config = parse_config(params.get('config'))
+        s_idx, schedule = parse_strategy(params.get('strategy', 1))
+        m_idx, welfare_mode = parse_welfare_mode(params.get('welfare_mode'))
+        iterations = _int_param(params, 'iterations', 5000, low=1, high=MAX_ITERATIONS)
+        seed = _int_param(params, 'seed', 0)
+        num_pools = _int_param(params, 'num_pools', 36, low=1, high=1000)
+        engine = params.get('engine', 'batch')
+        if engine not in ENGINES:
+            raise ValueError(f"未知的引擎: {engine}（可选 {', '.join(ENGINES)}）")
+
+        key = ('simulate', _config_key(config), s_idx, m_idx, iterations, seed, num_pools, engine)
+        future, status = self.responses.get(key, lambda: self.assembler.submit(
+            self._simulate, config, s_idx, schedule, m_idx, welfare_mode, iterations, seed, num_pools, engine))
+        return dict(future.result(), cache=status)
+
+    def _block(self, config: GachaConfig, s_idx: int, schedule: StrategySchedule, m_idx: int,
+               welfare_mode: Optional[str], seed: int, num_pools: int, engine: str, start: int) -> Future:
+        """从第 start 次开始的一整块（BLOCK_SIZE 次）模拟"""
+        def submit() -> Future:
+            self.blocks_simulated += 1
+            return self.executor.submit(_run_chunk, config, schedule, num_pools, welfare_mode,
+                                        [seed, s_idx, m_idx], start, BLOCK_SIZE, False, False, False, engine)
+        key = ('block', _config_key(config), s_idx, m_idx, seed, num_pools, engine, start)
+        return self.blocks.get(key, submit)[0]
+
+    def _simulate(self, config: GachaConfig, s_idx: int, schedule: StrategySchedule, m_idx: int,
+                  welfare_mode: Optional[str], iterations: int, seed: int, num_pools: int, engine: str) -> Dict:
+        begin = time.time()
+        # 先提交全部块（各块在工作进程中并行），再按顺序汇总
+        futures = [self._block(config, s_idx, schedule, m_idx, welfare_mode, seed, num_pools, engine, start)
+                   for start in range(0, iterations, BLOCK_SIZE)]
+        stats = None
+        remaining = iterations
+        for future in futures:
+            results: StrategyResults = future.result()
+            if stats is None:
+                stats = StreamingStrategyStats(results.pity_history.shape[1], config.small_pity)
+            stats.update(results.head(remaining) if remaining < len(results) else results)
+            remaining -= len(results)
+        return {
+            'strategy': schedule.name,
+            'welfare_mode': WELFARE_MODE_KEYS[welfare_mode],
+            'iterations': iterations,
+            'seed': seed,
+            'num_pools': num_pools,
+            'engine': engine,
+            'welfare_invested': stats.welfare_invested,
+            'summary': summarize(stats),
+            'mean_pity_history': stats.mean_pity_history().tolist(),
+            'seconds': round(time.time() - begin, 4),
+        }
+
+    def exact_pool(self, params: Dict) -> Dict:
+        config = parse_config(params.get('config'))
+        args = (_int_param(params, 'small_pity_counter', 0, high=config.small_pity - 1),
+                _int_param(params, 'prev_pool_pulls', 0),
+                _int_param(params, 'welfare_limited', 0),
+                _int_param(params, 'welfare_permanent', 0),
+                bool(params.get('use_welfare', False)),
+                bool(params.get('skip', False)),
+                params.get('field', 'current_up_count' if params.get('skip') else 'pulls'))
+        if args[-1] not in POOL_FIELDS:
+            raise ValueError(f"未知的字段: {args[-1]}（可选 {', '.join(POOL_FIELDS)}）")
+        key = ('exact_pool', _config_key(config)) + args
+        future, status = self.exact.get(key, lambda: self.executor.submit(_solve_pool, config, *args))
+        return dict(future.result(), cache=status)
+
+    def exact_strategy(self, params: Dict) -> Dict:
+        config = parse_config(params.get('config'))
+        s_idx, schedule = parse_strategy(params.get('strategy', 1))
+        m_idx, welfare_mode = parse_welfare_mode(params.get('welfare_mode'))
+        num_pools = _int_param(params, 'num_pools', 36, low=1, high=1000)
+        key = ('exact_strategy', _config_key(config), s_idx, m_idx, num_pools)
+        future, status = self.exact.get(key, lambda: self.executor.submit(
+            _solve_strategy, config, schedule, welfare_mode, num_pools))
+        return dict(future.result(), strategy=schedule.name, welfare_mode=WELFARE_MODE_KEYS[welfare_mode],
+                    cache=status)
+
+    def stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'uptime': round(time.time() - self.started, 1),
+            'block_size': BLOCK_SIZE,
+            'blocks_simulated': self.blocks_simulated,
+            'blocks': self.blocks.stats(),
+            'responses': self.responses.stats(),
+            'exact': self.exact.stats(),
+        }
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """把 HTTP 请求分发到 SimulationService（server.service）"""
+
+    POST_ROUTES = {
+        '/simulate': SimulationService.simulate,
+        '/exact/pool': SimulationService.exact_pool,
+        '/exact/strategy': SimulationService.exact_strategy,
+    }
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._reply(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            self._reply(200, self.server.service.stats())
+        else:
+            self._reply(404, {'error': f"未知的路径: {self.path}"})
+
+    def do_POST(self):
+        route = self.POST_ROUTES.get(self.path)
+        if route is None:
+            self._reply(404, {'error': f"未知的路径: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            params = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(params, dict):
+                raise ValueError("请求体必须是 JSON 对象")
+            self._reply(200, route(self.server.service, params))
+        except (ValueError, TypeError) as e:  # json.JSONDecodeError 是 ValueError
+            self._reply(400, {'error': str(e)})
+        except Exception as e:
+            self._reply(500, {'error': f"{type(e).__name__}: {e}"})
+
+    def _reply(self, status: int, body: Dict):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: Optional[int] = None,
+          cache_size: int = DEFAULT_CACHE_SIZE):
+    """启动服务（阻塞，Ctrl+C 停止）"""
+    service = SimulationService(workers, cache_size)
+    print(f"预热 {service.workers} 个工作进程...")
+    begin = time.time()
+    service.warm_up()
+    print(f"预热完成，用时 {time.time() - begin:.1f} 秒")
+
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.service = service
+    print(f"模拟服务已启动: http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n正在停止...")
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="明日方舟终末地抽卡模拟服务（HTTP/JSON）")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"监听地址（默认 {DEFAULT_HOST}）")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"端口（默认 {DEFAULT_PORT}）")
+    parser.add_argument('--workers', type=int, default=None, help="工作进程数（默认CPU核数）")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f"每种缓存最多保留的条目数（默认 {DEFAULT_CACHE_SIZE}）")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.cache_size)
@@ -10,28 +10,20 @@ from pool_state import PoolState
 class GachaSimulator:
     """抽卡模拟器"""
     
-    def __init__(self, config: GachaConfig):
+    def __init__(self, config: GachaConfig, rng=None):
+        """
+        rng: 随机数源，需提供 random() 方法（如 rng.GachaRNG），默认使用 random 模块
+        """
         self.config = config
+        self.rng = rng if rng is not None else random
         self.state = PoolState()
     
     def reset_for_new_pool(self, prev_pool_pulls: int = 0):
         """
-        切换到新卡池
+        切换到新卡池（原地重置状态，小保底与不限时福利跨池保留）
         prev_pool_pulls: 上一个卡池的抽数（用于判断是否送10抽）
         """
-        # 小保底水位继承
-        old_small_pity = self.state.small_pity_counter
-        # 不限时福利需要跨池累积
-        old_welfare_permanent = self.state.welfare_permanent
-        
-        # 重置状态
-        self.state = PoolState()
-        self.state.small_pity_counter = old_small_pity  # 继承小保底
-        self.state.welfare_permanent = old_welfare_permanent  # 不限时福利跨池保留
-        
-        # 上期满60抽，本期送10正常抽
-        if prev_pool_pulls >= 60:
-            self.state.bonus_10_normal = 10
+        self.state.reset_for_new_pool(prev_pool_pulls)
     
     def calculate_current_ssr_rate(self) -> float:
         """计算当前6星概率"""
@@ -55,7 +47,7 @@ class GachaSimulator:
         - 14.2857% (50% * 2/7): 往期UP
         - 35.7143% (50% * 5/7): 常驻六星
         """
-        rand = random.random()
+        rand = self.rng.random()
         
         if rand < 0.5:
             # 50%概率：当期UP
@@ -96,7 +88,7 @@ class GachaSimulator:
         else:
             # 正常概率判定
             ssr_rate = self.calculate_current_ssr_rate()
-            is_ssr = random.random() < ssr_rate
+            is_ssr = self.rng.random() < ssr_rate
         
         if not is_ssr:
             return False, False, False
@@ -121,7 +113,7 @@ class GachaSimulator:
         # 特殊抽不增加任何保底计数器
         # 只使用基础概率判定，不受保底影响
         ssr_rate = self.config.base_ssr_rate
-        is_ssr = random.random() < ssr_rate
+        is_ssr = self.rng.random() < ssr_rate
         
         if not is_ssr:
             return False, False, False
@@ -136,11 +128,7 @@ class GachaSimulator:
         抽到目标UP角色为止
         use_welfare: 是否使用策划福利抽（方案2不限时福利）
         
-        抽卡优先级规则：
-        1. 60送正常10抽 + 限时福利10抽（同一优先级，一起抽完，计入保底）
-        2. 30送特殊10抽（一次性抽完，不计入保底）
-        3. 永久福利抽（逐个使用，计入保底）
-        4. 实际投入抽数（逐个使用，计入保底）
+        抽卡优先级规则见 pull_until_target_into（本方法是它的结果字典形式）
         
         返回: {
             'pulls': 实际消耗的抽数,
@@ -151,11 +139,29 @@ class GachaSimulator:
             'welfare_used': 使用的策划福利抽数,
             'welfare_limited_used': 限时福利使用数,
             'welfare_permanent_used': 永久福利使用数,
+            'pool_pulls': 本期卡池总抽数,
             'old_up_count': 往期UP数量
         }
         """
+        result = self.pull_until_target_into(PullAccumulator(), use_welfare).as_dict()
+        del result['current_up_count']
+        return result
+    
+    def pull_until_target_into(self, acc: 'PullAccumulator', use_welfare: bool = False) -> 'PullAccumulator':
+        """
+        抽到目标UP角色为止，结果累加到 acc（不创建结果字典）
+        use_welfare: 是否使用策划福利抽（方案2不限时福利）
+        
+        抽卡优先级规则：
+        1. 60送正常10抽 + 限时福利10抽（同一优先级，一起抽完，计入保底）
+        2. 30送特殊10抽（一次性抽完，不计入保底）
+        3. 永久福利抽（逐个使用，计入保底）
+        4. 实际投入抽数（逐个使用，计入保底）
+        
+        返回: acc
+        """
+        state = self.state
         actual_pulls = 0  # 实际消耗的抽数
-        bonus_used = 0  # 使用的赠送抽数
         bonus_normal_used = 0  # 60送的正常10抽使用数
         bonus_special_used = 0  # 30送的特殊10抽使用数
         welfare_limited_used = 0  # 限时福利使用数
@@ -165,24 +171,17 @@ class GachaSimulator:
         
         while True:
             # 优先级1：60送正常10抽 + 限时福利10抽（同一优先级，一起抽完）
-            if self.state.bonus_10_normal > 0 or self.state.welfare_limited > 0:
-                # 记录要抽的数量（抽之前先记录，因为后面会清零）
-                bonus_10_count = self.state.bonus_10_normal
-                welfare_limited_count = self.state.welfare_limited
-                combined_pulls = bonus_10_count + welfare_limited_count
+            if state.bonus_10_normal > 0 or state.welfare_limited > 0:
+                combined_pulls = state.bonus_10_normal + state.welfare_limited
+                bonus_normal_used += state.bonus_10_normal
+                welfare_limited_used += state.welfare_limited
                 
                 # 清零状态
-                self.state.bonus_10_normal = 0
-                self.state.welfare_limited = 0
+                state.bonus_10_normal = 0
+                state.welfare_limited = 0
                 
                 # 一次性抽完所有60送和限时福利
-                for i in range(combined_pulls):
-                    if i < bonus_10_count:
-                        bonus_used += 1
-                        bonus_normal_used += 1
-                    else:
-                        welfare_limited_used += 1
-                    
+                for _ in range(combined_pulls):
                     is_ssr, is_current_up, is_old_up = self.single_pull_normal()
                     if is_old_up:
                         old_up_count += 1
@@ -190,27 +189,15 @@ class GachaSimulator:
                         current_up_count += 1
                 
                 if current_up_count > 0:
-                    return {
-                        'pulls': actual_pulls,
-                        'total_pulls': actual_pulls + bonus_used + welfare_limited_used + welfare_permanent_used,
-                        'bonus_used': bonus_used,
-                        'bonus_normal_used': bonus_normal_used,
-                        'bonus_special_used': bonus_special_used,
-                        'welfare_used': welfare_limited_used + welfare_permanent_used,
-                        'welfare_limited_used': welfare_limited_used,
-                        'welfare_permanent_used': welfare_permanent_used,
-                        'pool_pulls': self.state.total_pulls,
-                        'old_up_count': old_up_count
-                    }
+                    break
                 continue
             
             # 优先级2：30送的特殊10抽（强制一次性抽完，不计入保底）
-            if self.state.bonus_10_special > 0:
-                pulls_to_do = self.state.bonus_10_special
-                self.state.bonus_10_special = 0
+            if state.bonus_10_special > 0:
+                pulls_to_do = state.bonus_10_special
+                state.bonus_10_special = 0
+                bonus_special_used += pulls_to_do
                 for _ in range(pulls_to_do):
-                    bonus_used += 1
-                    bonus_special_used += 1
                     is_ssr, is_current_up, is_old_up = self.single_pull_special()
                     if is_old_up:
                         old_up_count += 1
@@ -218,73 +205,39 @@ class GachaSimulator:
                         current_up_count += 1
                 
                 if current_up_count > 0:
-                    return {
-                        'pulls': actual_pulls,
-                        'total_pulls': actual_pulls + bonus_used + welfare_limited_used + welfare_permanent_used,
-                        'bonus_used': bonus_used,
-                        'bonus_normal_used': bonus_normal_used,
-                        'bonus_special_used': bonus_special_used,
-                        'welfare_used': welfare_limited_used + welfare_permanent_used,
-                        'welfare_limited_used': welfare_limited_used,
-                        'welfare_permanent_used': welfare_permanent_used,
-                        'pool_pulls': self.state.total_pulls,
-                        'old_up_count': old_up_count
-                    }
+                    break
                 continue
             
             # 优先级3：永久福利抽（逐个使用，可随时停止）
-            if use_welfare and self.state.welfare_permanent > 0:
-                self.state.welfare_permanent -= 1
-                welfare_permanent_used += 1
-                is_ssr, is_current_up, is_old_up = self.single_pull_normal()
-                if is_old_up:
-                    old_up_count += 1
-                if is_ssr and is_current_up:
-                    current_up_count += 1
-                    return {
-                        'pulls': actual_pulls,
-                        'total_pulls': actual_pulls + bonus_used + welfare_limited_used + welfare_permanent_used,
-                        'bonus_used': bonus_used,
-                        'bonus_normal_used': bonus_normal_used,
-                        'bonus_special_used': bonus_special_used,
-                        'welfare_used': welfare_limited_used + welfare_permanent_used,
-                        'welfare_limited_used': welfare_limited_used,
-                        'welfare_permanent_used': welfare_permanent_used,
-                        'pool_pulls': self.state.total_pulls,
-                        'old_up_count': old_up_count
-                    }
-                continue
-            
             # 优先级4：使用实际抽数（逐个使用）
-            actual_pulls += 1
+            if use_welfare and state.welfare_permanent > 0:
+                state.welfare_permanent -= 1
+                welfare_permanent_used += 1
+            else:
+                actual_pulls += 1
             is_ssr, is_current_up, is_old_up = self.single_pull_normal()
             if is_old_up:
                 old_up_count += 1
             if is_ssr and is_current_up:
                 current_up_count += 1
-                return {
-                    'pulls': actual_pulls,
-                    'total_pulls': actual_pulls + bonus_used + welfare_limited_used + welfare_permanent_used,
-                    'bonus_used': bonus_used,
-                    'bonus_normal_used': bonus_normal_used,
-                    'bonus_special_used': bonus_special_used,
-                    'welfare_used': welfare_limited_used + welfare_permanent_used,
-                    'welfare_limited_used': welfare_limited_used,
-                    'welfare_permanent_used': welfare_permanent_used,
-                    'pool_pulls': self.state.total_pulls,
-                    'old_up_count': old_up_count
-                }
+                break
+        
+        acc.pulls += actual_pulls
+        acc.bonus_normal_used += bonus_normal_used
+        acc.bonus_special_used += bonus_special_used
+        acc.welfare_limited_used += welfare_limited_used
+        acc.welfare_permanent_used += welfare_permanent_used
+        acc.current_up_count += current_up_count
+        acc.old_up_count += old_up_count
+        acc.pool_pulls = state.total_pulls
+        return acc
     
     def pull_bonus_and_free_limited_welfare(self, use_limited_welfare: bool = False) -> Dict:
         """
         只抽赠送的抽数和限时福利，不投入额外资源（用于跳过的池子）
         use_limited_welfare: 是否使用限时福利（方案1）
         
-        抽卡优先级规则：
-        1. 60送正常10抽 + 限时福利10抽（同一优先级，一起抽完，计入保底）
-        2. 30送特殊10抽（一次性抽完，不计入保底）
-        
-        注意：永久福利不在此使用（留给想抽的池子）
+        规则见 pull_bonus_and_free_limited_welfare_into（本方法是它的结果字典形式）
         
         返回: {
             'pulls': 实际消耗的抽数（跳过池子为0）,
@@ -296,59 +249,112 @@ class GachaSimulator:
             'welfare_limited_used': 限时福利使用数,
             'welfare_permanent_used': 永久福利使用数（始终为0）,
             'got_target': 是否意外获得了UP（True/False）,
+            'current_up_count': 当期UP数量,
             'pool_pulls': 本期卡池总抽数,
             'old_up_count': 往期UP数量
         }
         """
-        actual_pulls = 0  # 跳过池子不投入实际抽数
-        bonus_used = 0
-        bonus_normal_used = 0
-        bonus_special_used = 0
-        welfare_limited_used = 0
-        welfare_permanent_used = 0  # 永久福利不在跳过池子中使用
+        result = self.pull_bonus_and_free_limited_welfare_into(PullAccumulator(), use_limited_welfare).as_dict()
+        result['got_target'] = result['current_up_count'] > 0  # 是否意外获得了当期UP
+        return result
+    
+    def pull_bonus_and_free_limited_welfare_into(self, acc: 'PullAccumulator',
+                                                 use_limited_welfare: bool = False) -> 'PullAccumulator':
+        """
+        跳过的池子只抽赠送与限时福利，结果累加到 acc（不创建结果字典）
+        
+        抽卡优先级规则：
+        1. 60送正常10抽 + 限时福利10抽（同一优先级，一起抽完，计入保底）
+        2. 30送特殊10抽（一次性抽完，不计入保底）
+        
+        注意：永久福利不在此使用（留给想抽的池子）
+        返回: acc
+        """
+        state = self.state
         current_up_count = 0  # 意外获得的当期UP数量
         old_up_count = 0  # 往期UP数量
         
         # 优先级1：60送正常10抽 + 限时福利10抽（同一优先级，一起抽完）
-        if self.state.bonus_10_normal > 0 or (use_limited_welfare and self.state.welfare_limited > 0):
-            bonus_10_count = self.state.bonus_10_normal
-            welfare_limited_count = self.state.welfare_limited if use_limited_welfare else 0
-            combined_pulls = bonus_10_count + welfare_limited_count
+        if state.bonus_10_normal > 0 or (use_limited_welfare and state.welfare_limited > 0):
+            bonus_10_count = state.bonus_10_normal
+            welfare_limited_count = state.welfare_limited if use_limited_welfare else 0
             
             # 清零状态
-            self.state.bonus_10_normal = 0
+            state.bonus_10_normal = 0
             if use_limited_welfare:
-                self.state.welfare_limited = 0
+                state.welfare_limited = 0
             
             # 一次性抽完
-            for i in range(combined_pulls):
-                if i < bonus_10_count:
-                    bonus_used += 1
-                    bonus_normal_used += 1
-                else:
-                    welfare_limited_used += 1
-                
+            for _ in range(bonus_10_count + welfare_limited_count):
                 is_ssr, is_current_up, is_old_up = self.single_pull_normal()
                 if is_old_up:
                     old_up_count += 1
                 if is_ssr and is_current_up:
                     current_up_count += 1
+            
+            acc.bonus_normal_used += bonus_10_count
+            acc.welfare_limited_used += welfare_limited_count
         
         # 检查项
-        if self.state.bonus_10_special > 0:
+        if state.bonus_10_special > 0:
             assert False, "跳过的池子不应该够到30抽赠送10抽"
         
+        acc.current_up_count += current_up_count
+        acc.old_up_count += old_up_count
+        acc.pool_pulls = state.total_pulls
+        return acc
+
+
+class PullAccumulator:
+    """
+    单卡池结果的累加记录（pull_until_target_into 等方法的输出）
+    各计数在多次调用之间累加，pool_pulls 为最近一个卡池的总抽数
+    """
+    __slots__ = ('pulls', 'bonus_normal_used', 'bonus_special_used', 'welfare_limited_used',
+                 'welfare_permanent_used', 'current_up_count', 'old_up_count', 'pool_pulls')
+    
+    def __init__(self):
+        self.clear()
+    
+    def clear(self):
+        """清零所有计数"""
+        self.pulls = 0  # 实际消耗的抽数
+        self.bonus_normal_used = 0  # 60送的正常10抽使用数
+        self.bonus_special_used = 0  # 30送的特殊10抽使用数
+        self.welfare_limited_used = 0  # 限时福利使用数
+        self.welfare_permanent_used = 0  # 永久福利使用数
+        self.current_up_count = 0  # 当期UP数量
+        self.old_up_count = 0  # 往期UP数量
+        self.pool_pulls = 0  # 最近一个卡池的总抽数
+    
+    @property
+    def bonus_used(self) -> int:
+        return self.bonus_normal_used + self.bonus_special_used
+    
+    @property
+    def welfare_used(self) -> int:
+        return self.welfare_limited_used + self.welfare_permanent_used
+    
+    @property
+    def total_pulls(self) -> int:
+        return self.pulls + self.bonus_used + self.welfare_used
+    
+    def pull_counts(self) -> Tuple[int, int, int]:
+        """(正常抽, 特殊抽, 福利抽) 的累计数量"""
+        return self.pulls + self.bonus_normal_used, self.bonus_special_used, self.welfare_used
+    
+    def as_dict(self) -> Dict:
+        """与 pull_until_target 相同字段的结果字典（另含 current_up_count）"""
         return {
-            'pulls': actual_pulls,
-            'total_pulls': bonus_used + welfare_limited_used,
-            'bonus_used': bonus_used,
-            'bonus_normal_used': bonus_normal_used,
-            'bonus_special_used': bonus_special_used,
-            'welfare_used': welfare_limited_used,
-            'welfare_limited_used': welfare_limited_used,
-            'welfare_permanent_used': welfare_permanent_used,
-            'got_target': current_up_count > 0,  # 是否意外获得了当期UP
-            'current_up_count': current_up_count,  # 当期UP数量
-            'pool_pulls': self.state.total_pulls,
-            'old_up_count': old_up_count
+            'pulls': self.pulls,
+            'total_pulls': self.total_pulls,
+            'bonus_used': self.bonus_used,
+            'bonus_normal_used': self.bonus_normal_used,
+            'bonus_special_used': self.bonus_special_used,
+            'welfare_used': self.welfare_used,
+            'welfare_limited_used': self.welfare_limited_used,
+            'welfare_permanent_used': self.welfare_permanent_used,
+            'current_up_count': self.current_up_count,
+            'pool_pulls': self.pool_pulls,
+            'old_up_count': self.old_up_count,
         }
@@ -0,0 +1,175 @@
+"""
+跳跃式抽样的单卡池模拟器
+
+小保底水位不超过递增阈值（默认65抽）时，每抽出6星的概率都是固定的 base_ssr_rate，
+距离下一个6星的抽数服从几何分布。SkipAheadGachaSimulator 在这段区间内
+用一个均匀随机数按逆CDF直接抽出"还要几抽出6星"，一步跳到下一个6星或区间的边界，
+中间的抽只做计数；进入递增区间后（最多十几抽）再逐抽判定。
+
+跳跃不会越过任何会改变抽卡过程的事件：
+- 本期第30抽（送特殊10抽，抽到UP为止的池子要在此停下先抽特殊10抽）
+- 大保底前一抽（下一抽必出当期UP）
+- 永久福利用完的位置（之后改为实际投入）
+上期满60抽送10抽由 total_pulls 决定，跳跃时照常累计。
+
+结果与 GachaSimulator 同分布（随机数用法不同，不是逐位相同），
+每个池子的随机数个数从约70个降到几个到十几个。
+"""
+import math
+from typing import Tuple
+
+from config import GachaConfig
+from simulator_core import GachaSimulator, PullAccumulator
+
+
+class SkipAheadGachaSimulator(GachaSimulator):
+    """固定概率区间内按几何分布跳跃的 GachaSimulator（接口与返回值相同）"""
+
+    def __init__(self, config: GachaConfig, rng=None):
+        super().__init__(config, rng)
+        self._log_miss = math.log1p(-config.base_ssr_rate)
+        # 6星概率固定的最后一个小保底水位
+        self._flat_limit = min(config.increase_threshold, config.small_pity - 1)
+
+    def _advance(self, pulls: int):
+        """连续 pulls 次不出6星的正常抽（只计数）"""
+        state = self.state
+        state.small_pity_counter += pulls
+        state.large_pity_counter += pulls
+        state.total_pulls += pulls
+        if state.total_pulls >= 30 and not state.got_30_bonus:
+            state.got_30_bonus = True
+            state.bonus_10_special = 10
+
+    def _normal_pulls(self, limit: int) -> Tuple[int, Tuple[bool, bool, bool]]:
+        """
+        最多正常抽 limit 抽，出6星即停
+        返回: (抽数, 最后一抽的 (是否出6星, 是否是当期UP, 是否是往期UP))
+        """
+        state = self.state
+        done = 0
+        while done < limit:
+            flat = min(self._flat_limit - state.small_pity_counter,
+                       self.config.large_pity - 1 - state.large_pity_counter,
+                       limit - done)
+            if flat <= 0:
+                # 递增区间 / 大保底：逐抽判定
+                result = self.single_pull_normal()
+                done += 1
+                if result[0]:
+                    return done, result
+                continue
+
+            # 固定概率区间：距离下一个6星的抽数 ~ 几何分布（逆CDF，一个随机数）
+            gap = int(math.log1p(-self.rng.random()) / self._log_miss) + 1
+            if gap > flat:
+                # 到边界都不出6星（几何分布无记忆，剩下的部分之后重新抽取）
+                self._advance(flat)
+                done += flat
+                continue
+
+            self._advance(gap)
+            done += gap
+            state.small_pity_counter = 0
+            is_current_up, is_old_up = self.determine_ssr_type()
+            if is_current_up:
+                state.large_pity_counter = 0
+            return done, (True, is_current_up, is_old_up)
+        return done, (False, False, False)
+
+    def _pull_block(self, pulls: int) -> Tuple[int, int]:
+        """一次性抽完 pulls 次正常抽，返回 (当期UP数, 往期UP数)"""
+        current_up_count = old_up_count = 0
+        while pulls > 0:
+            done, (is_ssr, is_current_up, is_old_up) = self._normal_pulls(pulls)
+            pulls -= done
+            current_up_count += is_ssr and is_current_up
+            old_up_count += is_old_up
+        return current_up_count, old_up_count
+
+    def pull_until_target_into(self, acc: PullAccumulator, use_welfare: bool = False) -> PullAccumulator:
+        """规则与 GachaSimulator.pull_until_target_into 相同"""
+        state = self.state
+        actual_pulls = 0
+        bonus_normal_used = 0
+        bonus_special_used = 0
+        welfare_limited_used = 0
+        welfare_permanent_used = 0
+        current_up_count = 0
+        old_up_count = 0
+
+        while True:
+            # 优先级1：60送正常10抽 + 限时福利10抽（一起抽完）
+            if state.bonus_10_normal > 0 or state.welfare_limited > 0:
+                combined_pulls = state.bonus_10_normal + state.welfare_limited
+                bonus_normal_used += state.bonus_10_normal
+                welfare_limited_used += state.welfare_limited
+                state.bonus_10_normal = 0
+                state.welfare_limited = 0
+                current_up, old_up = self._pull_block(combined_pulls)
+                current_up_count += current_up
+                old_up_count += old_up
+                if current_up_count > 0:
+                    break
+                continue
+
+            # 优先级2：30送的特殊10抽
+            if state.bonus_10_special > 0:
+                pulls_to_do = state.bonus_10_special
+                state.bonus_10_special = 0
+                bonus_special_used += pulls_to_do
+                for _ in range(pulls_to_do):
+                    is_ssr, is_current_up, is_old_up = self.single_pull_special()
+                    old_up_count += is_old_up
+                    current_up_count += is_ssr and is_current_up
+                if current_up_count > 0:
+                    break
+                continue
+
+            # 优先级3/4：永久福利抽，之后实际投入；在第30抽、永久福利用完处停下
+            limit = self.config.large_pity
+            if not state.got_30_bonus:
+                limit = min(limit, 30 - state.total_pulls)
+            paid_by_welfare = use_welfare and state.welfare_permanent > 0
+            if paid_by_welfare:
+                limit = min(limit, state.welfare_permanent)
+            done, (is_ssr, is_current_up, is_old_up) = self._normal_pulls(limit)
+            if paid_by_welfare:
+                state.welfare_permanent -= done
+                welfare_permanent_used += done
+            else:
+                actual_pulls += done
+            old_up_count += is_old_up
+            if is_ssr and is_current_up:
+                current_up_count += 1
+                break
+
+        acc.pulls += actual_pulls
+        acc.bonus_normal_used += bonus_normal_used
+        acc.bonus_special_used += bonus_special_used
+        acc.welfare_limited_used += welfare_limited_used
+        acc.welfare_permanent_used += welfare_permanent_used
+        acc.current_up_count += current_up_count
+        acc.old_up_count += old_up_count
+        acc.pool_pulls = state.total_pulls
+        return acc
+
+    def pull_bonus_and_free_limited_welfare_into(self, acc: PullAccumulator,
+                                                 use_limited_welfare: bool = False) -> PullAccumulator:
+        """规则与 GachaSimulator.pull_bonus_and_free_limited_welfare_into 相同"""
+        state = self.state
+        if state.bonus_10_normal > 0 or (use_limited_welfare and state.welfare_limited > 0):
+            bonus_10_count = state.bonus_10_normal
+            welfare_limited_count = state.welfare_limited if use_limited_welfare else 0
+            state.bonus_10_normal = 0
+            if use_limited_welfare:
+                state.welfare_limited = 0
+            current_up, old_up = self._pull_block(bonus_10_count + welfare_limited_count)
+            acc.bonus_normal_used += bonus_10_count
+            acc.welfare_limited_used += welfare_limited_count
+            acc.current_up_count += current_up
+            acc.old_up_count += old_up
+
+        assert state.bonus_10_special == 0, "跳过的池子不应该够到30抽赠送10抽"
+        acc.pool_pulls = state.total_pulls
+        return acc
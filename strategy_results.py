@@ -0,0 +1,107 @@
+"""
+列式策略模拟结果
+
+每个字段是一列定长类型的 NumPy 数组（第 i 个元素对应第 i 次模拟），
+小保底历史为 (模拟次数, 池子数) 的 uint8 二维数组，
+代替每次模拟一个结果字典 + 一个 Python 列表的存储方式。
+"""
+from typing import Dict, Iterator, List, Sequence, Union
+
+import numpy as np
+
+
+# 列名 → 类型
+COLUMNS = {
+    'user_spent': np.int32,  # 用户自费总数
+    'expected_up_count': np.int16,  # 期望UP数
+    'unexpected_current_up_count': np.int16,  # 跳过池意外本期UP数
+    'old_up_count': np.int16,  # 往期UP数
+    'welfare_used': np.int32,  # 实际使用的福利数
+}
+
+
+class StrategyResults:
+    """
+    一个策略在一种福利模式下的全部模拟结果（列式存储）
+
+    列通过属性访问（results.user_spent），
+    按下标访问 / 迭代时仍返回与旧版相同的结果字典，兼容按条处理的代码。
+    """
+
+    def __init__(self, user_spent: np.ndarray, expected_up_count: np.ndarray,
+                 unexpected_current_up_count: np.ndarray, old_up_count: np.ndarray,
+                 welfare_used: np.ndarray, pity_history: np.ndarray, welfare_invested: int = 0):
+        self.user_spent = np.asarray(user_spent, dtype=COLUMNS['user_spent'])
+        self.expected_up_count = np.asarray(expected_up_count, dtype=COLUMNS['expected_up_count'])
+        self.unexpected_current_up_count = np.asarray(unexpected_current_up_count,
+                                                      dtype=COLUMNS['unexpected_current_up_count'])
+        self.old_up_count = np.asarray(old_up_count, dtype=COLUMNS['old_up_count'])
+        self.welfare_used = np.asarray(welfare_used, dtype=COLUMNS['welfare_used'])
+        self.pity_history = np.asarray(pity_history, dtype=np.uint8)  # 每个卡池结束时的小保底水位
+        self.welfare_invested = int(welfare_invested)  # 策划投入的总福利数（所有模拟相同）
+
+    @property
+    def total_current_up_count(self) -> np.ndarray:
+        """总和当期UP数（期望UP + 跳过池意外UP）"""
+        return self.expected_up_count.astype(np.int32) + self.unexpected_current_up_count
+
+    def column(self, name: str) -> np.ndarray:
+        """按名字取一列"""
+        if name == 'welfare_invested':
+            return np.full(len(self), self.welfare_invested, dtype=np.int32)
+        return getattr(self, name)
+
+    def mean(self, name: str) -> float:
+        """一列的平均值（与流式统计 StreamingStrategyStats.mean 接口相同）"""
+        return float(self.column(name).mean())
+
+    def __len__(self) -> int:
+        return len(self.user_spent)
+
+    def __getitem__(self, i: int) -> Dict:
+        """第 i 次模拟的结果字典（与旧版字段相同）"""
+        return {
+            'user_spent': int(self.user_spent[i]),
+            'expected_up_count': int(self.expected_up_count[i]),
+            'unexpected_current_up_count': int(self.unexpected_current_up_count[i]),
+            'total_current_up_count': int(self.expected_up_count[i]) + int(self.unexpected_current_up_count[i]),
+            'old_up_count': int(self.old_up_count[i]),
+            'welfare_invested': self.welfare_invested,
+            'welfare_used': int(self.welfare_used[i]),
+            'pity_history': self.pity_history[i].tolist(),
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self) -> int:
+        """占用的内存（字节）"""
+        return sum(getattr(self, name).nbytes for name in COLUMNS) + self.pity_history.nbytes
+
+    @classmethod
+    def concatenate(cls, parts: Sequence['StrategyResults']) -> 'StrategyResults':
+        """按顺序拼接多块结果（福利投入取第一块）"""
+        return cls(*(np.concatenate([getattr(p, name) for p in parts]) for name in COLUMNS),
+                   pity_history=np.concatenate([p.pity_history for p in parts]),
+                   welfare_invested=parts[0].welfare_invested)
+
+    def head(self, n: int) -> 'StrategyResults':
+        """前 n 次模拟的结果"""
+        return StrategyResults(*(getattr(self, name)[:n] for name in COLUMNS),
+                               pity_history=self.pity_history[:n], welfare_invested=self.welfare_invested)
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> 'StrategyResults':
+        """由旧版的结果字典列表转换"""
+        return cls(*([r.get(name, 0) for r in records] for name in COLUMNS),
+                   pity_history=[r['pity_history'] for r in records],
+                   welfare_invested=records[0]['welfare_invested'] if records else 0)
+
+
+def as_results(results: Union[StrategyResults, List[Dict]]) -> StrategyResults:
+    """统一为列式结果（兼容旧版 pickle 中的结果字典列表）"""
+    if isinstance(results, StrategyResults):
+        return results
+    return StrategyResults.from_records(results)
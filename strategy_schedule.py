@@ -0,0 +1,91 @@
+"""
+策略的抽卡计划（每个周期内哪些池子抽、哪些池子跳过）
+"""
+from dataclasses import dataclass
+from itertools import combinations
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class StrategySchedule:
+    """
+    抽卡计划（pattern / pick / min_pity 三选一）
+    cycle: 周期长度（池子数）
+    pattern: 固定计划，每个位置 True 表示抽、False 表示跳过
+    pick: 随机计划，每个周期随机选 pick 个池子抽
+    min_pity: 按水位决定，开池时小保底水位 ≥ min_pity 才抽（周期长度必须为1）
+    """
+    name: str
+    title: str
+    cycle: int
+    pattern: Optional[Tuple[bool, ...]] = None
+    pick: Optional[int] = None
+    min_pity: Optional[int] = None
+
+    def __post_init__(self):
+        if sum(x is not None for x in (self.pattern, self.pick, self.min_pity)) != 1:
+            raise ValueError("pattern、pick 和 min_pity 必须且只能指定一个")
+        if self.pattern is not None and len(self.pattern) != self.cycle:
+            raise ValueError("pattern 长度必须等于周期长度")
+        if self.pick is not None and not 0 <= self.pick <= self.cycle:
+            raise ValueError("pick 必须在 0 到周期长度之间")
+        if self.min_pity is not None and self.cycle != 1:
+            raise ValueError("按水位决定的计划周期长度必须为1")
+
+    @property
+    def pulls_per_cycle(self) -> Optional[int]:
+        """每个周期想抽的池子数（按水位决定时不固定，为 None）"""
+        if self.pattern is not None:
+            return sum(self.pattern)
+        return self.pick
+
+    def num_cycles(self, num_pools: int) -> int:
+        """num_pools 个池子包含的完整周期数（不足一个周期的尾部池子不模拟）"""
+        return num_pools // self.cycle
+
+    def plans(self) -> List[Tuple[Tuple[bool, ...], float]]:
+        """一个周期内所有可能的计划及其概率 [(计划, 概率)]（按水位决定的计划没有固定的周期计划）"""
+        if self.min_pity is not None:
+            raise ValueError(f"{self.name} 按小保底水位决定是否抽，没有固定的周期计划")
+        if self.pattern is not None:
+            return [(self.pattern, 1.0)]
+        chosen = list(combinations(range(self.cycle), self.pick))
+        return [(tuple(i in c for i in range(self.cycle)), 1.0 / len(chosen)) for c in chosen]
+
+    def draw_cycle(self, n: int, rng: np.random.Generator) -> Optional[np.ndarray]:
+        """
+        为 n 个模拟抽取一个周期的计划
+        返回: (n, 周期长度) 的布尔数组，True 表示抽；按水位决定的计划返回 None
+        """
+        if self.pattern is not None:
+            return np.broadcast_to(np.array(self.pattern, dtype=bool), (n, self.cycle))
+        if self.pick is not None:
+            # 每个模拟随机排列周期内的池子，排在前 pick 位的抽
+            order = np.argsort(rng.random((n, self.cycle)), axis=1)
+            plan = np.zeros((n, self.cycle), dtype=bool)
+            np.put_along_axis(plan, order[:, :self.pick], True, axis=1)
+            return plan
+        return None
+
+    def pull_mask(self, plan: Optional[np.ndarray], pos: int, small_pity_counter: np.ndarray) -> np.ndarray:
+        """周期内第 pos 个池子哪些模拟要抽（plan 为 draw_cycle 的结果）"""
+        if self.min_pity is not None:
+            return small_pity_counter >= self.min_pity
+        return np.ascontiguousarray(plan[:, pos])
+
+
+# 内置的6种策略（name 与 main.py 中 all_strategies_data 的键一致）
+STRATEGY_1 = StrategySchedule('策略1：每期都抽', '策略1：每期都抽', 1, pattern=(True,))
+STRATEGY_2 = StrategySchedule('策略2：抽1跳1', '策略2：抽1跳1循环', 2, pattern=(False, True))
+STRATEGY_3 = StrategySchedule('策略3：随机2选1', '策略3：两池周期随机选一', 2, pick=1)
+STRATEGY_4 = StrategySchedule('策略4：抽1跳2', '策略4：抽1跳2循环', 3, pattern=(False, False, True))
+STRATEGY_5 = StrategySchedule('策略5：随机3选1', '策略5：三池周期随机选一', 3, pick=1)
+STRATEGY_6 = StrategySchedule('策略6：随机3选2', '策略6：三池周期随机选二', 3, pick=2)
+
+BUILTIN_STRATEGIES = (STRATEGY_1, STRATEGY_2, STRATEGY_3, STRATEGY_4, STRATEGY_5, STRATEGY_6)
+
+# 福利模式
+WELFARE_MODES = (None, 'limited', 'permanent')
+WELFARE_MODE_KEYS = {None: 'baseline', 'limited': 'limited', 'permanent': 'permanent'}
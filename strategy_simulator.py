@@ -1,454 +1,307 @@
 """
 策略模拟器
 包含6种不同的抽卡策略及其两种福利方案对比
+
+所有策略都由 StrategySchedule 描述（固定计划 / 每周期随机选k个 / 按小保底水位决定），
+统一由 simulate_schedule 用批量引擎模拟。
 """
+import contextlib
 import random
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
+
+import numpy as np
+
+from batch_engine import CRN_STREAMS, BatchGachaSimulator, BatchPullAccumulator
 from config import GachaConfig
-from simulator_core import GachaSimulator
+from instrumentation import Instrumentation, phase_name
+from pool_cache import DEFAULT_POOL_CACHE_DIR, OUTCOME_FIELDS, PoolDistributionCache
+from rng import CommonRandomStreams, GachaRNG
+from strategy_results import StrategyResults, as_results
+from strategy_schedule import (StrategySchedule, STRATEGY_1, STRATEGY_2, STRATEGY_3,
+                               STRATEGY_4, STRATEGY_5, STRATEGY_6)
+from streaming_stats import StreamingStrategyStats
+
+
+DEFAULT_STREAM_BATCH_SIZE = 100000  # 流式模拟每批的模拟次数
+ENGINES = ('batch', 'alias')  # 可选的模拟引擎
+
+ResultsLike = Union[StrategyResults, StreamingStrategyStats, List[Dict]]
+
+
+def _as_summary(results: ResultsLike) -> Union[StrategyResults, StreamingStrategyStats]:
+    """统一为支持 mean(列名) 的结果（流式统计原样返回）"""
+    if isinstance(results, StreamingStrategyStats):
+        return results
+    return as_results(results)
 
 
 class StrategySimulator:
     """多池子策略模拟器"""
     
-    def __init__(self, config: GachaConfig, iterations: int = 10000):
+    def __init__(self, config: GachaConfig, iterations: int = 10000, rng=None, trial_offset: int = 0,
+                 paired: bool = False, antithetic: bool = False, engine: str = 'batch',
+                 pool_cache: Optional[PoolDistributionCache] = None,
+                 instrumentation: Optional[Instrumentation] = None):
+        """
+        rng: 随机数源。GachaRNG 时使用子流 rng.stream(trial_offset)，结果可复现；
+             默认从 random 模块取种子（random.seed 仍然有效）
+        trial_offset: 第一次模拟的编号（切块并行时每块使用不同的子流）
+        paired: 公共随机数模式。同一个模拟器模拟的各福利模式中，第 i 次模拟使用完全相同的随机数
+                （6星间隔、类型、随机计划），结果按模拟编号一一配对，见 variance_reduction
+        antithetic: 配对模式下相邻两次模拟使用对偶随机数（u 与 1-u）
+        engine: 'batch' 批量引擎逐事件推进；'alias' 每个池子直接从该进入状态的精确结果分布中
+                用别名表一步抽出（分布由 pool_cache 提供，首次求解后可缓存在磁盘上）
+        pool_cache: alias 引擎使用的单池分布缓存（默认缓存在 pool_cache/ 目录）
+        instrumentation: 按策略/福利模式统计抽数与用时（None 表示不统计，没有额外开销）
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"未知引擎: {engine}（可选 {', '.join(ENGINES)}）")
+        if engine == 'alias' and (paired or antithetic):
+            raise ValueError("alias 引擎不支持配对模式")
         self.config = config
         self.iterations = iterations
+        self.rng = rng if rng is not None else random
+        self.trial_offset = trial_offset
+        self.paired = paired or antithetic
+        self.antithetic = antithetic
+        # 非 GachaRNG 时配对模式的种子在构造时取定，之后各福利模式共用
+        self._crn_seed = None if isinstance(self.rng, GachaRNG) else int(self.rng.random() * 2 ** 53)
+        self.engine = engine
+        self.pool_cache = pool_cache
+        self.instrumentation = instrumentation
+    
+    def _batch_rng(self, offset: int = 0) -> np.random.Generator:
+        """批量引擎使用的 NumPy 随机数生成器（offset: 这一批第一次模拟相对 trial_offset 的编号）"""
+        if isinstance(self.rng, GachaRNG):
+            return self.rng.stream(self.trial_offset + offset).generator
+        return np.random.default_rng(int(self.rng.random() * 2 ** 53))
     
-    def simulate_strategy_1_every_pool(self, num_pools: int, welfare_mode: Optional[str] = None) -> List[Dict]:
+    def _batch_crn(self, n: int, offset: int = 0) -> Optional[CommonRandomStreams]:
+        """配对模式下批量引擎使用的公共随机数（同一编号的批次在各福利模式中相同）"""
+        if not self.paired:
+            return None
+        if isinstance(self.rng, GachaRNG):
+            seed = self.rng.stream(self.trial_offset + offset).seed_seq
+        else:
+            seed = [self._crn_seed, self.trial_offset + offset]
+        return CommonRandomStreams(seed, n, len(CRN_STREAMS), antithetic=self.antithetic)
+    
+    def _phase(self, schedule: StrategySchedule, welfare_mode: Optional[str]):
+        """统计时计时一个策略/福利模式阶段"""
+        if self.instrumentation is None:
+            return contextlib.nullcontext()
+        return self.instrumentation.phase(phase_name(schedule.name, welfare_mode))
+    
+    def _print_schedule_header(self, schedule: StrategySchedule, num_pools: int, welfare_mode: Optional[str]):
+        mode_name = {None: "无福利", 'limited': "限时福利", 'permanent': "不限时福利"}
+        print(f"\n【{schedule.title} - {mode_name.get(welfare_mode, '未知')}】")
+        if schedule.cycle == 1:
+            print(f"正在模拟 {num_pools} 个池子，共 {self.iterations} 次...")
+        else:
+            print(f"正在模拟 {num_pools} 个池子（{schedule.num_cycles(num_pools)} 个周期），共 {self.iterations} 次...")
+    
+    def simulate_schedule(self, schedule: StrategySchedule, num_pools: int,
+                          welfare_mode: Optional[str] = None) -> StrategyResults:
         """
-        策略1：每期都抽
+        按抽卡计划模拟 num_pools 个池子（不足一个周期的尾部池子不模拟）
         welfare_mode: None(无福利), 'limited'(限时福利), 'permanent'(不限时福利)
-        """
-        results = []
+        返回: 列式结果 StrategyResults
         
-        mode_name = {None: "无福利", 'limited': "限时福利", 'permanent': "不限时福利"}
-        print(f"\n【策略1：每期都抽 - {mode_name.get(welfare_mode, '未知')}】")
-        print(f"正在模拟 {num_pools} 个池子，共 {self.iterations} 次...")
+        所有模拟一起推进：每个池子先按计划把模拟分成"抽"和"跳过"两组，
+        再分别交给批量引擎的 pull_until_target / pull_bonus_and_free_limited_welfare。
+        """
+        self._print_schedule_header(schedule, num_pools, welfare_mode)
+        with self._phase(schedule, welfare_mode):
+            return self._run_schedule(schedule, num_pools, welfare_mode, self.iterations, self._batch_rng(),
+                                      self._batch_crn(self.iterations))
+    
+    def simulate_schedule_streaming(self, schedule: StrategySchedule, num_pools: int,
+                                    welfare_mode: Optional[str] = None,
+                                    batch_size: int = DEFAULT_STREAM_BATCH_SIZE) -> StreamingStrategyStats:
+        """
+        流式模拟：每次只模拟 batch_size 次，汇总进计数直方图后立即丢弃
+        内存与 batch_size 有关、与模拟次数无关，适合上亿次的模拟
+        返回: StreamingStrategyStats（均值/方差/分位数精确，不保留逐次结果）
         
-        for i in range(self.iterations):
-            if (i + 1) % 1000 == 0:
-                print(f"进度: {i + 1}/{self.iterations}")
-            
-            simulator = GachaSimulator(self.config)
-            user_spent = 0  # 用户实际花费的抽数（不含任何赠送）
-            welfare_invested = 0  # 策划投入的总福利数
-            welfare_used_total = 0  # 实际使用的福利数
-            prev_pool_pulls = 0
-            pity_history = []  # 记录每个卡池结束抽取时的小保底水位
-            expected_up_count = 0  # 期望UP数（按策略规划想抽的池子数）
-            unexpected_current_up_count = 0  # 跳过池意外获得的本期UP数
-            old_up_count = 0  # 往期UP数
-            
-            for pool_idx in range(num_pools):
+        使用 GachaRNG 时第 i 批使用子流 stream(trial_offset + i * batch_size)，
+        与 parallel_runner 按相同块大小切块的结果一致。
+        """
+        self._print_schedule_header(schedule, num_pools, welfare_mode)
+        stats = StreamingStrategyStats(schedule.num_cycles(num_pools) * schedule.cycle,
+                                       self.config.small_pity)
+        with self._phase(schedule, welfare_mode):
+            for start in range(0, self.iterations, batch_size):
+                n = min(batch_size, self.iterations - start)
+                stats.update(self._run_schedule(schedule, num_pools, welfare_mode, n, self._batch_rng(start),
+                                                self._batch_crn(n, start)))
+        return stats
+    
+    def _run_schedule(self, schedule: StrategySchedule, num_pools: int, welfare_mode: Optional[str],
+                      n: int, rng: np.random.Generator,
+                      crn: Optional[CommonRandomStreams] = None) -> StrategyResults:
+        """用批量引擎一起推进 n 次模拟（给定 crn 时抽卡和随机计划都只用 crn）"""
+        if self.engine == 'alias':
+            return self._run_schedule_alias(schedule, num_pools, welfare_mode, n, rng)
+        num_cycles = schedule.num_cycles(num_pools)
+        if crn is not None:
+            rng = crn.generator
+        simulator = BatchGachaSimulator(self.config, n, rng=rng, crn=crn)
+        if self.instrumentation is not None:
+            self.instrumentation.attach(simulator)
+        # 抽到UP为止的池子与跳过的池子分别累加（花费只来自前者，意外UP只来自后者）
+        pulled = BatchPullAccumulator(n)
+        skipped = BatchPullAccumulator(n)
+        expected_up_count = np.zeros(n, dtype=np.int64)  # 期望UP数（按策略规划想抽的池子数）
+        pity_history = np.zeros((n, num_cycles * schedule.cycle), dtype=np.uint8)  # 每个卡池结束时的小保底水位
+        welfare_invested = 0  # 策划投入的总福利数
+        prev_pool_pulls = np.zeros(n, dtype=np.int32)
+        
+        pool_idx = 0
+        for cycle in range(num_cycles):
+            plan = schedule.draw_cycle(n, rng)
+            for pos in range(schedule.cycle):
+                pull = schedule.pull_mask(plan, pos, simulator.small_pity_counter)
+                skip = ~pull
                 simulator.reset_for_new_pool(prev_pool_pulls)
                 
                 # 添加策划福利
                 if welfare_mode == 'limited':
-                    simulator.state.welfare_limited = 10
+                    simulator.welfare_limited[:] = 10
                     welfare_invested += 10
                 elif welfare_mode == 'permanent':
-                    simulator.state.welfare_permanent += 10
+                    simulator.welfare_permanent += 10
                     welfare_invested += 10
                 
-                result = simulator.pull_until_target(use_welfare=(welfare_mode == 'permanent'))
-                user_spent += result['pulls']  # pulls = actual_pull 就是用户自费的抽数
-                welfare_used_total += result.get('welfare_used', 0)
-                old_up_count += result.get('old_up_count', 0)  # 统计往期UP
-                prev_pool_pulls = result['pool_pulls']
-                pity_history.append(simulator.state.small_pity_counter)  # 记录卡池结束时的小保底
-                expected_up_count += 1  # 想抽的池子计入期望
-            
-            total_current_up_count = expected_up_count + unexpected_current_up_count
-            results.append({
-                'user_spent': user_spent,  # 用户自费总数
-                'expected_up_count': expected_up_count,  # 期望UP数
-                'unexpected_current_up_count': unexpected_current_up_count,  # 跳过池意外本期UP数
-                'total_current_up_count': total_current_up_count,  # 总和当期UP数
-                'old_up_count': old_up_count,  # 往期UP数
-                'welfare_invested': welfare_invested,
-                'welfare_used': welfare_used_total,
-                'pity_history': pity_history  # 小保底历史
-            })
-        
-        return results
+                if pull.any():
+                    simulator.pull_until_target_into(pulled, use_welfare=(welfare_mode == 'permanent'), mask=pull)
+                    expected_up_count += pull  # 想抽的池子计入期望
+                if skip.any():
+                    simulator.pull_bonus_and_free_limited_welfare_into(
+                        skipped, use_limited_welfare=(welfare_mode == 'limited'), mask=skip)
+                # 每个模拟本池不是抽就是跳过，本池总抽数取对应的一边
+                prev_pool_pulls = np.where(pull, pulled.pool_pulls, skipped.pool_pulls)
+                
+                pity_history[:, pool_idx] = simulator.small_pity_counter  # 记录卡池结束时的小保底
+                pool_idx += 1
+        
+        return StrategyResults(pulled.pulls,  # 用户实际花费的抽数（不含任何赠送）
+                               expected_up_count,
+                               skipped.current_up_count,  # 跳过池意外获得的本期UP数
+                               pulled.old_up_count + skipped.old_up_count,
+                               pulled.welfare_used + skipped.welfare_used,
+                               pity_history, welfare_invested)
     
-    def simulate_strategy_2_skip_one(self, num_pools: int, welfare_mode: Optional[str] = None) -> List[Dict]:
-        """
-        策略2：抽1跳1循环
-        welfare_mode: None(无福利), 'limited'(限时福利), 'permanent'(不限时福利)
+    def _run_schedule_alias(self, schedule: StrategySchedule, num_pools: int, welfare_mode: Optional[str],
+                            n: int, rng: np.random.Generator) -> StrategyResults:
         """
-        results = []
-        num_cycles = num_pools // 2
+        按进入状态分组，每组从单池精确分布中一步抽出结果
         
-        mode_name = {None: "无福利", 'limited': "限时福利", 'permanent': "不限时福利"}
-        print(f"\n【策略2：抽1跳1循环 - {mode_name.get(welfare_mode, '未知')}】")
-        print(f"正在模拟 {num_pools} 个池子（{num_cycles} 个周期），共 {self.iterations} 次...")
-        
-        for i in range(self.iterations):
-            if (i + 1) % 1000 == 0:
-                print(f"进度: {i + 1}/{self.iterations}")
-            
-            simulator = GachaSimulator(self.config)
-            user_spent = 0  # 用户实际花费的抽数（不含任何赠送）
-            welfare_invested = 0
-            welfare_used_total = 0
-            prev_pool_pulls = 0
-            pity_history = []
-            expected_up_count = 0  # 期望UP数（按策略规划想抽的池子数）
-            unexpected_current_up_count = 0  # 跳过池意外获得的本期UP数
-            old_up_count = 0  # 往期UP数
-            
-            for cycle in range(num_cycles):
-                # 第1个池子：跳过（只用赠送和限时福利）
-                simulator.reset_for_new_pool(prev_pool_pulls)
-                if welfare_mode == 'limited':
-                    simulator.state.welfare_limited = 10
-                    welfare_invested += 10
-                elif welfare_mode == 'permanent':
-                    simulator.state.welfare_permanent += 10
+        单池分布只描述抽卡过程（本池正常抽数、UP数、离开水位），
+        一次性抽完的部分之外的抽数再按"永久福利优先、其余实际投入"记账，与批量引擎的顺序一致。
+        """
+        if self.pool_cache is None:
+            self.pool_cache = PoolDistributionCache(self.config, cache_dir=DEFAULT_POOL_CACHE_DIR)
+        cache = self.pool_cache
+        S = self.config.small_pity
+        num_cycles = schedule.num_cycles(num_pools)
+        
+        small = np.zeros(n, dtype=np.int64)  # 小保底水位（跨池继承）
+        prev_pool_pulls = np.zeros(n, dtype=np.int64)
+        welfare_permanent = np.zeros(n, dtype=np.int64)
+        user_spent = np.zeros(n, dtype=np.int64)
+        welfare_used_total = np.zeros(n, dtype=np.int64)
+        expected_up_count = np.zeros(n, dtype=np.int64)
+        unexpected_current_up_count = np.zeros(n, dtype=np.int64)
+        old_up_count = np.zeros(n, dtype=np.int64)
+        pity_history = np.zeros((n, num_cycles * schedule.cycle), dtype=np.uint8)
+        welfare_invested = 0
+        limited = 10 if welfare_mode == 'limited' else 0
+        
+        pool_idx = 0
+        for cycle in range(num_cycles):
+            plan = schedule.draw_cycle(n, rng)
+            for pos in range(schedule.cycle):
+                pull = schedule.pull_mask(plan, pos, small)
+                if welfare_mode == 'permanent':
+                    welfare_permanent += 10
+                if welfare_mode is not None:
                     welfare_invested += 10
                 
-                result = simulator.pull_bonus_and_free_limited_welfare(use_limited_welfare=(welfare_mode == 'limited'))
-                welfare_used_total += result.get('welfare_used', 0)
-                old_up_count += result.get('old_up_count', 0)
-                prev_pool_pulls = result['pool_pulls']
-                pity_history.append(simulator.state.small_pity_counter)
-                unexpected_current_up_count += result.get('current_up_count', 0)  # 跳过池意外当期UP数量
+                # 开局一次性抽完的部分：60送 + 限时福利
+                block = np.where(prev_pool_pulls >= 60, 10, 0) + limited
+                code = (pull * S + small) * 64 + block
+                outcome = np.zeros((n, len(OUTCOME_FIELDS)), dtype=np.int64)
+                order = np.argsort(code, kind='stable')
+                codes, starts, counts = np.unique(code[order], return_index=True, return_counts=True)
+                for c, start, count in zip(codes, starts, counts):
+                    idx = order[start:start + count]
+                    table = cache.get(cache.entry_key(c // 64 // S, c // 64 % S, c % 64))
+                    outcome[idx] = table.outcomes[table.sample(rng, count)]
+                pool_pulls, old_up, current_up, exit_small = outcome.T
                 
-                # 第2个池子：抽
-                simulator.reset_for_new_pool(prev_pool_pulls)
-                if welfare_mode == 'limited':
-                    simulator.state.welfare_limited = 10
-                    welfare_invested += 10
-                elif welfare_mode == 'permanent':
-                    simulator.state.welfare_permanent += 10
-                    welfare_invested += 10
+                # 一次性部分之外的抽数：抽到UP为止的池子先用永久福利，其余实际投入
+                rest = np.where(pull, pool_pulls - block, 0)
+                permanent_used = np.minimum(welfare_permanent, rest)
+                welfare_permanent -= permanent_used
+                user_spent += rest - permanent_used
+                welfare_used_total += limited + permanent_used
+                if self.instrumentation is not None:
+                    # 单池分布不区分特殊抽，只统计正常抽与福利抽
+                    self.instrumentation.record(normal=pool_pulls.sum() - limited * n - permanent_used.sum(),
+                                                welfare=limited * n + permanent_used.sum())
+                old_up_count += old_up
+                expected_up_count += pull
+                unexpected_current_up_count += np.where(pull, 0, current_up)
                 
-                result = simulator.pull_until_target(use_welfare=(welfare_mode == 'permanent'))
-                user_spent += result['pulls']  # pulls 就是用户自费的抽数
-                welfare_used_total += result.get('welfare_used', 0)
-                old_up_count += result.get('old_up_count', 0)
-                prev_pool_pulls = result['pool_pulls']
-                pity_history.append(simulator.state.small_pity_counter)
-                expected_up_count += 1  # 想抽的池子计入期望
-            
-            total_current_up_count = expected_up_count + unexpected_current_up_count
-            results.append({
-                'user_spent': user_spent,  # 用户自费总数
-                'expected_up_count': expected_up_count,  # 期望UP数
-                'unexpected_current_up_count': unexpected_current_up_count,  # 跳过池意外本期UP数
-                'total_current_up_count': total_current_up_count,  # 总和当期UP数
-                'old_up_count': old_up_count,  # 往期UP数
-                'welfare_invested': welfare_invested,
-                'welfare_used': welfare_used_total,
-                'pity_history': pity_history
-            })
+                small = exit_small
+                prev_pool_pulls = pool_pulls
+                pity_history[:, pool_idx] = small
+                pool_idx += 1
         
-        return results
+        return StrategyResults(user_spent, expected_up_count, unexpected_current_up_count, old_up_count,
+                               welfare_used_total, pity_history, welfare_invested)
+    
+    def simulate_strategy_1_every_pool(self, num_pools: int, welfare_mode: Optional[str] = None) -> StrategyResults:
+        """
+        策略1：每期都抽
+        welfare_mode: None(无福利), 'limited'(限时福利), 'permanent'(不限时福利)
+        """
+        return self.simulate_schedule(STRATEGY_1, num_pools, welfare_mode)
+    
+    def simulate_strategy_2_skip_one(self, num_pools: int, welfare_mode: Optional[str] = None) -> StrategyResults:
+        """
+        策略2：抽1跳1循环
+        welfare_mode: None(无福利), 'limited'(限时福利), 'permanent'(不限时福利)
+        """
+        return self.simulate_schedule(STRATEGY_2, num_pools, welfare_mode)
     
-    def simulate_strategy_3_random_two(self, num_pools: int, welfare_mode: Optional[str] = None) -> List[Dict]:
+    def simulate_strategy_3_random_two(self, num_pools: int, welfare_mode: Optional[str] = None) -> StrategyResults:
         """
         策略3：以两个卡池为周期，随机选择其中一个抽
         welfare_mode: None(无福利), 'limited'(限时福利), 'permanent'(不限时福利)
         """
-        results = []
-        num_cycles = num_pools // 2
-        
-        mode_name = {None: "无福利", 'limited': "限时福利", 'permanent': "不限时福利"}
-        print(f"\n【策略3：两池周期随机选一 - {mode_name.get(welfare_mode, '未知')}】")
-        print(f"正在模拟 {num_pools} 个池子（{num_cycles} 个周期），共 {self.iterations} 次...")
-        
-        for i in range(self.iterations):
-            if (i + 1) % 1000 == 0:
-                print(f"进度: {i + 1}/{self.iterations}")
-            
-            simulator = GachaSimulator(self.config)
-            user_spent = 0
-            welfare_invested = 0
-            welfare_used_total = 0
-            prev_pool_pulls = 0
-            pity_history = []
-            expected_up_count = 0  # 期望UP数（按策略规划想抽的池子数）
-            unexpected_current_up_count = 0  # 跳过池意外获得的本期UP数
-            old_up_count = 0  # 往期UP数
-            
-            for cycle in range(num_cycles):
-                # 随机选择抽哪个池子（0或1）
-                pull_idx = random.randint(0, 1)
-                
-                for pool_in_cycle in range(2):
-                    simulator.reset_for_new_pool(prev_pool_pulls)
-                    
-                    # 添加策划福利
-                    if welfare_mode == 'limited':
-                        simulator.state.welfare_limited = 10
-                        welfare_invested += 10
-                    elif welfare_mode == 'permanent':
-                        simulator.state.welfare_permanent += 10
-                        welfare_invested += 10
-                    
-                    if pool_in_cycle == pull_idx:
-                        # 选中的池子：抽
-                        result = simulator.pull_until_target(use_welfare=(welfare_mode == 'permanent'))
-                        user_spent += result['pulls']
-                        welfare_used_total += result.get('welfare_used', 0)
-                        old_up_count += result.get('old_up_count', 0)
-                        prev_pool_pulls = result['pool_pulls']
-                        expected_up_count += 1  # 想抽的池子计入期望
-                    else:
-                        # 未选中的池子：跳过（只用赠送）
-                        result = simulator.pull_bonus_and_free_limited_welfare(use_limited_welfare=(welfare_mode == 'limited'))
-                        welfare_used_total += result.get('welfare_used', 0)
-                        old_up_count += result.get('old_up_count', 0)
-                        prev_pool_pulls = result['pool_pulls']
-                        unexpected_current_up_count += result.get('current_up_count', 0)  # 跳过池意外当期UP数量
-                    pity_history.append(simulator.state.small_pity_counter)
-            
-            total_current_up_count = expected_up_count + unexpected_current_up_count
-            results.append({
-                'user_spent': user_spent,
-                'expected_up_count': expected_up_count,  # 期望UP数
-                'unexpected_current_up_count': unexpected_current_up_count,  # 跳过池意外本期UP数
-                'total_current_up_count': total_current_up_count,  # 总和当期UP数
-                'old_up_count': old_up_count,  # 往期UP数
-                'welfare_invested': welfare_invested,
-                'welfare_used': welfare_used_total,
-                'pity_history': pity_history
-            })
-        
-        return results
+        return self.simulate_schedule(STRATEGY_3, num_pools, welfare_mode)
     
-    def simulate_strategy_4_skip_two(self, num_pools: int, welfare_mode: Optional[str] = None) -> List[Dict]:
+    def simulate_strategy_4_skip_two(self, num_pools: int, welfare_mode: Optional[str] = None) -> StrategyResults:
         """
         策略4：抽1跳2循环
         welfare_mode: None(无福利), 'limited'(限时福利), 'permanent'(不限时福利)
         """
-        results = []
-        num_cycles = num_pools // 3
-        
-        mode_name = {None: "无福利", 'limited': "限时福利", 'permanent': "不限时福利"}
-        print(f"\n【策略4：抽1跳2循环 - {mode_name.get(welfare_mode, '未知')}】")
-        print(f"正在模拟 {num_pools} 个池子（{num_cycles} 个周期），共 {self.iterations} 次...")
-        
-        for i in range(self.iterations):
-            if (i + 1) % 1000 == 0:
-                print(f"进度: {i + 1}/{self.iterations}")
-            
-            simulator = GachaSimulator(self.config)
-            user_spent = 0
-            welfare_invested = 0
-            welfare_used_total = 0
-            prev_pool_pulls = 0
-            pity_history = []
-            expected_up_count = 0  # 期望UP数（按策略规划想抽的池子数）
-            unexpected_current_up_count = 0  # 跳过池意外获得的本期UP数
-            old_up_count = 0  # 往期UP数
-            
-            for cycle in range(num_cycles):
-                # 第1个池子：跳过
-                simulator.reset_for_new_pool(prev_pool_pulls)
-                if welfare_mode == 'limited':
-                    simulator.state.welfare_limited = 10
-                    welfare_invested += 10
-                elif welfare_mode == 'permanent':
-                    simulator.state.welfare_permanent += 10
-                    welfare_invested += 10
-                result = simulator.pull_bonus_and_free_limited_welfare(use_limited_welfare=(welfare_mode == 'limited'))
-                welfare_used_total += result.get('welfare_used', 0)
-                old_up_count += result.get('old_up_count', 0)
-                prev_pool_pulls = result['pool_pulls']
-                pity_history.append(simulator.state.small_pity_counter)
-                unexpected_current_up_count += result.get('current_up_count', 0)  # 跳过池意外当期UP数量
-                
-                # 第2个池子：跳过
-                simulator.reset_for_new_pool(prev_pool_pulls)
-                if welfare_mode == 'limited':
-                    simulator.state.welfare_limited = 10
-                    welfare_invested += 10
-                elif welfare_mode == 'permanent':
-                    simulator.state.welfare_permanent += 10
-                    welfare_invested += 10
-                result = simulator.pull_bonus_and_free_limited_welfare(use_limited_welfare=(welfare_mode == 'limited'))
-                welfare_used_total += result.get('welfare_used', 0)
-                old_up_count += result.get('old_up_count', 0)
-                prev_pool_pulls = result['pool_pulls']
-                pity_history.append(simulator.state.small_pity_counter)
-                unexpected_current_up_count += result.get('current_up_count', 0)  # 跳过池意外当期UP数量
-                
-                # 第3个池子：抽
-                simulator.reset_for_new_pool(prev_pool_pulls)
-                if welfare_mode == 'limited':
-                    simulator.state.welfare_limited = 10
-                    welfare_invested += 10
-                elif welfare_mode == 'permanent':
-                    simulator.state.welfare_permanent += 10
-                    welfare_invested += 10
-                result = simulator.pull_until_target(use_welfare=(welfare_mode == 'permanent'))
-                user_spent += result['pulls']
-                welfare_used_total += result.get('welfare_used', 0)
-                old_up_count += result.get('old_up_count', 0)
-                prev_pool_pulls = result['pool_pulls']
-                pity_history.append(simulator.state.small_pity_counter)
-                expected_up_count += 1  # 想抽的池子计入期望
-            
-            total_current_up_count = expected_up_count + unexpected_current_up_count
-            results.append({
-                'user_spent': user_spent,
-                'expected_up_count': expected_up_count,  # 期望UP数
-                'unexpected_current_up_count': unexpected_current_up_count,  # 跳过池意外本期UP数
-                'total_current_up_count': total_current_up_count,  # 总和当期UP数
-                'old_up_count': old_up_count,  # 往期UP数
-                'welfare_invested': welfare_invested,
-                'welfare_used': welfare_used_total,
-                'pity_history': pity_history
-            })
-        
-        return results
+        return self.simulate_schedule(STRATEGY_4, num_pools, welfare_mode)
     
-    def simulate_strategy_5_random_three_pick_one(self, num_pools: int, welfare_mode: Optional[str] = None) -> List[Dict]:
+    def simulate_strategy_5_random_three_pick_one(self, num_pools: int, welfare_mode: Optional[str] = None) -> StrategyResults:
         """
         策略5：以三个卡池为周期，随机选择其中一个抽
         welfare_mode: None(无福利), 'limited'(限时福利), 'permanent'(不限时福利)
         """
-        results = []
-        num_cycles = num_pools // 3
-        
-        mode_name = {None: "无福利", 'limited': "限时福利", 'permanent': "不限时福利"}
-        print(f"\n【策略5：三池周期随机选一 - {mode_name.get(welfare_mode, '未知')}】")
-        print(f"正在模拟 {num_pools} 个池子（{num_cycles} 个周期），共 {self.iterations} 次...")
-        
-        for i in range(self.iterations):
-            if (i + 1) % 1000 == 0:
-                print(f"进度: {i + 1}/{self.iterations}")
-            
-            simulator = GachaSimulator(self.config)
-            user_spent = 0
-            welfare_invested = 0
-            welfare_used_total = 0
-            prev_pool_pulls = 0
-            pity_history = []
-            expected_up_count = 0  # 期望UP数（按策略规划想抽的池子数）
-            unexpected_current_up_count = 0  # 跳过池意外获得的本期UP数
-            old_up_count = 0  # 往期UP数
-            
-            for cycle in range(num_cycles):
-                # 随机选择抽哪个池子（0, 1, 或2）
-                pull_idx = random.randint(0, 2)
-                
-                for pool_in_cycle in range(3):
-                    simulator.reset_for_new_pool(prev_pool_pulls)
-                    
-                    # 添加策划福利
-                    if welfare_mode == 'limited':
-                        simulator.state.welfare_limited = 10
-                        welfare_invested += 10
-                    elif welfare_mode == 'permanent':
-                        simulator.state.welfare_permanent += 10
-                        welfare_invested += 10
-                    
-                    if pool_in_cycle == pull_idx:
-                        # 选中的池子：抽
-                        result = simulator.pull_until_target(use_welfare=(welfare_mode == 'permanent'))
-                        user_spent += result['pulls']
-                        welfare_used_total += result.get('welfare_used', 0)
-                        old_up_count += result.get('old_up_count', 0)
-                        prev_pool_pulls = result['pool_pulls']
-                        expected_up_count += 1  # 想抽的池子计入期望
-                    else:
-                        # 未选中的池子：跳过（只用赠送）
-                        result = simulator.pull_bonus_and_free_limited_welfare(use_limited_welfare=(welfare_mode == 'limited'))
-                        welfare_used_total += result.get('welfare_used', 0)
-                        old_up_count += result.get('old_up_count', 0)
-                        prev_pool_pulls = result['pool_pulls']
-                        unexpected_current_up_count += result.get('current_up_count', 0)  # 跳过池意外当期UP数量
-                    pity_history.append(simulator.state.small_pity_counter)
-            
-            total_current_up_count = expected_up_count + unexpected_current_up_count
-            results.append({
-                'user_spent': user_spent,
-                'expected_up_count': expected_up_count,  # 期望UP数
-                'unexpected_current_up_count': unexpected_current_up_count,  # 跳过池意外本期UP数
-                'total_current_up_count': total_current_up_count,  # 总和当期UP数
-                'old_up_count': old_up_count,  # 往期UP数
-                'welfare_invested': welfare_invested,
-                'welfare_used': welfare_used_total,
-                'pity_history': pity_history
-            })
-        
-        return results
+        return self.simulate_schedule(STRATEGY_5, num_pools, welfare_mode)
     
-    def simulate_strategy_6_random_three_pick_two(self, num_pools: int, welfare_mode: Optional[str] = None) -> List[Dict]:
+    def simulate_strategy_6_random_three_pick_two(self, num_pools: int, welfare_mode: Optional[str] = None) -> StrategyResults:
         """
         策略6：以三个卡池为周期，随机选择其中两个抽
         welfare_mode: None(无福利), 'limited'(限时福利), 'permanent'(不限时福利)
         """
-        results = []
-        num_cycles = num_pools // 3
-        
-        mode_name = {None: "无福利", 'limited': "限时福利", 'permanent': "不限时福利"}
-        print(f"\n【策略6：三池周期随机选二 - {mode_name.get(welfare_mode, '未知')}】")
-        print(f"正在模拟 {num_pools} 个池子（{num_cycles} 个周期），共 {self.iterations} 次...")
-        
-        for i in range(self.iterations):
-            if (i + 1) % 1000 == 0:
-                print(f"进度: {i + 1}/{self.iterations}")
-            
-            simulator = GachaSimulator(self.config)
-            user_spent = 0
-            welfare_invested = 0
-            welfare_used_total = 0
-            prev_pool_pulls = 0
-            pity_history = []
-            expected_up_count = 0  # 期望UP数（按策略规划想抽的池子数）
-            unexpected_current_up_count = 0  # 跳过池意外获得的本期UP数
-            old_up_count = 0  # 往期UP数
-            
-            for cycle in range(num_cycles):
-                # 随机选择跳过哪个池子（0, 1, 或2）
-                skip_idx = random.randint(0, 2)
-                
-                for pool_in_cycle in range(3):
-                    simulator.reset_for_new_pool(prev_pool_pulls)
-                    
-                    # 添加策划福利
-                    if welfare_mode == 'limited':
-                        simulator.state.welfare_limited = 10
-                        welfare_invested += 10
-                    elif welfare_mode == 'permanent':
-                        simulator.state.welfare_permanent += 10
-                        welfare_invested += 10
-                    
-                    if pool_in_cycle == skip_idx:
-                        # 跳过的池子：只用赠送
-                        result = simulator.pull_bonus_and_free_limited_welfare(use_limited_welfare=(welfare_mode == 'limited'))
-                        welfare_used_total += result.get('welfare_used', 0)
-                        old_up_count += result.get('old_up_count', 0)
-                        prev_pool_pulls = result['pool_pulls']
-                        unexpected_current_up_count += result.get('current_up_count', 0)  # 跳过池意外当期UP数量
-                    else:
-                        # 选中的池子：抽
-                        result = simulator.pull_until_target(use_welfare=(welfare_mode == 'permanent'))
-                        user_spent += result['pulls']
-                        welfare_used_total += result.get('welfare_used', 0)
-                        old_up_count += result.get('old_up_count', 0)
-                        prev_pool_pulls = result['pool_pulls']
-                        expected_up_count += 1  # 想抽的池子计入期望
-                    pity_history.append(simulator.state.small_pity_counter)
-            
-            total_current_up_count = expected_up_count + unexpected_current_up_count
-            results.append({
-                'user_spent': user_spent,
-                'expected_up_count': expected_up_count,  # 期望UP数
-                'unexpected_current_up_count': unexpected_current_up_count,  # 跳过池意外本期UP数
-                'total_current_up_count': total_current_up_count,  # 总和当期UP数
-                'old_up_count': old_up_count,  # 往期UP数
-                'welfare_invested': welfare_invested,
-                'welfare_used': welfare_used_total,
-                'pity_history': pity_history
-            })
-        
-        return results
+        return self.simulate_schedule(STRATEGY_6, num_pools, welfare_mode)
 
     def simulate_strategy_with_welfare_comparison(self, strategy_name: str, num_pools: int, 
                                                    strategy_func, *args) -> Dict:
@@ -482,55 +335,48 @@ class StrategySimulator:
             'permanent': permanent_results
         }
     
-    def print_welfare_comparison(self, strategy_name: str, baseline_results: List[Dict], 
-                                limited_results: List[Dict], permanent_results: List[Dict], 
+    def print_welfare_comparison(self, strategy_name: str, baseline_results: ResultsLike,
+                                limited_results: ResultsLike, permanent_results: ResultsLike,
                                 num_pools: int) -> None:
         """
         打印策划福利方案对比统计（关注用户实际花费）
+        各结果可以是列式结果 StrategyResults、流式统计 StreamingStrategyStats，也可以是旧版的结果字典列表
         """
         print(f"\n{'=' * 70}")
         print(f"【{strategy_name} - 福利方案效率分析】")
         print(f"{'=' * 70}")
         
+        baseline_results = _as_summary(baseline_results)
+        limited_results = _as_summary(limited_results)
+        permanent_results = _as_summary(permanent_results)
+        
         # 基准统计（无福利）
-        baseline_spent = [r['user_spent'] for r in baseline_results]
-        baseline_expected = baseline_results[0]['expected_up_count']
-        baseline_unexpected = [r['unexpected_current_up_count'] for r in baseline_results]
-        baseline_total_current = [r['total_current_up_count'] for r in baseline_results]
-        baseline_old_up = [r.get('old_up_count', 0) for r in baseline_results]
-        avg_baseline = sum(baseline_spent) / len(baseline_spent)
-        avg_baseline_unexpected = sum(baseline_unexpected) / len(baseline_unexpected)
-        avg_baseline_total_current = sum(baseline_total_current) / len(baseline_total_current)
-        avg_baseline_old_up = sum(baseline_old_up) / len(baseline_old_up)
+        baseline_expected = baseline_results.mean('expected_up_count')
+        avg_baseline = baseline_results.mean('user_spent')
+        avg_baseline_unexpected = baseline_results.mean('unexpected_current_up_count')
+        avg_baseline_total_current = baseline_results.mean('total_current_up_count')
+        avg_baseline_old_up = baseline_results.mean('old_up_count')
         
         # 限时福利统计（方案1）
-        limited_spent = [r['user_spent'] for r in limited_results]
-        limited_welfare_invested = limited_results[0]['welfare_invested']
-        limited_unexpected = [r['unexpected_current_up_count'] for r in limited_results]
-        limited_total_current = [r['total_current_up_count'] for r in limited_results]
-        limited_old_up = [r.get('old_up_count', 0) for r in limited_results]
-        avg_limited = sum(limited_spent) / len(limited_spent)
-        avg_limited_unexpected = sum(limited_unexpected) / len(limited_unexpected)
-        avg_limited_total_current = sum(limited_total_current) / len(limited_total_current)
-        avg_limited_old_up = sum(limited_old_up) / len(limited_old_up)
+        limited_welfare_invested = limited_results.welfare_invested
+        avg_limited = limited_results.mean('user_spent')
+        avg_limited_unexpected = limited_results.mean('unexpected_current_up_count')
+        avg_limited_total_current = limited_results.mean('total_current_up_count')
+        avg_limited_old_up = limited_results.mean('old_up_count')
         limited_saved = avg_baseline - avg_limited
         
         # 不限时福利统计（方案2）
-        permanent_spent = [r['user_spent'] for r in permanent_results]
-        permanent_welfare_invested = permanent_results[0]['welfare_invested']
-        permanent_unexpected = [r['unexpected_current_up_count'] for r in permanent_results]
-        permanent_total_current = [r['total_current_up_count'] for r in permanent_results]
-        permanent_old_up = [r.get('old_up_count', 0) for r in permanent_results]
-        avg_permanent = sum(permanent_spent) / len(permanent_spent)
-        avg_permanent_unexpected = sum(permanent_unexpected) / len(permanent_unexpected)
-        avg_permanent_total_current = sum(permanent_total_current) / len(permanent_total_current)
-        avg_permanent_old_up = sum(permanent_old_up) / len(permanent_old_up)
+        permanent_welfare_invested = permanent_results.welfare_invested
+        avg_permanent = permanent_results.mean('user_spent')
+        avg_permanent_unexpected = permanent_results.mean('unexpected_current_up_count')
+        avg_permanent_total_current = permanent_results.mean('total_current_up_count')
+        avg_permanent_old_up = permanent_results.mean('old_up_count')
         permanent_saved = avg_baseline - avg_permanent
         
         # 输出对比
         print(f"\n模拟条件：")
         print(f"  • 卡池总数: {num_pools} 个")
-        print(f"  • 期望UP数: {baseline_expected} 个（按策略规划想抽的池子）")
+        print(f"  • 期望UP数: {baseline_expected:g} 个（按策略规划想抽的池子）")
         print(f"  • 跳过池意外获得本期UP数: 基准 {avg_baseline_unexpected:.2f} | 限时抽福利 {avg_limited_unexpected:.2f} | 永久抽福利 {avg_permanent_unexpected:.2f}")
         print(f"  • 所有当期UP数: 基准 {avg_baseline_total_current:.2f} | 限时抽福利 {avg_limited_total_current:.2f} | 永久抽福利 {avg_permanent_total_current:.2f}（期望UP + 跳过池意外UP）")
         print(f"  • 额外意外往期UP数: 基准 {avg_baseline_old_up:.2f} | 限时抽福利 {avg_limited_old_up:.2f} | 永久抽福利 {avg_permanent_old_up:.2f} （14.29%概率，2/7）")
@@ -0,0 +1,149 @@
+"""
+流式统计
+
+抽数、UP数、小保底水位都是有上界的非负整数，因此用计数直方图就能精确得到
+均值、方差和任意分位数，内存只与取值范围有关，与模拟次数无关。
+模拟结果可以分批喂入、用完即丢，多块统计也可以直接合并（并行时使用）。
+"""
+from typing import Dict, Iterable
+
+import numpy as np
+
+from strategy_results import COLUMNS, StrategyResults
+
+
+class StreamingHistogram:
+    """非负整数的计数直方图（精确的均值/方差/分位数）"""
+
+    def __init__(self):
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def from_values(cls, values: Iterable[int]) -> 'StreamingHistogram':
+        hist = cls()
+        hist.update(values)
+        return hist
+
+    def update(self, values: Iterable[int]):
+        """加入一批取值"""
+        values = np.asarray(values, dtype=np.int64).ravel()
+        if len(values) == 0:
+            return
+        if values.min() < 0:
+            raise ValueError("流式直方图只支持非负整数")
+        counts = np.bincount(values)
+        self._add_counts(counts)
+
+    def merge(self, other: 'StreamingHistogram'):
+        """合并另一个直方图"""
+        self._add_counts(other.counts)
+
+    def _add_counts(self, counts: np.ndarray):
+        if len(counts) > len(self.counts):
+            self.counts = np.concatenate([self.counts, np.zeros(len(counts) - len(self.counts), dtype=np.int64)])
+        self.counts[:len(counts)] += counts
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def __len__(self) -> int:
+        return self.count
+
+    def mean(self) -> float:
+        values = np.arange(len(self.counts))
+        return float(self.counts @ values) / self.count
+
+    def var(self) -> float:
+        """总体方差"""
+        values = np.arange(len(self.counts), dtype=np.float64)
+        mean = self.mean()
+        return float(self.counts @ (values - mean) ** 2) / self.count
+
+    def std(self) -> float:
+        return self.var() ** 0.5
+
+    def min(self) -> int:
+        return int(np.flatnonzero(self.counts)[0])
+
+    def max(self) -> int:
+        return int(np.flatnonzero(self.counts)[-1])
+
+    def quantile(self, q: float) -> int:
+        """分位数：与 sorted(values)[int(n * q)] 完全相同"""
+        index = min(int(self.count * q), self.count - 1)
+        return int(np.searchsorted(np.cumsum(self.counts), index, side='right'))
+
+    def percentile(self, q: float) -> float:
+        """线性插值的分位数：与 np.percentile(values, q * 100) 相同"""
+        position = (self.count - 1) * q
+        lower = int(np.floor(position))
+        upper = min(lower + 1, self.count - 1)
+        low_value, high_value = np.searchsorted(np.cumsum(self.counts), [lower, upper], side='right')
+        return float(low_value + (high_value - low_value) * (position - lower))
+
+
+class StreamingStrategyStats:
+    """
+    一个策略在一种福利模式下的流式统计
+    与 StrategyResults 一样支持 mean(列名) / len() / welfare_invested，可以直接交给 print_welfare_comparison
+    """
+
+    def __init__(self, num_pools: int, max_pity: int = 80):
+        self.num_pools = num_pools
+        self.max_pity = max_pity
+        self.histograms: Dict[str, StreamingHistogram] = {name: StreamingHistogram() for name in COLUMNS}
+        self.pity_counts = np.zeros((num_pools, max_pity + 1), dtype=np.int64)  # [池子, 小保底水位] → 次数
+        self.welfare_invested = 0
+
+    def update(self, results: StrategyResults):
+        """加入一批模拟结果（加入后结果即可丢弃）"""
+        for name, hist in self.histograms.items():
+            hist.update(getattr(results, name))
+        pools = results.pity_history.shape[1]
+        flat = (np.arange(pools) * (self.max_pity + 1))[None, :] + results.pity_history
+        self.pity_counts[:pools] += np.bincount(flat.ravel(), minlength=pools * (self.max_pity + 1)).reshape(pools, -1)
+        self.welfare_invested = results.welfare_invested
+
+    def merge(self, other: 'StreamingStrategyStats'):
+        """合并另一块统计"""
+        for name, hist in self.histograms.items():
+            hist.merge(other.histograms[name])
+        self.pity_counts += other.pity_counts
+        self.welfare_invested = other.welfare_invested
+
+    @classmethod
+    def from_results(cls, results: StrategyResults, max_pity: int = 80) -> 'StreamingStrategyStats':
+        stats = cls(results.pity_history.shape[1], max_pity)
+        stats.update(results)
+        return stats
+
+    def __len__(self) -> int:
+        return self.histograms['user_spent'].count
+
+    def mean(self, column: str) -> float:
+        if column == 'total_current_up_count':
+            return self.mean('expected_up_count') + self.mean('unexpected_current_up_count')
+        return self.histograms[column].mean()
+
+    def std(self, column: str) -> float:
+        return self.histograms[column].std()
+
+    def quantile(self, column: str, q: float) -> int:
+        return self.histograms[column].quantile(q)
+
+    def mean_pity_history(self) -> np.ndarray:
+        """每个池子结束时的平均小保底水位"""
+        levels = np.arange(self.max_pity + 1)
+        return self.pity_counts @ levels / np.maximum(self.pity_counts.sum(axis=1), 1)
+
+    def std_pity_history(self) -> np.ndarray:
+        """每个池子结束时小保底水位的标准差"""
+        levels = np.arange(self.max_pity + 1)
+        total = np.maximum(self.pity_counts.sum(axis=1), 1)
+        mean = self.pity_counts @ levels / total
+        return np.sqrt(np.maximum(self.pity_counts @ levels ** 2 / total - mean ** 2, 0.0))
+
+    def pity_histogram(self) -> np.ndarray:
+        """所有池子合在一起的小保底水位次数"""
+        return self.pity_counts.sum(axis=0)
@@ -0,0 +1,548 @@
+"""
+多卡池转移矩阵引擎
+
+策略模拟中跨池传递的只有 (小保底水位, 上期是否满60抽, 永久福利剩余) 三个量。
+先对每种卡池（抽到UP为止 / 跳过）精确求出"进入状态 → 离开状态"的转移核，
+再把转移核逐池复合，就能精确得到每个池子结束时的小保底水位分布，
+以及用户花费、福利使用、UP数的期望和方差（可选用户花费的完整分布），
+完全不需要采样。对同一配置转移核只需计算一次，扫描卡池数也只需一次递推。
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import GachaConfig
+from exact_solver import P_CURRENT_UP, P_OLD_UP, P_STANDARD
+from strategy_schedule import StrategySchedule
+
+
+# 跨池累加的统计量
+QUANTITIES = ('user_spent', 'welfare_used', 'unexpected_current_up_count', 'old_up_count')
+
+
+class StrategyDistribution:
+    """一个策略在某种福利模式下的精确结果"""
+
+    def __init__(self, schedule: StrategySchedule, welfare_mode: Optional[str], num_pools: int,
+                 expected_up_count: int, welfare_invested: int, moments: Dict[str, Tuple[float, float]],
+                 pity_distribution: np.ndarray, spent_pmf: Optional[np.ndarray] = None):
+        self.schedule = schedule
+        self.welfare_mode = welfare_mode
+        self.num_pools = num_pools  # 实际模拟的池子数（完整周期）
+        self.expected_up_count = expected_up_count
+        self.welfare_invested = welfare_invested
+        self.moments = moments  # {统计量: (期望, 方差)}
+        self.pity_distribution = pity_distribution  # [池子, 小保底水位] → 概率
+        self.spent_pmf = spent_pmf  # 用户花费的完整分布（未计算时为 None）
+
+    def mean(self, quantity: str) -> float:
+        """期望（也支持 expected_up_count / total_current_up_count / welfare_invested）"""
+        if quantity == 'expected_up_count':
+            return float(self.expected_up_count)
+        if quantity == 'welfare_invested':
+            return float(self.welfare_invested)
+        if quantity == 'total_current_up_count':
+            return self.expected_up_count + self.moments['unexpected_current_up_count'][0]
+        return self.moments[quantity][0]
+
+    def var(self, quantity: str) -> float:
+        """方差"""
+        if quantity in ('expected_up_count', 'welfare_invested'):
+            return 0.0
+        if quantity == 'total_current_up_count':
+            quantity = 'unexpected_current_up_count'
+        return self.moments[quantity][1]
+
+    def std(self, quantity: str) -> float:
+        """标准差"""
+        return max(self.var(quantity), 0.0) ** 0.5
+
+    def quantile(self, q: float) -> int:
+        """用户花费的分位数（需要 spent_pmf）"""
+        if self.spent_pmf is None:
+            raise ValueError("未计算用户花费的完整分布，请使用 spent_distribution=True")
+        cdf = np.cumsum(self.spent_pmf)
+        return int(min(np.searchsorted(cdf, q, side='right'), len(cdf) - 1))
+
+    def mean_pity_history(self) -> np.ndarray:
+        """每个池子结束时小保底水位的期望"""
+        return self.pity_distribution @ np.arange(self.pity_distribution.shape[1])
+
+    def pity_histogram(self) -> np.ndarray:
+        """所有池子结束时小保底水位的总体分布（与可视化中 pity_history 展平后的直方图对应）"""
+        return self.pity_distribution.mean(axis=0)
+
+    def print_summary(self):
+        """打印精确结果"""
+        mode_name = {None: "无福利", 'limited': "限时福利", 'permanent': "不限时福利"}
+        print(f"\n【{self.schedule.title} - {mode_name.get(self.welfare_mode, '未知')}】（精确计算，{self.num_pools} 个池子）")
+        print(f"  用户花费: {self.mean('user_spent'):.2f} ± {self.std('user_spent'):.2f}")
+        if self.spent_pmf is not None:
+            print(f"  用户花费中位数: {self.quantile(0.5)} | 90%分位数: {self.quantile(0.9)}")
+        print(f"  福利投入/使用: {self.welfare_invested} / {self.mean('welfare_used'):.2f}")
+        print(f"  期望UP数: {self.expected_up_count} | 跳过池意外本期UP数: "
+              f"{self.mean('unexpected_current_up_count'):.4f} ± {self.std('unexpected_current_up_count'):.4f}")
+        print(f"  往期UP数: {self.mean('old_up_count'):.4f} ± {self.std('old_up_count'):.4f}")
+        if len(self.pity_distribution):
+            print(f"  池子结束时平均小保底水位: {self.mean_pity_history().mean():.2f}")
+
+
+class TransitionEngine:
+    """多卡池转移矩阵引擎"""
+
+    def __init__(self, config: GachaConfig, tol: float = 1e-15):
+        """
+        tol: 概率低于此值的跨池状态直接丢弃（0 表示完全不丢弃）
+        """
+        self.config = config
+        self.tol = tol
+        self._kernels: Dict[Tuple[bool, int], Dict[str, np.ndarray]] = {}
+
+        # 每个小保底水位下的6星概率（水位达到小保底时必出）
+        small_pity = config.small_pity
+        hazard = np.ones(small_pity + 1)
+        for c in range(1, small_pity):
+            rate = config.base_ssr_rate
+            if c > config.increase_threshold:
+                rate += (c - config.increase_threshold) * config.increase_rate
+            hazard[c] = min(rate, 1.0)
+        self.hazard = hazard
+
+    # ------------------------------------------------------------------
+    # 单池转移核
+    # ------------------------------------------------------------------
+
+    def kernel(self, pull: bool, block: int) -> Dict[str, np.ndarray]:
+        """
+        单池转移核（所有可能的结果，及每个进入小保底水位到达各结果的概率）
+        pull: True 为抽到UP为止的池子，False 为跳过的池子
+        block: 开局一次性抽完的抽数（60送 + 限时福利）
+
+        返回: {
+            'N': 本池总抽数（正常抽）, 'k': 离开时的小保底水位（形状均为 (结果数,)）,
+            'p': 概率,
+            'old1'/'old2': 往期UP数的一阶/二阶联合矩 E[X·1{结果}] / E[X²·1{结果}],
+            'cur1'/'cur2': 当期UP数的一阶/二阶联合矩（抽到UP为止的池子恒为0）
+        } 后几项形状为 (小保底水位数, 结果数)
+        """
+        key = (pull, block)
+        if key not in self._kernels:
+            if pull:
+                self._kernels[key] = self._pull_pool_kernel(block)
+            else:
+                self._kernels[key] = self._skip_pool_kernel(block)
+        return self._kernels[key]
+
+    def _pull_pool_kernel(self, block: int) -> Dict[str, np.ndarray]:
+        """
+        抽到UP为止的池子：按正常抽逐抽递推，对所有进入水位同时计算
+
+        A: 尚未出当期UP的概率 [进入水位, 当前水位]
+        C: 已在60送/限时福利中出了当期UP、但还要把这部分抽完的概率
+        *1/*2: 对应的往期UP数一阶/二阶联合矩
+        """
+        config = self.config
+        S = config.small_pity
+        h = self.hazard
+        assert block < 30, "一次性抽完的部分不应达到30抽"
+        n_max = max(config.large_pity, block)
+
+        end = np.zeros((3, S, n_max + 1, S + 1))  # [矩阶, 进入水位, 结束抽数, 离开水位]
+        A = np.zeros((3, S, S + 1))
+        A[0, np.arange(S), np.arange(S)] = 1.0
+        C = np.zeros((3, S, S + 1))
+
+        # 特殊10抽：以当期UP/往期UP概率独立抽10次
+        a = config.base_ssr_rate * P_CURRENT_UP
+        b = config.base_ssr_rate * P_OLD_UP
+        q0 = (1 - a) ** 10  # 10抽都不出当期UP
+        b_cond = b / (1 - a)
+        mu0 = 10 * b_cond  # 不出当期UP时往期UP数的条件一阶矩
+        nu0 = 10 * b_cond * (1 - b_cond) + mu0 ** 2  # 条件二阶矩
+        j1 = 10 * b - q0 * mu0  # 出当期UP时往期UP数的联合一阶矩
+        j2 = 10 * b * (1 - b) + (10 * b) ** 2 - q0 * nu0  # 联合二阶矩
+
+        for n in range(1, n_max + 1):
+            # 已出当期UP、仍在抽完一次性部分的
+            if C[0].any():
+                C = _shift(C)
+                C, cur = _pull_step(C, h)
+                C[:, :, 0] += cur
+
+            A = _shift(A)
+            if n >= config.large_pity:
+                # 大保底：剩余的全部必定当期UP
+                end[:, :, n, 0] += A.sum(axis=2)
+                break
+
+            A, cur = _pull_step(A, h)
+            if n < block:
+                C[:, :, 0] += cur
+            else:
+                end[:, :, n, 0] += cur
+
+            if n == block and block > 0:
+                end[:, :, n, :] += C
+                C[:] = 0.0
+
+            if n == 30:
+                # 满30抽送的特殊10抽（不影响保底）：出当期UP则结束，否则继续
+                m0, m1, m2 = A
+                end[0, :, n, :] += (1 - q0) * m0
+                end[1, :, n, :] += (1 - q0) * m1 + j1 * m0
+                end[2, :, n, :] += (1 - q0) * m2 + 2 * j1 * m1 + j2 * m0
+                A = np.stack([q0 * m0, q0 * (m1 + mu0 * m0), q0 * (m2 + 2 * mu0 * m1 + nu0 * m0)])
+
+            if not A[0].any() and not C[0].any():
+                break
+
+        return _compress_outcomes(end, cur_moments=None)
+
+    def _skip_pool_kernel(self, block: int) -> Dict[str, np.ndarray]:
+        """跳过的池子：只抽 block 抽，统计当期UP和往期UP的一阶/二阶联合矩"""
+        config = self.config
+        S = config.small_pity
+        h = self.hazard[None, :]
+
+        # [矩: 概率, 往期一阶, 往期二阶, 当期一阶, 当期二阶, 进入水位, 当前水位]
+        P = np.zeros((5, S, S + 1))
+        P[0, np.arange(S), np.arange(S)] = 1.0
+        for _ in range(block):
+            P = _shift(P)
+            no_ssr = P * (1 - h)
+            ssr = (P * h).sum(axis=2)
+            m0, o1, o2, c1, c2 = ssr
+            no_ssr[0, :, 0] += m0
+            # 往期UP：往期计数 +1
+            no_ssr[1, :, 0] += P_OLD_UP * (o1 + m0) + (1 - P_OLD_UP) * o1
+            no_ssr[2, :, 0] += P_OLD_UP * (o2 + 2 * o1 + m0) + (1 - P_OLD_UP) * o2
+            # 当期UP：当期计数 +1
+            no_ssr[3, :, 0] += P_CURRENT_UP * (c1 + m0) + (1 - P_CURRENT_UP) * c1
+            no_ssr[4, :, 0] += P_CURRENT_UP * (c2 + 2 * c1 + m0) + (1 - P_CURRENT_UP) * c2
+            P = no_ssr
+
+        end = np.zeros((3, S, block + 1, S + 1))
+        end[:, :, block, :] = P[:3]
+        cur = np.zeros((2, S, block + 1, S + 1))
+        cur[:, :, block, :] = P[3:]
+        return _compress_outcomes(end, cur_moments=cur)
+
+    # ------------------------------------------------------------------
+    # 多池复合
+    # ------------------------------------------------------------------
+
+    def run(self, schedule: StrategySchedule, num_pools: int, welfare_mode: Optional[str] = None,
+            spent_distribution: bool = False) -> StrategyDistribution:
+        """
+        精确计算一个策略在 num_pools 个池子上的结果
+        welfare_mode: None(无福利), 'limited'(限时福利), 'permanent'(不限时福利)
+        spent_distribution: 是否计算用户花费的完整分布（较慢）
+        """
+        return self._propagate(schedule, num_pools, welfare_mode, spent_distribution)[-1]
+
+    def sweep_num_pools(self, schedule: StrategySchedule, max_pools: int,
+                        welfare_mode: Optional[str] = None) -> List[StrategyDistribution]:
+        """
+        一次递推得到卡池数为 1..max_pools 时的全部结果
+        返回: 第 i 项对应 num_pools = i + 1（不足一个周期的尾部池子与策略模拟一样不计入）
+        """
+        snapshots = self._propagate(schedule, max_pools, welfare_mode, False)
+        return [snapshots[num_pools // schedule.cycle] for num_pools in range(1, max_pools + 1)]
+
+    def _propagate(self, schedule: StrategySchedule, num_pools: int, welfare_mode: Optional[str],
+                   spent_distribution: bool) -> List[StrategyDistribution]:
+        """逐周期复合转移核，返回每个完整周期结束时的结果（第0项为尚未开始）"""
+        plans = schedule.plans()  # 按水位决定的计划没有固定的周期计划，这里会直接报错
+        config = self.config
+        S = config.small_pity
+        num_cycles = schedule.num_cycles(num_pools)
+        state = _CarriedState.initial(S, spent_distribution,
+                                      config.large_pity * num_cycles * schedule.pulls_per_cycle + 1)
+        pity_rows: List[np.ndarray] = []
+        snapshots = [self._snapshot(schedule, welfare_mode, 0, state, pity_rows)]
+
+        for _ in range(num_cycles):
+            merged = None
+            cycle_pity = np.zeros((schedule.cycle, S))
+            for plan, prob in plans:
+                branch = state
+                for pos, pull in enumerate(plan):
+                    branch = self._pool_step(branch, pull, welfare_mode)
+                    cycle_pity[pos] += prob * branch.pity_distribution()
+                merged = branch.scaled(prob) if merged is None else merged.add(branch.scaled(prob))
+            state = merged.pruned(self.tol)
+            pity_rows.extend(cycle_pity)
+            snapshots.append(self._snapshot(schedule, welfare_mode, len(snapshots), state, pity_rows))
+
+        return snapshots
+
+    def _snapshot(self, schedule: StrategySchedule, welfare_mode: Optional[str], cycles: int,
+                  state: '_CarriedState', pity_rows: List[np.ndarray]) -> StrategyDistribution:
+        pools = cycles * schedule.cycle
+        moments = {}
+        for q in QUANTITIES:
+            mean = state.m1[q].sum()
+            moments[q] = (float(mean), float(state.m2[q].sum() - mean ** 2))
+        pity = np.array(pity_rows) if pity_rows else np.zeros((0, self.config.small_pity))
+        return StrategyDistribution(
+            schedule, welfare_mode, pools,
+            expected_up_count=cycles * schedule.pulls_per_cycle,
+            welfare_invested=10 * pools if welfare_mode is not None else 0,
+            moments=moments, pity_distribution=pity,
+            spent_pmf=state.spent.sum(axis=0) if state.spent is not None else None)
+
+    def _pool_step(self, state: '_CarriedState', pull: bool, welfare_mode: Optional[str]) -> '_CarriedState':
+        """
+        复合一个池子的转移核
+        同一 (永久福利剩余, 上期是否满60) 下不同小保底水位的去向只取决于本池结果，
+        因此先按小保底水位用矩阵乘法把概率和联合矩汇总到每个结果上，再按结果分发
+        """
+        S = self.config.small_pity
+        permanent = welfare_mode == 'permanent'
+        limited = 10 if welfare_mode == 'limited' else 0
+
+        # 开池发放福利：不限时福利加到剩余数量上
+        if permanent:
+            state = state.shift_welfare(10)
+        W = state.W
+
+        m0 = state.m0.reshape(W, 2, S)
+        m1 = {q: v.reshape(W, 2, S) for q, v in state.m1.items()}
+        m2 = {q: v.reshape(W, 2, S) for q, v in state.m2.items()}
+        new = _CarriedState.empty(S, W, state.spent is not None, state.spent_len)
+        spent_parts = []
+
+        for bonus_flag in (0, 1):
+            rows = np.flatnonzero(m0[:, bonus_flag].sum(axis=1) > 0)
+            if len(rows) == 0:
+                continue
+            block = 10 * bonus_flag + limited
+            kern = self.kernel(pull, block)
+            N = kern['N'][None, :]
+            p = kern['p']
+
+            # 本池抽数的分配：60送/限时福利 → 永久福利 → 实际投入
+            w_src = rows[:, None]
+            normal_after_block = N - block
+            if pull and permanent:
+                used_w = np.minimum(w_src, normal_after_block)
+            else:
+                used_w = np.zeros_like(normal_after_block)
+            if pull:
+                spent = normal_after_block - used_w
+                welfare = limited + used_w
+            else:
+                spent = np.zeros_like(normal_after_block)
+                welfare = np.full_like(normal_after_block, limited)
+            dst = (((w_src - used_w) * 2 + (N >= 60)) * S + kern['k'][None, :]).ravel()
+
+            M0 = m0[rows, bonus_flag]
+            agg0 = M0 @ p
+            new.m0 += np.bincount(dst, agg0.ravel(), minlength=new.size)
+            for q in QUANTITIES:
+                M1 = m1[q][rows, bonus_flag]
+                M2 = m2[q][rows, bonus_flag]
+                base1 = M1 @ p
+                if q in _KERNEL_MOMENTS:
+                    k1, k2 = (kern[key] for key in _KERNEL_MOMENTS[q])
+                    agg1 = base1 + M0 @ k1
+                    agg2 = M2 @ p + 2 * (M1 @ k1) + M0 @ k2
+                else:
+                    d = spent if q == 'user_spent' else welfare
+                    agg1 = base1 + agg0 * d
+                    agg2 = M2 @ p + 2 * base1 * d + agg0 * d ** 2
+                new.m1[q] += np.bincount(dst, agg1.ravel(), minlength=new.size)
+                new.m2[q] += np.bincount(dst, agg2.ravel(), minlength=new.size)
+
+            if state.spent is not None:
+                src = ((rows * 2 + bonus_flag) * S)[:, None] + np.arange(S)[None, :]
+                spent_parts.append((src, dst, np.broadcast_to(spent, (len(rows), p.shape[1])).ravel(), p))
+
+        if state.spent is not None:
+            new.set_spent(state, spent_parts)
+        return new.pruned(self.tol)
+
+
+# 由转移核直接给出联合矩的统计量: {统计量: (一阶矩键, 二阶矩键)}
+_KERNEL_MOMENTS = {
+    'old_up_count': ('old1', 'old2'),
+    'unexpected_current_up_count': ('cur1', 'cur2'),
+}
+
+
+class _CarriedState:
+    """
+    跨池状态的概率及各统计量的联合矩
+    状态编号 = (永久福利剩余 * 2 + 上期是否满60) * 小保底水位数 + 小保底水位
+    """
+
+    def __init__(self, S: int, W: int, m0: np.ndarray, m1: Dict[str, np.ndarray], m2: Dict[str, np.ndarray],
+                 spent_states: Optional[np.ndarray] = None, spent: Optional[np.ndarray] = None,
+                 spent_len: int = 0):
+        self.S = S
+        self.W = W
+        self.size = S * 2 * W
+        self.m0 = m0
+        self.m1 = m1
+        self.m2 = m2
+        # 用户花费的完整分布：只为有概率的状态保存一行 [状态行, 花费]
+        self.spent_states = spent_states
+        self.spent = spent
+        self.spent_len = spent_len
+
+    @classmethod
+    def empty(cls, S: int, W: int, with_spent: bool, spent_len: int) -> '_CarriedState':
+        size = S * 2 * W
+        return cls(S, W, np.zeros(size), {q: np.zeros(size) for q in QUANTITIES},
+                   {q: np.zeros(size) for q in QUANTITIES},
+                   np.zeros(0, dtype=np.int64) if with_spent else None,
+                   np.zeros((0, spent_len)) if with_spent else None, spent_len)
+
+    @classmethod
+    def initial(cls, S: int, with_spent: bool, spent_len: int) -> '_CarriedState':
+        """首个卡池：小保底0、无60送、无永久福利"""
+        state = cls.empty(S, 1, with_spent, spent_len)
+        state.m0[0] = 1.0
+        if with_spent:
+            state.spent_states = np.array([0])
+            state.spent = np.zeros((1, spent_len))
+            state.spent[0, 0] = 1.0
+        return state
+
+    def pity_distribution(self) -> np.ndarray:
+        """小保底水位的边缘分布"""
+        return self.m0.reshape(-1, self.S).sum(axis=0)
+
+    def shift_welfare(self, amount: int) -> '_CarriedState':
+        """所有状态的永久福利剩余增加 amount"""
+        offset = amount * 2 * self.S
+
+        def shift(a):
+            return np.concatenate([np.zeros(offset), a])
+
+        return _CarriedState(self.S, self.W + amount, shift(self.m0),
+                             {q: shift(v) for q, v in self.m1.items()},
+                             {q: shift(v) for q, v in self.m2.items()},
+                             None if self.spent is None else self.spent_states + offset,
+                             self.spent, self.spent_len)
+
+    def scaled(self, factor: float) -> '_CarriedState':
+        return _CarriedState(self.S, self.W, self.m0 * factor,
+                             {q: v * factor for q, v in self.m1.items()},
+                             {q: v * factor for q, v in self.m2.items()},
+                             self.spent_states, None if self.spent is None else self.spent * factor,
+                             self.spent_len)
+
+    def add(self, other: '_CarriedState') -> '_CarriedState':
+        spent_states, spent = None, None
+        if self.spent is not None:
+            spent_states, inverse = np.unique(np.concatenate([self.spent_states, other.spent_states]),
+                                              return_inverse=True)
+            spent = np.zeros((len(spent_states), self.spent_len))
+            np.add.at(spent, inverse, np.concatenate([self.spent, other.spent]))
+        W = max(self.W, other.W)
+
+        def add(a, b):
+            out = np.zeros(self.S * 2 * W)
+            out[:len(a)] += a
+            out[:len(b)] += b
+            return out
+
+        return _CarriedState(self.S, W, add(self.m0, other.m0),
+                             {q: add(v, other.m1[q]) for q, v in self.m1.items()},
+                             {q: add(v, other.m2[q]) for q, v in self.m2.items()},
+                             spent_states, spent, self.spent_len)
+
+    def pruned(self, tol: float) -> '_CarriedState':
+        """丢弃概率不超过 tol 的状态，并去掉末尾没有概率的永久福利行"""
+        drop = self.m0 <= tol
+        if drop.any():
+            self.m0[drop] = 0.0
+            for q in QUANTITIES:
+                self.m1[q][drop] = 0.0
+                self.m2[q][drop] = 0.0
+            if self.spent is not None:
+                keep = ~drop[self.spent_states]
+                self.spent_states = self.spent_states[keep]
+                self.spent = self.spent[keep]
+
+        W = int(np.flatnonzero(self.m0.reshape(self.W, -1).any(axis=1)).max()) + 1
+        if W < self.W:
+            size = self.S * 2 * W
+            self.W, self.size = W, size
+            self.m0 = self.m0[:size]
+            self.m1 = {q: v[:size] for q, v in self.m1.items()}
+            self.m2 = {q: v[:size] for q, v in self.m2.items()}
+        return self
+
+    def set_spent(self, prev: '_CarriedState', parts):
+        """
+        由上一状态的花费分布和本池的结果计算新的花费分布
+        parts: [(来源状态 [福利行, 小保底水位], 去向状态, 花费增量, 转移核概率 [小保底水位, 结果])]
+        """
+        self.spent_states, dst_rows = np.unique(np.concatenate([dst for _, dst, _, _ in parts]),
+                                                return_inverse=True)
+        self.spent = np.zeros((len(self.spent_states), self.spent_len))
+        offset = 0
+        for src, dst, inc, p in parts:
+            J = p.shape[1]
+            for r in range(src.shape[0]):
+                # 同一福利行内：把各小保底水位的花费分布按转移概率汇总到每个结果上
+                pos = np.minimum(np.searchsorted(prev.spent_states, src[r]), len(prev.spent_states) - 1)
+                present = prev.spent_states[pos] == src[r]
+                if not present.any():
+                    continue
+                G = p[present].T @ prev.spent[pos[present]]
+                cols = slice(offset + r * J, offset + (r + 1) * J)
+                _add_shifted(self.spent, dst_rows[cols], inc[r * J:(r + 1) * J], G)
+            offset += len(dst)
+
+
+def _add_shifted(target: np.ndarray, rows: np.ndarray, shifts: np.ndarray, values: np.ndarray):
+    """target[rows[i], shifts[i]:] += values[i, :len - shifts[i]]（相同平移量的一起处理）"""
+    length = target.shape[1]
+    for d in np.unique(shifts):
+        sel = shifts == d
+        d = int(d)
+        np.add.at(target[:, d:], rows[sel], values[sel, :length - d])
+
+
+def _shift(a: np.ndarray) -> np.ndarray:
+    """所有状态的小保底水位 +1（最后一维）"""
+    out = np.zeros_like(a)
+    out[..., 1:] = a[..., :-1]
+    return out
+
+
+def _pull_step(a: np.ndarray, h: np.ndarray):
+    """
+    一次正常抽（水位已 +1）：未出6星的留在原水位，往期UP/常驻回到水位0，
+    当期UP单独返回 [矩阶, 进入水位]
+    a: [矩阶(概率, 一阶, 二阶), 进入水位, 当前水位]
+    """
+    hz = h[None, None, :]
+    ssr = (a * hz).sum(axis=2)
+    out = a * (1 - hz)
+    m0, m1, m2 = ssr
+    cur = np.stack([P_CURRENT_UP * m0, P_CURRENT_UP * m1, P_CURRENT_UP * m2])
+    out[0, :, 0] += (P_OLD_UP + P_STANDARD) * m0
+    out[1, :, 0] += P_OLD_UP * (m1 + m0) + P_STANDARD * m1
+    out[2, :, 0] += P_OLD_UP * (m2 + 2 * m1 + m0) + P_STANDARD * m2
+    return out, cur
+
+
+def _compress_outcomes(end: np.ndarray, cur_moments: Optional[np.ndarray]) -> Dict[str, np.ndarray]:
+    """把 [矩阶, 进入水位, 结束抽数, 离开水位] 的稠密数组压缩成所有进入水位共用的结果列表"""
+    S = end.shape[1]
+    flat = end.reshape(3, S, -1)
+    idx = np.flatnonzero((flat[0] > 0).any(axis=0))
+    N, k = np.divmod(idx, end.shape[3])
+    out = {'N': N, 'k': k, 'p': flat[0][:, idx], 'old1': flat[1][:, idx], 'old2': flat[2][:, idx]}
+    if cur_moments is not None:
+        cur_flat = cur_moments.reshape(2, S, -1)
+        out['cur1'] = cur_flat[0][:, idx]
+        out['cur2'] = cur_flat[1][:, idx]
+    else:
+        out['cur1'] = np.zeros_like(out['p'])
+        out['cur2'] = np.zeros_like(out['p'])
+    return out
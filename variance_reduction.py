@@ -0,0 +1,79 @@
+"""
+配对模拟的方差缩减
+
+福利效率 = (基准平均花费 - 福利平均花费) / 策划投入，节省的抽数相对花费本身很小，
+三种福利模式独立抽样时差值几乎被抽样噪声淹没。配对模式（StrategySimulator(paired=True) /
+run_all_strategies(paired=True)）让三种模式的第 i 次模拟使用完全相同的随机数，
+这里按模拟编号求差值 d_i = 基准花费_i - 福利花费_i 再估计效率，差值的方差远小于两组方差之和。
+
+另外两种可叠加的手段：
+- 对偶变量（antithetic）：相邻两次模拟使用 u 与 1-u，按对取平均后再估计方差
+- 控制变量（control variate）：基准花费的精确期望可由 TransitionEngine 算出，
+  用 d_i 对基准花费的回归修正 d 的均值
+"""
+import math
+from statistics import NormalDist
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from config import GachaConfig
+from strategy_results import StrategyResults
+from strategy_schedule import StrategySchedule
+from transition_engine import TransitionEngine
+
+
+def paired_efficiency_interval(baseline: StrategyResults, welfare: StrategyResults, confidence: float = 0.95,
+                               antithetic: bool = False,
+                               control_mean: Optional[float] = None) -> Tuple[float, float]:
+    """
+    按模拟编号配对估计福利效率
+    baseline / welfare: 配对模式下同一批模拟的基准与福利结果
+    antithetic: 结果是否按对偶变量成对生成（相邻两次按对取平均）
+    control_mean: 基准花费的精确期望（给定时使用控制变量修正）
+    返回: (效率, 置信区间半宽)
+    """
+    if len(baseline) != len(welfare):
+        raise ValueError("配对估计要求两组模拟次数相同")
+    x = baseline.user_spent.astype(np.float64)
+    d = x - welfare.user_spent
+    if antithetic:
+        pairs = len(d) // 2 * 2
+        x = (x[0:pairs:2] + x[1:pairs:2]) / 2
+        d = (d[0:pairs:2] + d[1:pairs:2]) / 2
+    if control_mean is not None and x.var() > 0:
+        beta = np.cov(d, x)[0, 1] / x.var(ddof=1)
+        d = d - beta * (x - control_mean)
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    invested = welfare.welfare_invested
+    return d.mean() / invested, z * d.std(ddof=1) / math.sqrt(len(d)) / invested
+
+
+def independent_efficiency_interval(baseline: StrategyResults, welfare: StrategyResults,
+                                    confidence: float = 0.95) -> Tuple[float, float]:
+    """不配对（两组独立）时的福利效率与置信区间半宽，作为对照"""
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    se = math.sqrt(baseline.user_spent.var(ddof=1) / len(baseline) +
+                   welfare.user_spent.var(ddof=1) / len(welfare))
+    invested = welfare.welfare_invested
+    return (baseline.mean('user_spent') - welfare.mean('user_spent')) / invested, z * se / invested
+
+
+def exact_baseline_spent(config: GachaConfig, schedule: StrategySchedule, num_pools: int) -> Optional[float]:
+    """基准（无福利）花费的精确期望，作为控制变量；按水位决定的计划无法精确计算，返回 None"""
+    if schedule.min_pity is not None:
+        return None
+    return TransitionEngine(config).run(schedule, num_pools, None).mean('user_spent')
+
+
+def print_efficiency_intervals(strategy_name: str, data: Dict[str, StrategyResults], confidence: float = 0.95,
+                               antithetic: bool = False, control_mean: Optional[float] = None):
+    """打印配对估计的效率置信区间（与独立估计对照）"""
+    print(f"\n【{strategy_name} - 效率置信区间（{confidence:.0%}）】")
+    for mode_key, label in (('limited', '方案1(限时)'), ('permanent', '方案2(不限时)')):
+        value, half = paired_efficiency_interval(data['baseline'], data[mode_key], confidence,
+                                                 antithetic, control_mean)
+        _, naive_half = independent_efficiency_interval(data['baseline'], data[mode_key], confidence)
+        ratio = (naive_half / half) ** 2 if half > 0 else float('inf')
+        print(f"  {label}: 效率 {value:.3f} ± {half:.4f}（不配对估计 ± {naive_half:.4f}，相当于 {ratio:.0f} 倍模拟次数）")
@@ -2,24 +2,33 @@
 数据可视化模块
 用于生成抽卡模拟结果的图表
 
-独立运行: python visualizer.py
-需要先运行 gacha_simulator.py 生成 simulation_results.pkl
+独立运行: python visualizer.py [结果目录] [--workers N] [--force]
+图表只读取汇总立方体（aggregate_cube），绘图用时与模拟次数无关
+汇总量只计算一次，各图表并行绘制；输入未变化的图表（见 plot_hashes.json）跳过
+需要先运行 main.py 生成 simulation_results/（也兼容旧版的 simulation_results.pkl）
 """
 
+import argparse
+import contextlib
+import hashlib
+import io
+import json
 import pickle
 import os
 import sys
 import warnings
 
-import matplotlib
-from matplotlib import font_manager
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
 
-sns.set_style("whitegrid")
-sns.set_context("paper", font_scale=1.2)
+from results_store import DEFAULT_RESULTS_DIR, is_results_dir, load_results
+from aggregate_cube import build_cube, is_cube_dir, load_cube
+from streaming_stats import StreamingHistogram
+
+# matplotlib / seaborn 导入与字体探测要好几秒，只在第一次绘图时进行（见 load_plotting）
+plt = None
+sns = None
+MATPLOTLIB_AVAILABLE = True
 
 # Configure Chinese fonts so labels do not render as boxes
 CHINESE_FONTS = [
@@ -28,23 +37,53 @@ CHINESE_FONTS = [
     'DejaVu Sans'
 ]
 
+# 探测到的字体缓存在 matplotlib 的缓存目录（与它的字体列表缓存放在一起）
+FONT_CACHE_FILE = 'gacha_chinese_font.json'
 
-def configure_chinese_font():
+
+def _probe_chinese_font(font_manager) -> Optional[str]:
     for font_name in CHINESE_FONTS:
         try:
             # findfont raises if the font does not exist when fallback_to_default is False
             font_manager.findfont(font_name, fallback_to_default=False)
-            matplotlib.rcParams['font.sans-serif'] = [font_name]
-            matplotlib.rcParams['axes.unicode_minus'] = False
-            return
+            return font_name
         except ValueError:
             continue
-    warnings.warn("未找到可用的中文字体，图表文字可能显示为方框")
+    return None
+
+
+def configure_chinese_font():
+    """
+    设置中文字体：探测结果按 matplotlib 版本与候选字体列表缓存到磁盘，
+    之后的运行直接读取，不再逐个查找字体
+    """
+    import matplotlib
+    from matplotlib import font_manager
 
+    cache_path = os.path.join(matplotlib.get_cachedir(), FONT_CACHE_FILE)
+    key = {'matplotlib': matplotlib.__version__, 'candidates': CHINESE_FONTS}
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached['key'] != key:
+            raise ValueError("字体缓存已过期")
+        font_name = cached['font']
+    except (OSError, ValueError, KeyError):
+        font_name = _probe_chinese_font(font_manager)
+        try:
+            tmp = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'font': font_name}, f, ensure_ascii=False)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass  # 缓存目录不可写时每次重新探测
 
-configure_chinese_font()
+    if font_name is None:
+        warnings.warn("未找到可用的中文字体，图表文字可能显示为方框")
+        return
+    matplotlib.rcParams['font.sans-serif'] = [font_name]
+    matplotlib.rcParams['axes.unicode_minus'] = False
 
-MATPLOTLIB_AVAILABLE = True
 
 # NeurIPS风格配色方案
 NEURIPS_COLORS = {
@@ -54,15 +93,38 @@ NEURIPS_COLORS = {
     'palette': ['#1F77B4', '#FF7F0E', '#2CA02C', '#D62728', '#9467BD', '#8C564B']
 }
 
-# Global visual tweaks
-plt.rcParams['figure.dpi'] = 150
-plt.rcParams['savefig.dpi'] = 300
-plt.rcParams['axes.facecolor'] = '#f9fafb'
-plt.rcParams['figure.facecolor'] = 'white'
-plt.rcParams['axes.edgecolor'] = '#e5e7eb'
-plt.rcParams['grid.color'] = '#e5e7eb'
-plt.rcParams['grid.alpha'] = 0.8
-sns.set_palette(NEURIPS_COLORS['palette'])
+
+def load_plotting() -> bool:
+    """
+    导入 matplotlib / seaborn，应用全局样式与中文字体（只在第一次调用时执行）
+    返回: 绘图库是否可用
+    """
+    global plt, sns, MATPLOTLIB_AVAILABLE
+    if plt is not None or not MATPLOTLIB_AVAILABLE:
+        return MATPLOTLIB_AVAILABLE
+    try:
+        import matplotlib.pyplot as pyplot
+        import seaborn
+    except ImportError:
+        MATPLOTLIB_AVAILABLE = False
+        return False
+
+    seaborn.set_style("whitegrid")
+    seaborn.set_context("paper", font_scale=1.2)
+    configure_chinese_font()
+
+    # Global visual tweaks
+    pyplot.rcParams['figure.dpi'] = 150
+    pyplot.rcParams['savefig.dpi'] = 300
+    pyplot.rcParams['axes.facecolor'] = '#f9fafb'
+    pyplot.rcParams['figure.facecolor'] = 'white'
+    pyplot.rcParams['axes.edgecolor'] = '#e5e7eb'
+    pyplot.rcParams['grid.color'] = '#e5e7eb'
+    pyplot.rcParams['grid.alpha'] = 0.8
+    seaborn.set_palette(NEURIPS_COLORS['palette'])
+
+    plt, sns = pyplot, seaborn
+    return True
 
 
 def style_axes(ax):
@@ -73,11 +135,82 @@ def style_axes(ax):
     ax.set_axisbelow(True)
 
 
+# 水位计数的长度（覆盖逐抽概率曲线的 0-84 区间）
+PITY_COUNT_SIZE = 85
+
+
+class PlotAggregates(dict):
+    """
+    各图表共用的汇总量 {策略名: {福利模式: {汇总项: 值}}}，全部由汇总立方体得到：
+    - mean_spent: 平均实际投入
+    - spent_box / spent_fliers: 实际投入箱线图的 [下须, Q1, 中位数, Q3, 上须, 均值] 与离群取值
+    - welfare_invested: 策划投入的福利抽数
+    - count: 模拟次数
+    - pity_mean / pity_std: 每个卡池结束时小保底水位的均值 / 标准差
+    - pity_counts: 全部卡池结束时小保底水位的计数（下标为水位）
+    大小与模拟次数无关
+    """
+
+
+def compute_plot_aggregates(all_strategies_data: Dict, max_pity: int = 80) -> PlotAggregates:
+    """
+    由汇总立方体计算图表汇总量
+    all_strategies_data: 汇总立方体，或逐次结果（先汇总为立方体）；已经是 PlotAggregates 时原样返回
+    """
+    if isinstance(all_strategies_data, PlotAggregates):
+        return all_strategies_data
+    aggregates = PlotAggregates()
+    for strategy_name, modes in build_cube(all_strategies_data, max_pity).items():
+        aggregates[strategy_name] = {}
+        for mode, stats in modes.items():
+            pity_histogram_counts = stats.pity_histogram()
+            pity_counts = np.zeros(max(PITY_COUNT_SIZE, len(pity_histogram_counts)), dtype=np.int64)
+            pity_counts[:len(pity_histogram_counts)] = pity_histogram_counts
+            box, fliers = _box_stats(stats.histograms['user_spent'])
+            aggregates[strategy_name][mode] = {
+                'mean_spent': stats.mean('user_spent'),
+                'spent_box': box,
+                'spent_fliers': fliers,
+                'welfare_invested': stats.welfare_invested,
+                'count': len(stats),
+                'pity_mean': stats.mean_pity_history(),
+                'pity_std': stats.std_pity_history(),
+                'pity_counts': pity_counts,
+            }
+    return aggregates
+
+
+def _box_stats(hist: StreamingHistogram, whis: float = 1.5):
+    """
+    由直方图得到箱线图统计（须线规则同 matplotlib.cbook.boxplot_stats）
+    返回: ([下须, Q1, 中位数, Q3, 上须, 均值], 离群取值（每个取值一次）)
+    """
+    q1, median, q3 = (hist.percentile(q) for q in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    values = np.flatnonzero(hist.counts)
+    high = values[values <= q3 + whis * iqr]
+    low = values[values >= q1 - whis * iqr]
+    whishi = q3 if len(high) == 0 or high.max() < q3 else float(high.max())
+    whislo = q1 if len(low) == 0 or low.min() > q1 else float(low.min())
+    fliers = values[(values < whislo) | (values > whishi)]
+    return np.array([whislo, q1, median, q3, whishi, hist.mean()]), fliers
+
+
+def pity_histogram(pity_counts: np.ndarray, bins: np.ndarray) -> np.ndarray:
+    """
+    由水位计数得到整数边界区间的概率，与 np.histogram(水位, bins) / 样本数 相同
+    （最后一个区间包含右端点）
+    """
+    total = pity_counts.sum()
+    hist = np.add.reduceat(pity_counts[:bins[-1] + 1], bins[:-1])
+    return hist / total
+
+
 class GachaVisualizer:
     """抽卡结果可视化器"""
     
     def __init__(self):
-        if not MATPLOTLIB_AVAILABLE:
+        if not load_plotting():
             print("可视化功能需要安装 matplotlib")
             return
         
@@ -89,11 +222,12 @@ class GachaVisualizer:
         
         all_strategies_data: {
             'strategy_name': {
-                'baseline': List[Dict],
-                'limited': List[Dict],
-                'permanent': List[Dict]
+                'baseline': StreamingStrategyStats（汇总立方体）或 StrategyResults,
+                'limited': ...,
+                'permanent': ...
             }
         }
+        也可以直接传入 compute_plot_aggregates 的结果
         """
         if not MATPLOTLIB_AVAILABLE:
             return
@@ -101,7 +235,8 @@ class GachaVisualizer:
         fig, ax = plt.subplots(figsize=(12, 6))
         style_axes(ax)
         
-        strategies = list(all_strategies_data.keys())
+        aggregates = compute_plot_aggregates(all_strategies_data)
+        strategies = list(aggregates.keys())
         x = np.arange(len(strategies))
         width = 0.35
         
@@ -110,20 +245,16 @@ class GachaVisualizer:
         permanent_efficiency_list = []
         
         for strategy_name in strategies:
-            data = all_strategies_data[strategy_name]
+            data = aggregates[strategy_name]
             
-            baseline_spent = [r['user_spent'] for r in data['baseline']]
-            limited_spent = [r['user_spent'] for r in data['limited']]
-            permanent_spent = [r['user_spent'] for r in data['permanent']]
-            
-            avg_baseline = np.mean(baseline_spent)
-            avg_limited = np.mean(limited_spent)
-            avg_permanent = np.mean(permanent_spent)
+            avg_baseline = data['baseline']['mean_spent']
+            avg_limited = data['limited']['mean_spent']
+            avg_permanent = data['permanent']['mean_spent']
             
             limited_saved = avg_baseline - avg_limited
             permanent_saved = avg_baseline - avg_permanent
             
-            welfare_invested = data['limited'][0]['welfare_invested']
+            welfare_invested = data['limited']['welfare_invested']
             
             limited_efficiency_list.append(limited_saved / welfare_invested if welfare_invested > 0 else 0)
             permanent_efficiency_list.append(permanent_saved / welfare_invested if welfare_invested > 0 else 0)
@@ -179,27 +310,27 @@ class GachaVisualizer:
         fig, ax = plt.subplots(figsize=(16, 7))
         style_axes(ax)
         
-        strategies = list(all_strategies_data.keys())
+        aggregates = compute_plot_aggregates(all_strategies_data)
+        strategies = list(aggregates.keys())
         all_data = []
         labels = []
         positions = []
         pos = 1
         
         for strategy_name in strategies:
-            data = all_strategies_data[strategy_name]
-            
-            # 获取实际消耗的抽数
-            baseline_spent = [r['user_spent'] for r in data['baseline']]
-            limited_spent = [r['user_spent'] for r in data['limited']]
-            permanent_spent = [r['user_spent'] for r in data['permanent']]
+            data = aggregates[strategy_name]
             
-            all_data.extend([baseline_spent, limited_spent, permanent_spent])
+            # 实际消耗抽数的箱线图统计（来自汇总立方体）
+            for mode in ('baseline', 'limited', 'permanent'):
+                whislo, q1, median, q3, whishi, mean = data[mode]['spent_box']
+                all_data.append({'whislo': whislo, 'q1': q1, 'med': median, 'q3': q3, 'whishi': whishi,
+                                 'mean': mean, 'fliers': data[mode]['spent_fliers']})
             labels.extend([f'{strategy_name}\n(无福利)', f'{strategy_name}\n(限时)', f'{strategy_name}\n(永久)'])
             positions.extend([pos, pos+1, pos+2])
             pos += 4
         
-        # 使用seaborn绘制箱线图
-        bp = ax.boxplot(all_data, positions=positions, widths=0.6, patch_artist=True,
+        # 由预先计算的统计绘制箱线图
+        bp = ax.bxp(all_data, positions=positions, widths=0.6, patch_artist=True,
                         showmeans=True, meanline=True,
                         boxprops=dict(linewidth=1.5, edgecolor='white'),
                         whiskerprops=dict(linewidth=1.5),
@@ -250,7 +381,8 @@ class GachaVisualizer:
         if not MATPLOTLIB_AVAILABLE:
             return
             
-        strategies = list(all_strategies_data.keys())
+        aggregates = compute_plot_aggregates(all_strategies_data)
+        strategies = list(aggregates.keys())
         n_strategies = len(strategies)
         
         fig, axes = plt.subplots(2, 3, figsize=(18, 10))
@@ -259,19 +391,16 @@ class GachaVisualizer:
         for idx, strategy_name in enumerate(strategies):
             ax = axes[idx]
             style_axes(ax)
-            data = all_strategies_data[strategy_name]
+            data = aggregates[strategy_name]
             
             # 计算平均小保底水位
             for mode, mode_name, color in [('baseline', '无福利', self.colors['baseline']),
                                            ('limited', '限时福利', self.colors['limited']),
                                            ('permanent', '永久福利', self.colors['permanent'])]:
-                if mode in data and len(data[mode]) > 0 and 'pity_history' in data[mode][0]:
-                    # 获取所有模拟的小保底历史
-                    all_pity_histories = [r['pity_history'] for r in data[mode]]
-                    # 计算平均值
-                    avg_pity = np.mean(all_pity_histories, axis=0)
-                    # 计算标准差
-                    std_pity = np.std(all_pity_histories, axis=0)
+                if mode in data and data[mode]['count'] > 0:
+                    # 每个卡池的平均值与标准差（所有模拟）
+                    avg_pity = data[mode]['pity_mean']
+                    std_pity = data[mode]['pity_std']
                     
                     x = range(1, len(avg_pity) + 1)
                     ax.plot(x, avg_pity, label=mode_name, color=color, linewidth=2.5, alpha=0.9, marker='o', markersize=3, markevery=3)
@@ -311,7 +440,8 @@ class GachaVisualizer:
         if not MATPLOTLIB_AVAILABLE:
             return
             
-        strategies = list(all_strategies_data.keys())
+        aggregates = compute_plot_aggregates(all_strategies_data)
+        strategies = list(aggregates.keys())
         n_strategies = len(strategies)
         
         # 创建图表：2行3列
@@ -325,7 +455,7 @@ class GachaVisualizer:
         for idx, strategy_name in enumerate(strategies):
             ax = axes[idx]
             style_axes(ax)
-            data = all_strategies_data[strategy_name]
+            data = aggregates[strategy_name]
             
             x_pos = np.arange(len(bin_labels))
             width = 0.25
@@ -334,15 +464,9 @@ class GachaVisualizer:
             for i, (mode, mode_name, color) in enumerate([('baseline', '无福利', self.colors['baseline']),
                                                            ('limited', '限时福利', self.colors['limited']),
                                                            ('permanent', '永久福利', self.colors['permanent'])]):
-                if mode in data and len(data[mode]) > 0 and 'pity_history' in data[mode][0]:
-                    # 收集所有小保底水位数据（所有模拟×所有卡池）
-                    all_pity_values = []
-                    for r in data[mode]:
-                        all_pity_values.extend(r['pity_history'])
-                    
-                    # 计算每个区间的概率
-                    hist, _ = np.histogram(all_pity_values, bins=bins)
-                    hist_prob = hist / len(all_pity_values)  # 转换为概率（0-1）
+                if mode in data and data[mode]['count'] > 0:
+                    # 每个区间的概率（所有模拟×所有卡池）
+                    hist_prob = pity_histogram(data[mode]['pity_counts'], bins)
                     
                     # 绘制直方图
                     bars = ax.bar(x_pos + (i - 1) * width, hist_prob, width, 
@@ -393,7 +517,8 @@ class GachaVisualizer:
         if not MATPLOTLIB_AVAILABLE:
             return
             
-        strategies = list(all_strategies_data.keys())
+        aggregates = compute_plot_aggregates(all_strategies_data)
+        strategies = list(aggregates.keys())
         n_strategies = len(strategies)
         
         # 创建图表：2行3列
@@ -403,7 +528,7 @@ class GachaVisualizer:
         for idx, strategy_name in enumerate(strategies):
             ax = axes[idx]
             style_axes(ax)
-            data = all_strategies_data[strategy_name]
+            data = aggregates[strategy_name]
             
             # 定义区间（每1抽为一个区间）
             bins = np.arange(0, 85, 1)
@@ -413,16 +538,12 @@ class GachaVisualizer:
             for mode, mode_name, color in [('baseline', '无福利', self.colors['baseline']),
                                            ('limited', '限时福利', self.colors['limited']),
                                            ('permanent', '永久福利', self.colors['permanent'])]:
-                if mode in data and len(data[mode]) > 0 and 'pity_history' in data[mode][0]:
-                    # 收集所有小保底水位数据（所有模拟×所有卡池）
-                    all_pity_values = []
-                    for r in data[mode]:
-                        all_pity_values.extend(r['pity_history'])
+                if mode in data and data[mode]['count'] > 0:
+                    pity_counts = data[mode]['pity_counts']
                     
-                    if len(all_pity_values) > 0:
-                        # 计算每个区间的概率
-                        hist, _ = np.histogram(all_pity_values, bins=bins)
-                        hist_prob = hist / len(all_pity_values)  # 转换为概率（0-1）
+                    if pity_counts.sum() > 0:
+                        # 每个区间的概率（所有模拟×所有卡池）
+                        hist_prob = pity_histogram(pity_counts, bins)
                         
                         # 绘制实际概率分布曲线
                         ax.plot(bin_centers, hist_prob, label=mode_name, 
@@ -465,38 +586,122 @@ class GachaVisualizer:
         
         plt.close()
     
-    def generate_all_plots(self, all_strategies_data: Dict, num_pools: int):
-        """生成所有可视化图表"""
+    def generate_all_plots(self, all_strategies_data: Dict, num_pools: int, output_dir: str = '.',
+                           workers: Optional[int] = None, force: bool = False):
+        """
+        生成所有可视化图表
+        汇总量只计算一次，各图表在多个进程中并行绘制；
+        输入（所用汇总量、池子数、本模块源码）的哈希与上次生成时相同且图片仍在时跳过
+        output_dir: 图片目录（哈希记录在其中的 plot_hashes.json）
+        workers: 绘图进程数（None 为 min(需要绘制的图数, CPU核数)，1 为在当前进程中顺序绘制）
+        force: 忽略哈希记录，全部重新绘制
+        """
         print("\n" + "=" * 60)
         print("正在生成可视化图表...")
         print("=" * 60)
         
-        # 1. 福利效率对比
-        print("\n[1/5] 生成福利效率对比图...")
-        self.plot_welfare_efficiency_comparison(all_strategies_data, num_pools)
-        
-        # 2. 用户花费对比
-        print("\n[2/5] 生成用户花费分布图...")
-        self.plot_user_spending_comparison(all_strategies_data, num_pools)
-        
-        # 3. 小保底水位变化
-        print("\n[3/5] 生成小保底水位变化图...")
-        self.plot_pity_history(all_strategies_data, num_pools)
-        
-        # 4. 小保底水位直方图（10为间隔）
-        print("\n[4/5] 生成小保底水位直方图...")
-        self.plot_pity_distribution_histogram(all_strategies_data, num_pools)
-        
-        # 5. 小保底水位概率密度图
-        print("\n[5/5] 生成小保底水位概率密度图...")
-        self.plot_pity_distribution(all_strategies_data, num_pools)
+        aggregates = compute_plot_aggregates(all_strategies_data)
+        hash_path = os.path.join(output_dir, PLOT_HASH_FILE)
+        rendered = {} if force else _load_plot_hashes(hash_path)
+        
+        tasks = []
+        for idx, (name, title, fields) in enumerate(PLOTS, 1):
+            inputs = _plot_inputs(aggregates, fields)
+            digest = _plot_digest(name, inputs, num_pools)
+            file_name = f'{name}.png'
+            save_path = os.path.join(output_dir, file_name)
+            if rendered.get(file_name) == digest and os.path.isfile(save_path):
+                print(f"[{idx}/{len(PLOTS)}] {title}输入未变化，跳过: {save_path}")
+                continue
+            tasks.append((file_name, digest, (name, inputs, num_pools, save_path)))
+        
+        if workers is None:
+            workers = min(len(tasks), os.cpu_count() or 1)
+        if tasks:
+            print(f"需要绘制 {len(tasks)}/{len(PLOTS)} 张图表，{workers} 个进程...")
+        
+        def collect(file_name: str, digest: str, save_path: str):
+            rendered[file_name] = digest
+            print(f"图表已保存至: {save_path}")
         
+        if workers <= 1:
+            for file_name, digest, args in tasks:
+                collect(file_name, digest, _render_plot(*args))
+        else:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(_render_plot, *args): (file_name, digest)
+                           for file_name, digest, args in tasks}
+                for future in as_completed(futures):
+                    collect(*futures.pop(future), future.result())
+        
+        if tasks:
+            _save_plot_hashes(hash_path, rendered)
         print("\n所有图表生成完成！")
 
 
-def load_simulation_results(file_path: str = 'simulation_results.pkl') -> dict:
+# 图表: (名称（plot_ 方法名与图片文件名）, 标题, 所用汇总项)
+PLOTS = [
+    ('welfare_efficiency_comparison', '福利效率对比图', ('mean_spent', 'welfare_invested')),
+    ('user_spending_comparison', '用户花费分布图', ('spent_box', 'spent_fliers')),
+    ('pity_history', '小保底水位变化图', ('count', 'pity_mean', 'pity_std')),
+    ('pity_distribution_histogram', '小保底水位直方图', ('count', 'pity_counts')),
+    ('pity_distribution', '小保底水位概率密度图', ('count', 'pity_counts')),
+]
+
+PLOT_HASH_FILE = 'plot_hashes.json'
+
+
+def _plot_inputs(aggregates: PlotAggregates, fields: tuple) -> PlotAggregates:
+    """只保留一张图表用到的汇总项（哈希与传给绘图进程的都只是这部分）"""
+    inputs = PlotAggregates()
+    for strategy_name, modes in aggregates.items():
+        inputs[strategy_name] = {mode: {field: values[field] for field in fields}
+                                 for mode, values in modes.items()}
+    return inputs
+
+
+def _plot_digest(name: str, inputs: PlotAggregates, num_pools: int) -> str:
+    """图表输入的哈希（含本模块源码，绘图代码改动后重新绘制）"""
+    digest = hashlib.sha256()
+    with open(__file__, 'rb') as f:
+        digest.update(f.read())
+    digest.update(f"{name}|{num_pools}".encode())
+    for strategy_name, modes in inputs.items():
+        for mode, values in modes.items():
+            digest.update(f"|{strategy_name}|{mode}".encode())
+            for field, value in values.items():
+                value = np.asarray(value)
+                digest.update(f"|{field}|{value.dtype.str}|{value.shape}|".encode())
+                digest.update(np.ascontiguousarray(value).tobytes())
+    return digest.hexdigest()
+
+
+def _load_plot_hashes(path: str) -> Dict[str, str]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_plot_hashes(path: str, hashes: Dict[str, str]):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(hashes, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _render_plot(name: str, inputs: PlotAggregates, num_pools: int, save_path: str) -> str:
+    """绘图进程：绘制一张图表（不输出），返回图片路径"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        getattr(GachaVisualizer(), f'plot_{name}')(inputs, num_pools, save_path=save_path)
+    return save_path
+
+
+def load_simulation_results(file_path: str = DEFAULT_RESULTS_DIR) -> dict:
     """
-    加载模拟结果
+    加载模拟结果（结果目录以内存映射方式打开，也兼容旧版的 .pkl 文件）
     
     返回: {
         'all_strategies_data': Dict,
@@ -504,15 +709,18 @@ def load_simulation_results(file_path: str = 'simulation_results.pkl') -> dict:
         'config': Dict
     }
     """
-    if not os.path.exists(file_path):
-        print(f"错误: 找不到模拟结果文件 '{file_path}'")
-        print("请先运行 'python gacha_simulator.py' 生成模拟数据")
+    if not is_results_dir(file_path) and not os.path.isfile(file_path):
+        print(f"错误: 找不到模拟结果 '{file_path}'")
+        print("请先运行 'python main.py' 生成模拟数据")
         sys.exit(1)
     
     print(f"正在加载模拟结果: {file_path}")
     
-    with open(file_path, 'rb') as f:
-        results = pickle.load(f)
+    if is_results_dir(file_path):
+        results = load_results(file_path)
+    else:
+        with open(file_path, 'rb') as f:
+            results = pickle.load(f)
     
     print(f"✓ 成功加载数据")
     print(f"  策略数量: {len(results['all_strategies_data'])}")
@@ -527,10 +735,24 @@ def main():
     print("明日方舟终末地 - 数据可视化工具")
     print("=" * 60)
     
-    # 加载模拟结果
-    results = load_simulation_results()
+    parser = argparse.ArgumentParser(description="明日方舟终末地抽卡模拟结果可视化")
+    parser.add_argument('path', nargs='?', default=DEFAULT_RESULTS_DIR, help="模拟结果目录（或旧版 .pkl 文件）")
+    parser.add_argument('--workers', type=int, default=None, help="绘图进程数（默认按图表数与CPU核数，1为单进程）")
+    parser.add_argument('--force', action='store_true', help="忽略 plot_hashes.json，全部重新绘制")
+    args = parser.parse_args()
     
-    all_strategies_data = results['all_strategies_data']
+    # 优先读取汇总立方体；没有时读取逐次结果（或旧版的 pickle 文件）再汇总
+    path = args.path
+    if is_cube_dir(path):
+        results = load_cube(path)
+        print(f"✓ 读取汇总立方体: {path}")
+        all_strategies_data = results['cube']
+    else:
+        if path == DEFAULT_RESULTS_DIR and not is_results_dir(path) and os.path.isfile('simulation_results.pkl'):
+            path = 'simulation_results.pkl'
+        results = load_simulation_results(path)
+        all_strategies_data = compute_plot_aggregates(results['all_strategies_data'],
+                                                      results['config']['small_pity'])
     num_pools = results['num_pools']
     config = results['config']
     
@@ -544,7 +766,7 @@ def main():
     
     # 生成可视化图表
     visualizer = GachaVisualizer()
-    visualizer.generate_all_plots(all_strategies_data, num_pools)
+    visualizer.generate_all_plots(all_strategies_data, num_pools, workers=args.workers, force=args.force)
     
     print("\n" + "=" * 60)
     print("可视化完成！")